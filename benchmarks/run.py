@@ -0,0 +1,202 @@
+"""Offline benchmarks of the client against a local stub of the Public API.
+
+Every read and write family is timed over `--requests` calls spread across
+`--concurrency` threads, reporting requests/sec, p50/p99 latency and the time
+spent decoding JSON. Streamed responses are decoded while they are read, so
+their decoding is only part of the latency and no decode time is reported
+for them. Peak memory is traced over a single call afterwards, so
+tracing does not slow down the timed runs. Results are saved as JSON to
+compare releases:
+
+  python -m benchmarks.run --points 10000 --latency 5
+  python -m benchmarks.run --compare benchmarks/results/0.1.0-20240101T000000.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sotaog_public_api_client import Client
+
+from benchmarks.stub_server import BASE_TS, StubServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def _datapoints_body(points):
+  return [[BASE_TS + i * 60000, i * 0.5] for i in range(points)]
+
+
+def _production_body(rows):
+  return [{'well_id': 'well_{}'.format(i % 200), 'date': '2024-01-{:02d}'.format(i % 28 + 1), 'oil': i * 1.5, 'gas': i * 2.5, 'water': i * 0.5}
+          for i in range(rows)]
+
+
+def _consume(rows):
+  count = 0
+  for _ in rows:
+    count += 1
+  return count
+
+
+# name -> (family, call), the call receives the client and the run configuration
+CASES = {
+    'get_datapoints': ('read', lambda client, args: client.get_datapoints({'asset_0': ['datatype_0']}, limit=args.points)),
+    'get_datapoints_columnar': ('read', lambda client, args: client.get_datapoints({'asset_0': ['datatype_0']}, limit=args.points, format='columnar')),
+    'get_asset_datapoints': ('read', lambda client, args: client.get_asset_datapoints('asset_0', limit=args.points)),
+    'get_assets': ('read', lambda client, args: client.get_assets()),
+    'list_well_production': ('read', lambda client, args: client.list_well_production()),
+    'list_well_production_stream': ('read', lambda client, args: _consume(client.list_well_production(stream=True))),
+    'get_truck_tickets': ('read', lambda client, args: client.get_truck_tickets()),
+    'post_datapoints': ('write', lambda client, args: client.post_datapoints('asset_0', {'datatype_0': args.write_body})),
+    'batch_multiple_datapoints': ('write', lambda client, args: client.batch_multiple_datapoints({'entities': {'asset_0': {'datatype_0': args.write_body}}})),
+    'put_well_production': ('write', lambda client, args: client.put_well_production('well_0', '2024-01-01', {'oil': 120.5, 'gas': 300.0, 'water': 40.2})),
+    'batch_put_well_production': ('write', lambda client, args: client.batch_put_well_production(args.production_body)),
+    'post_truck_ticket': ('write', lambda client, args: client.post_truck_ticket({'facility': 'facility_0', 'type': 'oil', 'volume': 120.5})),
+}
+
+# Cases decoding the body element by element while reading it, without `json_loads`
+STREAMED_CASES = {'list_well_production_stream'}
+
+
+class _DecodeTimer():
+  """Wraps a `json_loads` to add up the time spent decoding."""
+
+  def __init__(self, loads):
+    self.loads = loads
+    self.seconds = 0.0
+    self.calls = 0
+    self._lock = threading.Lock()
+
+  def __call__(self, content):
+    start = time.perf_counter()
+    try:
+      return self.loads(content)
+    finally:
+      elapsed = time.perf_counter() - start
+      with self._lock:
+        self.seconds += elapsed
+        self.calls += 1
+
+
+def percentile(values, p):
+  if not values:
+    return None
+  ordered = sorted(values)
+  return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_case(url, name, args):
+  family, call = CASES[name]
+  client = Client(url, 'benchmark', 'benchmark', pool_maxsize=args.concurrency, single_flight=False)
+  decode = _DecodeTimer(client.json_loads)
+  client.json_loads = decode
+  call(client, args)
+  decode.seconds = 0.0
+  decode.calls = 0
+
+  def timed(_):
+    start = time.perf_counter()
+    call(client, args)
+    return time.perf_counter() - start
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+    latencies = list(executor.map(timed, range(args.requests)))
+  wall = time.perf_counter() - start
+
+  tracemalloc.start()
+  try:
+    call(client, args)
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  client.session.close()
+  return {
+      'name': name,
+      'family': family,
+      'requests': args.requests,
+      'requests_per_second': args.requests / wall,
+      'p50_ms': percentile(latencies, 50) * 1000,
+      'p99_ms': percentile(latencies, 99) * 1000,
+      'decode_ms_per_request': None if name in STREAMED_CASES else decode.seconds * 1000 / args.requests,
+      'peak_memory_bytes': peak,
+  }
+
+
+def _version():
+  try:
+    from importlib.metadata import version
+    return version('sotaog_public_api_client')
+  except Exception:
+    return 'unknown'
+
+
+def _print_results(results, baseline = None):
+  previous = {result['name']: result for result in (baseline or {}).get('results', [])}
+  print('{:<30} {:>6} {:>10} {:>9} {:>9} {:>10} {:>11}{}'.format('case', 'family', 'req/s', 'p50 ms', 'p99 ms', 'decode ms', 'peak KiB', '  vs baseline' if baseline else ''))
+  for result in results:
+    decode = result['decode_ms_per_request']
+    line = '{name:<30} {family:>6} {requests_per_second:>10.1f} {p50_ms:>9.2f} {p99_ms:>9.2f} {decode:>10} {peak:>11.1f}'.format(
+        peak=result['peak_memory_bytes'] / 1024, decode='-' if decode is None else '{:.3f}'.format(decode), **result)
+    before = previous.get(result['name'])
+    if before:
+      line += '  {:+.1f}% req/s, {:+.1f}% peak'.format(
+          (result['requests_per_second'] / before['requests_per_second'] - 1) * 100,
+          (result['peak_memory_bytes'] / max(before['peak_memory_bytes'], 1) - 1) * 100)
+    print(line)
+
+
+def main(argv = None):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--points', type=int, default=1000, help='datapoints per series in read and write payloads')
+  parser.add_argument('--series', type=int, default=10, help='series returned by get_datapoints and get_asset_datapoints')
+  parser.add_argument('--rows', type=int, default=1000, help='rows returned by list_well_production and get_truck_tickets and sent by batch_put_well_production')
+  parser.add_argument('--assets', type=int, default=500, help='assets returned by get_assets')
+  parser.add_argument('--latency', type=float, default=0.0, help='latency injected by the stub server, in milliseconds')
+  parser.add_argument('--requests', type=int, default=200, help='timed calls per case')
+  parser.add_argument('--concurrency', type=int, default=8, help='threads issuing the calls')
+  parser.add_argument('--cases', nargs='*', choices=sorted(CASES), help='cases to run, all by default')
+  parser.add_argument('--family', choices=('read', 'write'), help='only run the cases of one family')
+  parser.add_argument('--label', default=_version(), help='label of the results, the installed version by default')
+  parser.add_argument('--output', default=RESULTS_DIR, help='directory the results are saved to')
+  parser.add_argument('--compare', help='results file to compare against')
+  args = parser.parse_args(argv)
+  args.write_body = _datapoints_body(args.points)
+  args.production_body = _production_body(args.rows)
+
+  names = [name for name in (args.cases or CASES) if args.family is None or CASES[name][0] == args.family]
+  with StubServer(args.points, args.series, args.rows, args.assets, args.latency / 1000) as server:
+    results = [run_case(server.url, name, args) for name in names]
+    payload_sizes = server.payload_sizes
+
+  report = {
+      'label': args.label,
+      'created_at': datetime.now(timezone.utc).isoformat(),
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'config': {key: getattr(args, key) for key in ('points', 'series', 'rows', 'assets', 'latency', 'requests', 'concurrency')},
+      'payload_bytes': payload_sizes,
+      'results': results,
+  }
+  baseline = None
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+  _print_results(results, baseline)
+
+  os.makedirs(args.output, exist_ok=True)
+  path = os.path.join(args.output, '{}-{}.json'.format(args.label, datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')))
+  with open(path, 'w') as f:
+    json.dump(report, f, indent=2)
+  print('Results saved to {}'.format(path))
+
+
+if __name__ == '__main__':
+  main()
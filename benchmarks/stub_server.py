@@ -0,0 +1,133 @@
+"""Local stand-in for the endpoints of the SotaOG Public API exercised by the benchmarks.
+
+Response bodies are generated once up front, so the server spends its time on
+I/O rather than on encoding and the client is what gets measured. Every request
+waits `latency` seconds before it is answered to emulate the network.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+BASE_TS = 1600000000000
+
+
+def _series(points):
+  return [[BASE_TS + i * 60000, round(i * 0.37 % 1000, 3)] for i in range(points)]
+
+
+def build_payloads(points = 1000, series = 10, rows = 1000, assets = 500):
+  datatypes = ['datatype_{}'.format(i) for i in range(series)]
+  per_asset = max(1, series // 5)
+  multiple = {}
+  for i in range(series):
+    multiple.setdefault('asset_{}'.format(i // per_asset), {})[datatypes[i]] = _series(points)
+  payloads = {
+      'datapoints': multiple,
+      'asset_datapoints': {datatype: _series(points) for datatype in datatypes},
+      'assets': [
+          {'id': 'asset_{}'.format(i), 'name': 'Asset {}'.format(i), 'facility': 'facility_{}'.format(i % 20),
+           'asset_type': ('tank', 'well', 'meter')[i % 3], 'metadata': {'capacity': 400 + i % 100, 'unit': 'bbl'}}
+          for i in range(assets)
+      ],
+      'production': [
+          {'well_id': 'well_{}'.format(i % 200), 'facility_id': 'facility_{}'.format(i % 20), 'date': '2024-{:02d}-{:02d}'.format(i // 28 % 12 + 1, i % 28 + 1),
+           'oil': round(i * 1.7 % 500, 2), 'gas': round(i * 3.1 % 900, 2), 'water': round(i * 0.9 % 300, 2)}
+          for i in range(rows)
+      ],
+      'truck_tickets': [
+          {'id': 'ticket_{}'.format(i), 'facility': 'facility_{}'.format(i % 20), 'type': 'oil', 'ts': BASE_TS + i * 3600000,
+           'volume': round(i * 2.3 % 180, 2), 'driver': 'driver_{}'.format(i % 50)}
+          for i in range(rows)
+      ],
+  }
+  return {name: json.dumps(payload).encode() for name, payload in payloads.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, *args):
+    pass
+
+  def _reply(self, status, body = b''):
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _handle(self, method):
+    length = int(self.headers.get('Content-Length') or 0)
+    if length:
+      self.rfile.read(length)
+    latency = self.server.latency
+    if latency:
+      time.sleep(latency)
+    path = urlparse(self.path).path
+    payloads = self.server.payloads
+    if method == 'POST' and path == '/v1/authenticate':
+      return self._reply(200, b'{"access_token": "benchmark", "expires_in": 86400}')
+    if method == 'POST' and path == '/v1/datapoints':
+      return self._reply(200, payloads['datapoints'])
+    if method == 'POST' and path.startswith('/v1/datapoints/'):
+      return self._reply(202)
+    if method == 'GET' and path.startswith('/v1/datapoints/'):
+      return self._reply(200, payloads['asset_datapoints'])
+    if method == 'GET' and path == '/v1/assets':
+      return self._reply(200, payloads['assets'])
+    if method == 'GET' and path == '/v1/wells/production':
+      return self._reply(200, payloads['production'])
+    if method == 'PUT' and path.startswith('/v1/wells/production'):
+      return self._reply(201)
+    if method == 'GET' and path == '/v1/truck-tickets':
+      return self._reply(200, payloads['truck_tickets'])
+    if method == 'POST' and path == '/v1/truck-tickets':
+      return self._reply(201, b'{"id": "ticket"}')
+    self._reply(404, b'{"message": "Not found"}')
+
+  def do_GET(self):
+    self._handle('GET')
+
+  def do_POST(self):
+    self._handle('POST')
+
+  def do_PUT(self):
+    self._handle('PUT')
+
+
+class StubServer():
+  """Threaded HTTP server answering the benchmarked endpoints on `url`.
+
+    with StubServer(points=10000, latency=0.005) as server:
+      client = Client(server.url, 'id', 'secret')
+  """
+
+  def __init__(self, points = 1000, series = 10, rows = 1000, assets = 500, latency = 0.0, host = '127.0.0.1', port = 0):
+    self._server = ThreadingHTTPServer((host, port), _Handler)
+    self._server.daemon_threads = True
+    self._server.payloads = build_payloads(points, series, rows, assets)
+    self._server.latency = latency
+    self._thread = None
+    self.url = 'http://{}:{}'.format(*self._server.server_address[:2])
+
+  @property
+  def payload_sizes(self):
+    return {name: len(payload) for name, payload in self._server.payloads.items()}
+
+  def start(self):
+    self._thread = threading.Thread(target=self._server.serve_forever, name='benchmark-stub-server', daemon=True)
+    self._thread.start()
+    return self
+
+  def stop(self):
+    self._server.shutdown()
+    self._server.server_close()
+    self._thread.join()
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc_info):
+    self.stop()
@@ -9,5 +9,12 @@ setup(
     author_email='zach@sotaog.com',
     license='MIT',
     packages=['sotaog_public_api_client'],
-    install_requires=['requests']
+    install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'numpy': ['numpy'],
+        'orjson': ['orjson'],
+        'arrow': ['pyarrow'],
+        'http2': ['httpx[http2]']
+    }
 )
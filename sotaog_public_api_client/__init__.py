@@ -1,375 +1,547 @@
-import csv
+import copy
 import logging
 import os
+import reprlib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE
+from requests.auth import AuthBase
+from requests.utils import rewind_body
+
+from .auth import FileTokenCache, Token, TokenCache, TokenManager, token_cache_key
+from .cache import DEFAULT_TTLS, ResponseCache
+from .catalog import AssetCatalog
+from .coalesce import SingleFlight, request_key
+from .columnar import Series, slice_ranges, to_columnar
+from .exceptions import Circuit_Open_Exception, Client_Exception
+from .export import EXPORTABLE_REPORTS, RowWriter, export_format, export_rows
+from .incidents import IncidentReconciler
+from .jsonstream import iter_json_array
+from .jsonstream import loads as _default_loads
+from .metrics import ClientMetrics
+from .planner import DatapointPlanner
+from .seriescache import SeriesCache
+from .spool import WriteSpool
+from .sharding import SHARDABLE_REPORTS, RowMerger, check_span, iter_sharded, row_key
+from .strapping import StrappingTable, parse_strapping_csv
+from .sync import DatapointStore, DatapointSync
+from .uploads import guess_content_type, is_path, upload_job
+from .transport import (DEFAULT_RETRY_POLICIES, DEFAULT_TIMEOUT, IDEMPOTENCY_KEY_HEADER, CachingAdapter, CircuitBreaker, HttpxTransport,
+                        RetryAdapter, RetryPolicy, Transport)
+from .writer import DatapointWriter
+
+__all__ = [
+    'Client', 'AsyncClient', 'Client_Exception', 'Circuit_Open_Exception',
+    'Token', 'TokenCache', 'FileTokenCache',
+    'Transport', 'HttpxTransport', 'RetryAdapter', 'CachingAdapter', 'RetryPolicy', 'CircuitBreaker',
+    'DEFAULT_RETRY_POLICIES', 'DEFAULT_TIMEOUT', 'IDEMPOTENCY_KEY_HEADER',
+    'ResponseCache', 'DEFAULT_TTLS', 'SingleFlight', 'SeriesCache', 'ClientMetrics',
+    'AssetCatalog', 'DatapointPlanner', 'DatapointStore', 'DatapointSync', 'DatapointWriter', 'WriteSpool', 'IncidentReconciler',
+    'Series', 'slice_ranges', 'to_columnar', 'StrappingTable', 'parse_strapping_csv', 'iter_json_array',
+    'SHARDABLE_REPORTS', 'RowMerger', 'iter_sharded', 'EXPORTABLE_REPORTS', 'RowWriter', 'export_rows',
+    'LOG_PAYLOAD_LIMIT', 'STRAPPING_TABLE_TTL', 'STREAM_CHUNK_SIZE',
+]
 
 logger = logging.getLogger('sotaog_public_api_client')
 logger.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
 
+LOG_PAYLOAD_LIMIT = int(os.getenv('LOG_PAYLOAD_LIMIT', 1000))
+# Seconds a tank's StrappingTable is reused before it is downloaded again
+STRAPPING_TABLE_TTL = 24 * 3600
+STREAM_CHUNK_SIZE = 64 * 1024
 
-class Client_Exception(Exception):
-  pass
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 3
+_payload_repr.maxlist = _payload_repr.maxtuple = _payload_repr.maxdict = 5
+_payload_repr.maxstring = _payload_repr.maxother = 200
+
+
+class _LogPayload():
+  """Bounded summary of a request or response payload, only rendered if the log record is emitted."""
+
+  def __init__(self, payload, limit = None):
+    self.payload = payload
+    self.limit = LOG_PAYLOAD_LIMIT if limit is None else limit
+
+  def __str__(self):
+    text = _payload_repr.repr(self.payload)
+    if isinstance(self.payload, (list, dict)):
+      text = '({} items) {}'.format(len(self.payload), text)
+    if len(text) > self.limit:
+      text = text[:self.limit] + '...'
+    return text
+
+
+def _map_call(method, args):
+  # map() items are a tuple of positional arguments, a dict of keyword arguments or a single argument
+  if isinstance(args, tuple):
+    return method(*args)
+  if isinstance(args, dict):
+    return method(**args)
+  return method(args)
+
+
+def _iter_series(payload, keys = ()):
+  # Datapoint payloads nest dicts (asset -> datatype -> ...) down to lists of [ts, value] pairs
+  if isinstance(payload, dict):
+    for key, value in payload.items():
+      for series in _iter_series(value, keys + (key,)):
+        yield series
+  elif isinstance(payload, list):
+    yield keys, payload
+
+
+class _DatapointPager():
+  """Cursor state for walking a datapoint time range one page at a time.
+
+  Each page is requested from the last timestamp received (inclusive), so points
+  already yielded for a series are skipped. Only the last timestamp per series
+  is kept, never the points themselves.
+  """
+
+  def __init__(self, start_ts, end_ts, sort, page_size):
+    if sort not in ('asc', 'desc'):
+      raise Client_Exception('sort must be asc or desc, got {}'.format(sort))
+    self.start_ts = start_ts
+    self.end_ts = end_ts
+    self.sort = sort
+    self.page_size = page_size
+    self.done = False
+    self._last = {}
+
+  def consume(self, payload):
+    points = []
+    full = []
+    total = 0
+    for keys, series in _iter_series(payload):
+      total += len(series)
+      if len(series) >= self.page_size:
+        full.append(keys)
+      last = self._last.get(keys)
+      for ts, value in series:
+        if last is not None and (ts <= last if self.sort == 'asc' else ts >= last):
+          continue
+        last = ts
+        points.append(keys + (ts, value))
+      if last is not None:
+        self._last[keys] = last
+    if not full and (not points or total < self.page_size):
+      self.done = True
+      return points
+    # Advance no further than the slowest series that may still have points left
+    cursors = [self._last[keys] for keys in (full or self._last) if keys in self._last]
+    # A full page of points already yielded holds every point at the cursor, step past it or the walk stalls
+    step = 0 if points else 1
+    if self.sort == 'asc':
+      self.start_ts = min(cursors) + step
+    else:
+      self.end_ts = max(cursors) - step
+    return points
+
+
+class _BearerAuth(AuthBase):
+  """Sets the current bearer token and replays a request once with a fresh token if it is rejected with a 401."""
+
+  def __init__(self, client):
+    self.client = client
+
+  def __call__(self, r):
+    r.headers['authorization'] = 'Bearer {}'.format(self.client.token)
+    r.register_hook('response', self._handle_401)
+    return r
+
+  def _handle_401(self, r, **kwargs):
+    if r.status_code != 401 or getattr(r.request, '_token_retried', False):
+      return r
+    logger.debug('Token rejected, re-authenticating')
+    self.client._tokens.invalidate(r.request.headers['authorization'][len('Bearer '):])
+    # A streamed body was consumed by the rejected request, it is only replayed if it can be rewound
+    position = getattr(r.request, '_body_position', None)
+    if position is not None and not isinstance(position, int):
+      return r
+    # Release the connection before reusing it for the replay
+    r.content
+    r.close()
+    prep = r.request.copy()
+    if position is not None:
+      rewind_body(prep)
+    prep._token_retried = True
+    prep.headers['authorization'] = 'Bearer {}'.format(self.client.token)
+    retried = r.connection.send(prep, **kwargs)
+    retried.history.append(r)
+    retried.request = prep
+    return retried
 
 
 class Client():
-  def __init__(self, url, client_id, client_secret, customer_id = None):
+  """Client for the SotaOG Public API.
+
+  Authentication is deferred to the first request. The token is refreshed
+  `token_refresh_margin` seconds before it expires, and a request rejected with a
+  401 is replayed once with a new token. Pass a `TokenCache` (or a
+  `FileTokenCache` to share between processes) to reuse one token across clients
+  with the same credentials.
+
+  Requests are retried according to `retry_policies`, a dict of `RetryPolicy` by
+  HTTP verb (GET, PUT and DELETE by default, POST only when sent with an
+  idempotency key or when it is a read such as `get_datapoints`). A per host `CircuitBreaker` makes calls fail fast with
+  `Circuit_Open_Exception` while the API keeps failing, pass
+  `circuit_breaker=False` to disable it.
+
+  With a `ResponseCache` as `response_cache`, reference data such as assets,
+  facilities and datatypes is served from memory within its TTL and revalidated
+  with conditional requests afterwards.
+
+  Concurrent identical GETs (same URL, parameters and customer) from different
+  threads share one request through `single_flight`, a `SingleFlight` whose
+  `coalesced` counter tells how many calls were saved. Pass `single_flight=False`
+  to disable it.
+
+  Responses are decoded with `json_loads`, orjson when it is installed. Large
+  reports such as `list_well_daily_warehouse` accept `stream=True` to yield
+  their rows as they are parsed from the response instead of returning a list.
+
+  Pass a `ClientMetrics` as `metrics` to record per endpoint latency, sizes,
+  status codes and retries. With a `SeriesCache` as `series_cache`,
+  `get_asset_series` and `get_series` only fetch the parts of a range that
+  were not read before.
+
+  The HTTP stack is a `Transport`, `requests` with urllib3 by default. Pass an
+  `HttpxTransport` to multiplex concurrent calls over HTTP/2 connections, its
+  `stats()` tell how many connections were reused.
+
+  To serve several customers from one client, `for_customer(customer_id)`
+  returns a view sharing the session, token and caches that only changes the
+  `x-sotaog-customer-id` header, and `map_customers` runs a call for many
+  customers concurrently.
+  """
+
+  def __init__(self, url, client_id, client_secret, customer_id = None, pool_maxsize = DEFAULT_POOLSIZE, token_cache = None, token_refresh_margin = 60,
+               retry_policies = None, circuit_breaker = None, response_cache = None, json_loads = None, single_flight = None,
+               metrics = None, series_cache = None, transport = None):
     self.session = requests.Session()
+    self.session.auth = _BearerAuth(self)
     self.url = url.rstrip('/')
     self.customer_id = customer_id
-    logger.info('Initializing Sotaog API client for {}'.format(url))
-    logger.debug('Authenticating to API: {}'.format(url))
+    self.retry_policies = DEFAULT_RETRY_POLICIES if retry_policies is None else retry_policies
+    self.circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker or None
+    self.response_cache = response_cache
+    self.json_loads = json_loads or _default_loads
+    self.single_flight = SingleFlight() if single_flight is None else single_flight or None
+    self.series_cache = series_cache
+    self.transport = (transport or Transport()).acquire()
+    self._client_id = client_id
+    self._client_secret = client_secret
+    self._owns_session = True
+    self._closed = False
+    self._pool_lock = threading.Lock()
+    self.pool_maxsize = 0
+    self._size_pool(pool_maxsize)
+    self._tokens = TokenManager(token_cache_key(self.url, client_id), token_cache, token_refresh_margin)
+    self.request_hooks = []
+    self._strapping_tables = {}
+    self._customer_views = {}
+    if metrics is not None:
+      metrics.attach(self)
+    logger.info('Initializing Sotaog API client for %s', url)
+
+  def close(self):
+    """Closes the session and the connections of the transport, customer views included.
+
+    Closing a customer view does nothing, the session belongs to the client.
+    """
+    if not self._owns_session or self._closed:
+      return
+    self._closed = True
+    self.session.close()
+    self.transport.close()
+
+  def for_customer(self, customer_id):
+    """View of the client sending its requests for `customer_id`.
+
+    The view shares the session and its connection pool, the token, the caches,
+    hooks and metrics of the client, only the customer header differs. Views are
+    created once per customer and reused.
+    """
+    view = self._customer_views.get(customer_id)
+    if view is None:
+      view = copy.copy(self)
+      view.customer_id = customer_id
+      view._owns_session = False
+      view._owner = self
+      # Strapping tables are per customer asset, everything else is keyed by customer already
+      view._strapping_tables = {}
+      view = self._customer_views.setdefault(customer_id, view)
+    return view
+
+  def map_customers(self, method, customer_ids, *args, max_workers = 10, **kwargs):
+    """Calls `method` with the same arguments for every customer on a thread pool, returns `{customer_id: result}`.
+
+    `method` is a Client method name or a function called as `method(view, *args, **kwargs)`.
+    As with `map`, a failing call does not abort the others, its exception is returned
+    in place of the result.
+
+      facilities = client.map_customers('get_facilities', customer_ids)
+    """
+    self._size_pool(max_workers)
+
+    def call(customer_id):
+      view = self.for_customer(customer_id)
+      try:
+        if callable(method):
+          return method(view, *args, **kwargs)
+        return getattr(view, method)(*args, **kwargs)
+      except Exception as e:
+        logger.debug('%s failed for customer %s: %s', getattr(method, '__name__', method), customer_id, e)
+        return e
+
+    customer_ids = list(customer_ids)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      return dict(zip(customer_ids, executor.map(call, customer_ids)))
+
+  @property
+  def token(self):
+    return self._tokens.get(self._authenticate).access_token
+
+  def _authenticate(self):
+    logger.debug('Authenticating to API: %s', self.url)
     data = {
         'grant_type': 'client_credentials'
     }
-    result = self.session.post('{}/v1/authenticate'.format(self.url), data=data, auth=(client_id, client_secret))
+    result = self.session.post('{}/v1/authenticate'.format(self.url), data=data, auth=(self._client_id, self._client_secret))
     if result.status_code == 200:
-      self.token = result.json()['access_token']
-      logger.debug('Token: {}'.format(self.token))
+      token = Token.from_response(result.json())
+      logger.debug('Token expires at: %s', token.expires_at)
+      return token
     else:
       raise Client_Exception('Unable to authenticate to API')
 
-  def _get_headers(self):
+  def _get_headers(self, idempotency_key = None):
     headers = {
         'authorization': 'Bearer {}'.format(self.token)
     }
     if self.customer_id:
       headers['x-sotaog-customer-id'] = self.customer_id
+    if idempotency_key:
+      headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
     return headers
 
+  def _request(self, method, path, *path_args, params = None, json = None, data = None, headers = None, expected = (200,),
+               decode = 'json', idempotency_key = None, retry = False, error = 'Request failed'):
+    """Sends a request to `path` (a template filled with `path_args`) and returns the decoded response.
+
+    A status outside `expected` raises `Client_Exception(error)`, or returns None when `error` is None.
+    `retry` marks a read-only POST, which is then retried like a GET without an idempotency key.
+    `decode` is 'json', 'text', None or 'stream', which returns an iterator over the
+    elements of the top level array read incrementally from the response. Every hook in `request_hooks` is called as
+    `hook(method, path, response, elapsed, exception)` once the request completed or failed.
+    """
+    url = self.url + path.format(*path_args)
+    request_headers = self._get_headers(idempotency_key)
+    if headers:
+      request_headers.update(headers)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+      logger.debug('%s %s params=%s body=%s', method, url, _LogPayload(params), _LogPayload(json))
+    stream = decode == 'stream'
+    start = time.perf_counter()
+    try:
+      if method == 'GET' and not stream and self.single_flight is not None:
+        key = request_key(method, url, params, request_headers.get('x-sotaog-customer-id'))
+        result = self.single_flight.do(key, lambda: self.session.request(method, url, headers=request_headers, params=params))
+      elif retry:
+        # Only `Session.send` passes extra arguments on to the adapter
+        prepared = self.session.prepare_request(requests.Request(method, url, headers=request_headers, params=params, json=json, data=data))
+        settings = self.session.merge_environment_settings(prepared.url, {}, stream, None, None)
+        result = self.session.send(prepared, retry=True, **settings)
+      else:
+        result = self.session.request(method, url, headers=request_headers, params=params, json=json, data=data, stream=stream)
+    except Exception as e:
+      self._call_hooks(method, path, None, time.perf_counter() - start, e)
+      raise
+    elapsed = time.perf_counter() - start
+    self._call_hooks(method, path, result, elapsed, None)
+    if result.status_code not in expected:
+      if error is None:
+        logger.debug('%s %s returned %s', method, url, result.status_code)
+        result.close()
+        return None
+      logger.error('%s %s returned %s: %s', method, url, result.status_code, _LogPayload(result.text))
+      raise Client_Exception(error)
+    if stream:
+      return self._stream_json(result)
+    if decode is None:
+      payload = None
+    elif decode == 'text':
+      payload = result.content.decode()
+    else:
+      payload = self.json_loads(result.content)
+    if debug:
+      logger.debug('%s %s returned %s in %.1fms: %s', method, url, result.status_code, elapsed * 1000, _LogPayload(payload))
+    return payload
+
+  def _stream_json(self, response):
+    with response:
+      yield from iter_json_array(response.iter_content(STREAM_CHUNK_SIZE), self.json_loads)
+
+  def _call_hooks(self, method, path, response, elapsed, exception):
+    for hook in self.request_hooks:
+      try:
+        hook(method, path, response, elapsed, exception)
+      except Exception:
+        logger.exception('Request hook %r failed', hook)
+
+  def _size_pool(self, pool_maxsize):
+    # Grow the per-host connection pool so concurrent calls do not open and discard extra connections
+    if not self._owns_session:
+      # The session belongs to the client the view was created from, so does its pool size
+      self._owner._size_pool(pool_maxsize)
+      return
+    with self._pool_lock:
+      if pool_maxsize <= self.pool_maxsize:
+        return
+      logger.debug('Sizing connection pool to %s', pool_maxsize)
+      self.pool_maxsize = pool_maxsize
+      previous = self.session.adapters.get('https://')
+      adapter = self.transport.adapter(self.retry_policies, self.circuit_breaker, self.response_cache, pool_maxsize, self._client_id)
+      self.session.mount('https://', adapter)
+      self.session.mount('http://', adapter)
+    if previous is not None:
+      # The smaller pool would otherwise keep its connections open until the session is closed
+      self.transport.release(previous)
+
+  def map(self, method, args_list, max_workers = 10):
+    """Calls `method` once per item of `args_list` on a thread pool and returns the results in input order.
+
+    `method` is a Client method or its name. Each item is a tuple of positional arguments,
+    a dict of keyword arguments or a single argument. A failing call does not abort the
+    batch, its exception is returned in place of the result.
+
+      configs = client.map('get_well_config', well_ids, max_workers=20)
+    """
+    if isinstance(method, str):
+      method = getattr(self, method)
+    self._size_pool(max_workers)
+
+    def call(args):
+      try:
+        return _map_call(method, args)
+      except Exception as e:
+        logger.debug('%s failed for %s: %s', method.__name__, _LogPayload(args), e)
+        return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      return list(executor.map(call, args_list))
+
   def get_alarm_services(self):
-    logger.debug('Getting alarm services')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/alarm-services'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      alarm_services = result.json()
-      logger.debug('Alarm Services: {}'.format(alarm_services))
-      return alarm_services
-    else:
-      raise Client_Exception('Unable to retrieve alarm services')
+    return self._request('GET', '/v1/alarm-services', error='Unable to retrieve alarm services')
 
   def get_alarm_service(self, alarm_service_id):
-    logger.debug('Getting alarm service {}'.format(alarm_service_id))
-    headers = self._get_headers()
-    url = '{}/v1/alarm-services/{}'.format(self.url, alarm_service_id)
-    result = self.session.get(url, headers=headers)
-    if result.status_code == 200:
-      alarm_service = result.json()
-      logger.debug('Alarm Service: {}'.format(alarm_service))
-      return alarm_service
-    else:
-      raise Client_Exception('Unable to retrieve alarm service {}'.format(alarm_service_id))
+    return self._request('GET', '/v1/alarm-services/{}', alarm_service_id, error='Unable to retrieve alarm service {}'.format(alarm_service_id))
 
   def get_alarms(self):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/alarms'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v1/alarms', error='Unable to retrieve alarms')
     
   def get_custom_alarms(self):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/custom-alarms'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v1/custom-alarms', error='Unable to retrieve alarms')
   
   def get_custom_alarm(self,alarms_id):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/custom-alarms/{}'.format(self.url, alarms_id), headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v1/custom-alarms/{}', alarms_id, error='Unable to retrieve alarms')
   
   def get_custom_alarm_new(self,alarm_id):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v2/custom-alarms-new/{}'.format(self.url, alarm_id), headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v2/custom-alarms-new/{}', alarm_id, error='Unable to retrieve alarms')
 
   def get_custom_alarms_new(self):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v2/custom-alarms-new'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v2/custom-alarms-new', error='Unable to retrieve alarms')
 
   def get_alarm_incidents_new(self,alarm_id,customer_id=None, asset_id=None, alarm_status=None):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    url = f'{self.url}/v2/custom-alarms-incidents-new?alarm_id={alarm_id}'
+    params = {'alarm_id': alarm_id}
     if customer_id:
-      url += f'&customer_id={customer_id}'
+      params['customer_id'] = customer_id
     if asset_id:
-      url += f'&asset_id={asset_id}'
+      params['asset_id'] = asset_id
     if alarm_status:
-      url += f'&alarm_status={alarm_status}'
-    result = self.session.get(url, headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms incidents')
+      params['alarm_status'] = alarm_status
+    return self._request('GET', '/v2/custom-alarms-incidents-new', params=params, error='Unable to retrieve alarms incidents')
   
   def post_custom_alarm_incidents_new(self, incidents):
-    logger.debug('Creating Alarm Incidents {}'.format(incidents))
-    headers = self._get_headers()
-    result = self.session.put('{}/v2/custom-alarms-incidents-new'.format(self.url), headers=headers, json=incidents)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('Alarms Incidents: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to create Alarm Incidents')
+    return self._request('PUT', '/v2/custom-alarms-incidents-new', json=incidents, error='Unable to create Alarm Incidents')
   
   def get_alarm_incidents(self,alarm_id, well_id, alarm_status):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
-    url = '{}/v1/custom-alarms-incidents?alarm_id={}&well_id={}&alarm_status={}'.format(self.url,alarm_id,well_id,alarm_status)   
-    result = self.session.get(url, headers=headers)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    params = {'alarm_id': alarm_id, 'well_id': well_id, 'alarm_status': alarm_status}
+    return self._request('GET', '/v1/custom-alarms-incidents', params=params, error='Unable to retrieve alarms')
   
   def get_alarm_notifications(self):
-    logger.debug('Getting collection config')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/alarm-notifications'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      config = result.json()
-      logger.debug('Alarm notification: {}'.format(config))
-      return config
-    else:
-      raise Client_Exception('Unable to get Alarm notification')
+    return self._request('GET', '/v1/alarm-notifications', error='Unable to get Alarm notification')
 
   def post_custom_alarm_incidents(self, incidents):
-    logger.debug('Creating Alarm Incidents {}'.format(incidents))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/custom-alarms-incidents'.format(self.url), headers=headers, json=incidents)
-    if result.status_code == 201:
-      created = result.json()
-      logger.debug('Alarms Incidents: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to create Alarm Incidents')
+    return self._request('PUT', '/v1/custom-alarms-incidents', json=incidents, expected=(201,), error='Unable to create Alarm Incidents')
 
   def get_alarm(self, asset_id, datatype = None):
-    logger.debug('Getting alarms for {}'.format(asset_id))
-    headers = self._get_headers()
-    url = '{}/v1/alarms/{}'.format(self.url, asset_id)
     if datatype:
-      url += '/{}'.format(datatype)
-    result = self.session.get(url, headers=headers)
-    if result.status_code == 200:
-      alarm = result.json()
-      logger.debug('Alarm: {}'.format(alarm))
-      return alarm
-    else:
-      raise Client_Exception('Unable to retrieve alarms for {}'.format(asset_id))
+      return self._request('GET', '/v1/alarms/{}/{}', asset_id, datatype, error='Unable to retrieve alarms for {}'.format(asset_id))
+    return self._request('GET', '/v1/alarms/{}', asset_id, error='Unable to retrieve alarms for {}'.format(asset_id))
 
   def get_leases(self):
-    logger.debug('Getting leases')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/leases'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      leases = result.json()
-      logger.debug('Leases: {}'.format(leases))
-      return leases
-    else:
-      raise Client_Exception('Unable to retrieve leases')
+    return self._request('GET', '/v1/leases', error='Unable to retrieve leases')
 
   def get_facilities(self):
-    logger.debug('Getting facilities')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/facilities'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      facilities = result.json()
-      logger.debug('Facilities: {}'.format(facilities))
-      return facilities
-    else:
-      raise Client_Exception('Unable to retrieve facilities')
+    return self._request('GET', '/v1/facilities', error='Unable to retrieve facilities')
 
   def get_facility(self, facility_id):
-    logger.debug('Getting facility: {}'.format(facility_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/facilities/{}'.format(self.url, facility_id), headers=headers)
-    if result.status_code == 200:
-      facility = result.json()
-      logger.debug('Facility: {}'.format(facility))
-      return facility
-    else:
-      raise Client_Exception('Unable to retrieve facility {}'.format(facility_id))
+    return self._request('GET', '/v1/facilities/{}', facility_id, error='Unable to retrieve facility {}'.format(facility_id))
 
   def get_facility_config(self, facility_id):
-    logger.debug('Getting config for {}'.format(facility_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/facilities/{}/config'.format(self.url, facility_id), headers=headers)
-
-    if result.status_code == 200:
-      config = result.json()
-      logger.debug('config: {}'.format(config))
-      return config
-    else:
-      raise Client_Exception('Unable to retrieve config')
+    return self._request('GET', '/v1/facilities/{}/config', facility_id, error='Unable to retrieve config')
 
   def get_platforms(self):
-    logger.debug('Getting platforms')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/platforms'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      platforms = result.json()
-      logger.debug('Platforms: {}'.format(platforms))
-      return platforms
-    else:
-      raise Client_Exception('Unable to retrieve platforms')
+    return self._request('GET', '/v1/platforms', error='Unable to retrieve platforms')
 
   def get_asset(self, asset_id, type = 'assets'):
-    logger.debug('Getting asset {} of type: {}'.format(asset_id, type))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/{}/{}'.format(self.url, type, asset_id), headers=headers)
-    if result.status_code == 200:
-      asset = result.json()
-      logger.debug('Asset: {}'.format(asset))
-      return asset
-    else:
-      raise Client_Exception('Unable to retrieve asset {} of type {}'.format(asset_id, type))
+    return self._request('GET', '/v1/{}/{{}}'.format(type), asset_id, error='Unable to retrieve asset {} of type {}'.format(asset_id, type))
 
   def get_assets(self, type = 'assets', facility = None, asset_type = None):
-    logger.debug('Getting assets of type: {}'.format(type))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/{}'.format(self.url, type), headers=headers)
-    if result.status_code == 200:
-      assets = result.json()
-      if facility:
-        assets = [asset for asset in assets if 'facility' in asset and asset['facility'] == facility]
-      if asset_type:
-        assets = [asset for asset in assets if 'asset_type' in asset and asset['asset_type'] == asset_type]
-      logger.debug('Assets: {}'.format(assets))
-      return assets
-    else:
-      raise Client_Exception('Unable to retrieve assets of type {}'.format(asset_type))
+    assets = self._request('GET', '/v1/{}'.format(type), error='Unable to retrieve assets of type {}'.format(asset_type))
+    if facility:
+      assets = [asset for asset in assets if 'facility' in asset and asset['facility'] == facility]
+    if asset_type:
+      assets = [asset for asset in assets if 'asset_type' in asset and asset['asset_type'] == asset_type]
+    return assets
 
   def get_asset_type(self, asset_type_id):
-    logger.debug('Getting asset type {}'.format(asset_type_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/asset-types/{}'.format(self.url, asset_type_id), headers=headers)
-    if result.status_code == 200:
-      asset_type = result.json()
-      logger.debug('Asset Type: {}'.format(asset_type))
-      return asset_type
-    else:
-      raise Client_Exception('Unable to retrieve asset {}'.format(asset_type_id))
+    return self._request('GET', '/v1/asset-types/{}', asset_type_id, error='Unable to retrieve asset {}'.format(asset_type_id))
 
   def get_asset_types(self):
-    logger.debug('Getting asset types')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/asset-types'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      asset_types = result.json()
-      logger.debug('Asset types: {}'.format(asset_types))
-      return asset_types
-    else:
-      raise Client_Exception('Unable to get asset types')
+    return self._request('GET', '/v1/asset-types', error='Unable to get asset types')
 
   def get_compressors(self):
-    logger.debug('Getting compressors')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/compressors'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      compressors = result.json()
-      logger.debug('Compressors: {}'.format(compressors))
-      return compressors
-    else:
-      raise Client_Exception('Unable to get compressors')
+    return self._request('GET', '/v1/compressors', error='Unable to get compressors')
 
     
   def get_vru_compressors(self):
-    logger.debug('Getting VRU compressors')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/vru-compressors'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      compressors = result.json()
-      logger.debug('Compressors: {}'.format(compressors))
-      return compressors
-    else:
-      raise Client_Exception('Unable to get compressors')
+    return self._request('GET', '/v1/vru-compressors', error='Unable to get compressors')
 
   def get_customers(self):
-    logger.debug('Getting customers')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/customers'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      customers = result.json()
-      logger.debug('Customers: {}'.format(customers))
-      return customers
-    else:
-      raise Client_Exception('Unable to get customers')
+    return self._request('GET', '/v1/customers', error='Unable to get customers')
 
   def get_customer(self, customer_id):
-    logger.debug('Getting customer {}'.format(customer_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/customers/{}'.format(self.url, customer_id), headers=headers)
-    if result.status_code == 200:
-      customer = result.json()
-      logger.debug('Customer: {}'.format(customer))
-      return customer
-    else:
-      raise Client_Exception('Unable to get customer {}'.format(customer_id))
+    return self._request('GET', '/v1/customers/{}', customer_id, error='Unable to get customer {}'.format(customer_id))
 
   def get_datatypes(self, group_by='asset'):
-    logger.debug('Getting datatypes')
-    headers = self._get_headers()
     params = {}
     if group_by:
       params['group_by'] = group_by
-    result = self.session.get('{}/v1/datatypes'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      datatypes = result.json()
-      logger.debug('Datatypes: {}'.format(datatypes))
-      return datatypes
-    else:
-      raise Client_Exception('Unable to get datatypes')
+    return self._request('GET', '/v1/datatypes', params=params, error='Unable to get datatypes')
 
   def get_datatype(self, datatype_id):
-    logger.debug('Getting datatype {}'.format(datatype_id))
-    headers = self._get_headers()
     params = {'group_by': 'asset'}
-    result = self.session.get('{}/v1/datatypes/{}'.format(self.url, datatype_id), headers=headers, params=params)
-    if result.status_code == 200:
-        datatype = result.json()
-        logger.debug('Datatype: {}'.format(datatype))
-        return datatype
-    else:
-        raise Client_Exception('Unable to get datatype {}'.format(datatype_id))
+    return self._request('GET', '/v1/datatypes/{}', datatype_id, params=params, error='Unable to get datatype {}'.format(datatype_id))
 
-  def get_datapoints(self, asset_datatypes, start_ts = None, end_ts = None, sort = 'desc', limit = 100):
-    logger.debug('Getting datapoints for asset_datatypes: {}'.format(asset_datatypes))
-    headers = self._get_headers()
+  def get_datapoints(self, asset_datatypes, start_ts = None, end_ts = None, sort = 'desc', limit = 100, format = 'json'):
+    """With `format='columnar'` every series is returned as a `Series` of int64 timestamps and float64 values."""
     body = {
         'asset_datatypes': asset_datatypes
     }
@@ -381,61 +553,45 @@ class Client():
       body['sort'] = sort
     if limit:
       body['limit'] = limit
-    result = self.session.post('{}/v1/datapoints'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      datapoints = result.json()
-      logger.debug('Datapoints: {}'.format(datapoints))
-      return datapoints
-    else:
-      logger.debug(result.json())
-      raise Client_Exception('Unable to get datapoints')
+    # A read sent as POST, safe to retry like a GET
+    datapoints = self._request('POST', '/v1/datapoints', json=body, retry=True, error='Unable to get datapoints')
+    if format == 'columnar':
+      return to_columnar(datapoints)
+    return datapoints
+
+  def iter_datapoints(self, asset_datatypes, start_ts = None, end_ts = None, sort = 'asc', page_size = 100):
+    """Yields `(asset, datatype, ts, value)` tuples for the whole range, requesting `page_size` points at a time.
+
+    The tuple has one leading key per level of nesting in the `get_datapoints` response.
+    `page_size` must not exceed the server side limit, a short page ends the walk.
+    """
+    pager = _DatapointPager(start_ts, end_ts, sort, page_size)
+    while not pager.done:
+      datapoints = self.get_datapoints(asset_datatypes, start_ts=pager.start_ts, end_ts=pager.end_ts, sort=sort, limit=page_size)
+      for point in pager.consume(datapoints):
+        yield point
 
   def get_oil_gas_price(self, start_date = None, end_date = None):
-    logger.debug('Getting prices')
-    headers = self._get_headers()
     params = {}
     if start_date:
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/financials/oil-gas-price'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      prices = result.json()
-      logger.debug('Oil Gas Prices: {}'.format(prices))
-      return prices
-    else:
-      raise Client_Exception('Unable to retrieve Oil Gas prices')
+    return self._request('GET', '/v1/financials/oil-gas-price', params=params, error='Unable to retrieve Oil Gas prices')
 
   def get_oil_gas_future_price(self, start_month = None, end_month = None):
-    logger.debug('Getting prices')
-    headers = self._get_headers()
     params = {}
     if start_month:
       params['start_month'] = start_month
     if end_month:
       params['end_month'] = end_month
-    result = self.session.get('{}/v1/financials/oil-gas-future-price'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      prices = result.json()
-      logger.debug('Oil Gas Prices: {}'.format(prices))
-      return prices
-    else:
-      raise Client_Exception('Unable to retrieve Oil Gas prices')
+    return self._request('GET', '/v1/financials/oil-gas-future-price', params=params, error='Unable to retrieve Oil Gas prices')
 
   def put_oil_gas_future_price(self, body):
-    logger.debug('Getting prices')
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/financials/oil-gas-future-price'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      prices = result.json()
-      logger.debug('Oil Gas Prices: {}'.format(prices))
-      return prices
-    else:
-      raise Client_Exception('Unable to retrieve Oil Gas prices')
+    return self._request('PUT', '/v1/financials/oil-gas-future-price', json=body, error='Unable to retrieve Oil Gas prices')
 
-  def get_asset_datapoints(self, asset_id, datatypes = [], start_ts = None, end_ts = None, sort = 'desc', limit = 100):
-    logger.debug('Getting datapoints for asset: {}'.format(asset_id))
-    headers = self._get_headers()
+  def get_asset_datapoints(self, asset_id, datatypes = [], start_ts = None, end_ts = None, sort = 'desc', limit = 100, format = 'json'):
+    """With `format='columnar'` every series is returned as a `Series` of int64 timestamps and float64 values."""
     params = {}
     if datatypes:
       params['datatypes'] = datatypes
@@ -447,31 +603,52 @@ class Client():
       params['sort'] = sort
     if limit:
       params['limit'] = limit
-    result = self.session.get('{}/v1/datapoints/{}'.format(self.url, asset_id), headers=headers, params=params)
-    if result.status_code == 200:
-      datapoints = result.json()
-      logger.debug('Datapoints: {}'.format(datapoints))
-      return datapoints
-    else:
-      raise Client_Exception('Unable to get datapoints')
+    datapoints = self._request('GET', '/v1/datapoints/{}', asset_id, params=params, error='Unable to get datapoints')
+    if format == 'columnar':
+      return to_columnar(datapoints)
+    return datapoints
+
+  def iter_asset_datapoints(self, asset_id, datatypes = [], start_ts = None, end_ts = None, sort = 'asc', page_size = 100):
+    """Yields `(datatype, ts, value)` tuples for the whole range, requesting `page_size` points at a time."""
+    pager = _DatapointPager(start_ts, end_ts, sort, page_size)
+    while not pager.done:
+      datapoints = self.get_asset_datapoints(asset_id, datatypes, start_ts=pager.start_ts, end_ts=pager.end_ts, sort=sort, limit=page_size)
+      for point in pager.consume(datapoints):
+        yield point
+
+  def get_asset_series(self, asset_id, datatypes, start_ts, end_ts, page_size = 1000):
+    """`{datatype: Series}` of every point in the range, read through `series_cache` when the client has one."""
+    cache = self.series_cache
+    if cache is None:
+      return self._fetch_series(asset_id, datatypes, start_ts, end_ts, page_size)
+    # Datatypes missing the same gaps are fetched together
+    groups = {}
+    for datatype in datatypes:
+      groups.setdefault(tuple(cache.missing(asset_id, datatype, start_ts, end_ts)), []).append(datatype)
+    for gaps, group in groups.items():
+      for gap_start, gap_end in gaps:
+        fetched = self._fetch_series(asset_id, group, gap_start, gap_end, page_size)
+        for datatype in group:
+          cache.write(asset_id, datatype, fetched[datatype], gap_start, gap_end)
+    return {datatype: cache.read(asset_id, datatype, start_ts, end_ts) for datatype in datatypes}
+
+  def get_series(self, asset_datatypes, start_ts, end_ts, page_size = 1000):
+    """`{asset_id: {datatype: Series}}` for an `{asset_id: [datatypes]}` mapping, see `get_asset_series`."""
+    return {asset_id: self.get_asset_series(asset_id, datatypes, start_ts, end_ts, page_size) for asset_id, datatypes in asset_datatypes.items()}
+
+  def _fetch_series(self, asset_id, datatypes, start_ts, end_ts, page_size):
+    points = {datatype: [] for datatype in datatypes}
+    for datatype, ts, value in self.iter_asset_datapoints(asset_id, datatypes, start_ts=start_ts, end_ts=end_ts, sort='asc', page_size=page_size):
+      points.setdefault(datatype, []).append((ts, value))
+    return {datatype: Series.from_points(series) for datatype, series in points.items()}
 
   def get_swd_networks(self, facility = None):
-    logger.debug('Getting SWD networks')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/swd-networks'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      swd_networks = result.json()
-      logger.debug('SWD Networks: {}'.format(swd_networks))
-      if facility:
-        swd_networks = [swd_network for swd_network in swd_networks if facility in swd_network['facilities']]
-      logger.debug('SWD Networks: {}'.format(swd_networks))
-      return swd_networks
-    else:
-      raise Client_Exception('Unable to retrieve SWD networks')
+    swd_networks = self._request('GET', '/v1/swd-networks', error='Unable to retrieve SWD networks')
+    if facility:
+      swd_networks = [swd_network for swd_network in swd_networks if facility in swd_network['facilities']]
+    return swd_networks
 
-  def get_truck_tickets(self, facility = None, type = None, start_ts = None, end_ts = None):
-    logger.debug('Getting truck tickets')
-    headers = self._get_headers()
+  def get_truck_tickets(self, facility = None, type = None, start_ts = None, end_ts = None, stream = False):
     params = {}
     if start_ts:
       params['start_ts'] = start_ts
@@ -481,17 +658,9 @@ class Client():
       params['type'] = type
     if facility:
       params['facility'] = facility
-    result = self.session.get('{}/v1/truck-tickets'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      truck_tickets = result.json()
-      logger.debug('Truck tickets: {}'.format(truck_tickets))
-      return truck_tickets
-    else:
-      raise Client_Exception('Unable to retrieve truck tickets')
+    return self._request('GET', '/v1/truck-tickets', params=params, decode='stream' if stream else 'json', error='Unable to retrieve truck tickets')
 
   def get_auto_truck_tickets(self, facility = None, type = None, start_ts = None, end_ts = None):
-    logger.debug('Getting auto truck tickets')
-    headers = self._get_headers()
     params = {}
     if start_ts:
       params['start_ts'] = start_ts
@@ -501,68 +670,62 @@ class Client():
       params['type'] = type
     if facility:
       params['facility'] = facility
-    result = self.session.get('{}/v1/auto-truck-tickets'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      truck_tickets = result.json()
-      logger.debug('Auto Truck tickets: {}'.format(truck_tickets))
-      return truck_tickets
-    else:
-      raise Client_Exception('Unable to retrieve truck tickets')
-
-  def post_truck_ticket(self, truck_ticket):
-    logger.debug('Creating truck ticket {}'.format(truck_ticket))
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/truck-tickets'.format(self.url), headers=headers, json=truck_ticket)
-    if result.status_code == 201:
-      created_ticket = result.json()
-      logger.debug('Truck ticket: {}'.format(created_ticket))
-      return created_ticket
-    else:
-      raise Client_Exception('Unable to create truck ticket')
-
-  def post_auto_truck_ticket(self, truck_ticket):
-    logger.debug('Creating auto truck ticket {}'.format(truck_ticket))
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/auto-truck-tickets'.format(self.url), headers=headers, json=truck_ticket)
-    if result.status_code == 201:
-      created_ticket = result.json()
-      logger.debug('Auto Truck ticket: {}'.format(created_ticket))
-      return created_ticket
-    else:
-      raise Client_Exception('Unable to create auto truck ticket')
-
-  def put_truck_ticket(self, truck_ticket_id, timestamp,  truck_ticket):
-    logger.debug('Putting truck_ticket for {}'.format(truck_ticket_id))
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/truck-tickets/{}/{}'.format(self.url, truck_ticket_id, timestamp), headers=headers, json=truck_ticket)
-    if result.status_code != 201 and result.status_code != 200:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to update truck-ticket')
-
-  def put_truck_ticket_image(self, truck_ticket_id, timestamp, image, content_type):
-    logger.debug('Creating truck ticket image size {}, content_type {}'.format(len(image), content_type))
-    headers = self._get_headers()
-    headers['content-type'] = content_type
-    result = self.session.put('{}/v1/truck-tickets/{}/{}/image'.format(self.url, truck_ticket_id, timestamp), headers=headers, data=image)
-    if result.status_code != 204:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to create truck ticket image')
+    return self._request('GET', '/v1/auto-truck-tickets', params=params, error='Unable to retrieve truck tickets')
+
+  def post_truck_ticket(self, truck_ticket, idempotency_key = None):
+    return self._request('POST', '/v1/truck-tickets', json=truck_ticket, expected=(201,), idempotency_key=idempotency_key, error='Unable to create truck ticket')
+
+  def post_auto_truck_ticket(self, truck_ticket, idempotency_key = None):
+    return self._request('POST', '/v1/auto-truck-tickets', json=truck_ticket, expected=(201,), idempotency_key=idempotency_key, error='Unable to create auto truck ticket')
+
+  def put_truck_ticket(self, truck_ticket_id, timestamp,  truck_ticket, idempotency_key = None):
+    self._request('POST', '/v1/truck-tickets/{}/{}', truck_ticket_id, timestamp, json=truck_ticket, expected=(200, 201), decode=None, idempotency_key=idempotency_key, error='Unable to update truck-ticket')
+
+  def put_truck_ticket_image(self, truck_ticket_id, timestamp, image, content_type = None):
+    """`image` is bytes, a file path or a binary file object, files are streamed rather than read into memory.
+
+    Without `content_type` it is guessed from the file name.
+    """
+    if is_path(image):
+      with open(image, 'rb') as f:
+        return self.put_truck_ticket_image(truck_ticket_id, timestamp, f, content_type or guess_content_type(image))
+    headers = {'content-type': content_type or guess_content_type(image)}
+    self._request('PUT', '/v1/truck-tickets/{}/{}/image', truck_ticket_id, timestamp, headers=headers, data=image, expected=(204,), decode=None, error='Unable to create truck ticket image')
+
+  def put_truck_ticket_images(self, jobs, content_type = None, max_workers = 8):
+    """Uploads `(truck_ticket_id, timestamp, image[, content_type])` jobs concurrently.
+
+    Yields `(truck_ticket_id, timestamp, error)` as each upload completes, `error`
+    being None on success. Jobs are taken from the iterable as uploads finish, at
+    most `2 * max_workers` at a time, so a generator over a large backlog of
+    files is never held in memory.
+    """
+    def upload(job):
+      truck_ticket_id, timestamp, image, job_content_type = upload_job(job, content_type)
+      try:
+        self.put_truck_ticket_image(truck_ticket_id, timestamp, image, job_content_type)
+      except Exception as e:
+        return truck_ticket_id, timestamp, e
+      return truck_ticket_id, timestamp, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      pending = set()
+      for job in jobs:
+        if len(pending) >= 2 * max_workers:
+          done, pending = wait(pending, return_when=FIRST_COMPLETED)
+          for future in done:
+            yield future.result()
+        pending.add(executor.submit(upload, job))
+      while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+          yield future.result()
 
   def put_alarm(self, asset_id, datatype, alarm):
-    logger.debug('Creating alarm for {} {}'.format(asset_id, datatype))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/alarms/{}/{}'.format(self.url, asset_id, datatype), headers=headers, json=alarm)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to create alarm')
-
-  def post_datapoints(self, asset_id, datapoints):
-    logger.debug('Posting datapoints')
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/datapoints/{}'.format(self.url, asset_id), headers=headers, json=datapoints)
-    if result.status_code != 202:
-      logger.exception(result.json())
-      raise Exception('Unable to post datapoints')
+    self._request('PUT', '/v1/alarms/{}/{}', asset_id, datatype, json=alarm, expected=(201,), decode=None, error='Unable to create alarm')
+
+  def post_datapoints(self, asset_id, datapoints, idempotency_key = None):
+    self._request('POST', '/v1/datapoints/{}', asset_id, json=datapoints, expected=(202,), decode=None, idempotency_key=idempotency_key, error='Unable to post datapoints')
 
   """
     Write datapoints for multiple entities in a single request.
@@ -580,25 +743,13 @@ class Client():
         }
     }
   """
-  def batch_multiple_datapoints(self, datapoints):
-    logger.debug('Posting datapoints for multiple assets')
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/datapoints/multiple'.format(self.url), headers=headers, json=datapoints)
-    if result.status_code != 202:
-      logger.exception(result.json())
-      raise Exception('Unable to post multiple datapoints')
-
-  def batch_put_well_production(self, production):
-    logger.debug('Creating well production for {}'.format(production))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/wells/production'.format(self.url), headers=headers, json=production)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to batch create well production')
+  def batch_multiple_datapoints(self, datapoints, idempotency_key = None):
+    self._request('POST', '/v1/datapoints/multiple', json=datapoints, expected=(202,), decode=None, idempotency_key=idempotency_key, error='Unable to post multiple datapoints')
+
+  def batch_put_well_production(self, production, idempotency_key = None):
+    self._request('PUT', '/v1/wells/production', json=production, expected=(201,), decode=None, idempotency_key=idempotency_key, error='Unable to batch create well production')
   
   def get_compressors_downtime(self, compressor_ids = None, facility_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting compressors downtime for {}'.format(compressor_ids))
-    headers = self._get_headers()   
     params = {}
     if compressor_ids:
       params['compressor_ids'] = compressor_ids
@@ -608,26 +759,12 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/compressors/downtime'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      compressors_downtime = result.json()
-      logger.debug('Compressors downtime: {}'.format(compressors_downtime))
-      return compressors_downtime
-    else:
-      logger.exception(result.json())
-      raise Exception('Unable to retrieve compressor downtime')
+    return self._request('GET', '/v1/compressors/downtime', params=params, error='Unable to retrieve compressor downtime')
     
   def put_compressor_downtime(self, compressor):
-    logger.debug('Creating compressor downtime for {}'.format(compressor))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/compressors/downtime'.format(self.url), headers=headers, json=compressor)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to create compressor downtime')
+    self._request('PUT', '/v1/compressors/downtime', json=compressor, expected=(201,), decode=None, error='Unable to create compressor downtime')
 
   def get_compressors_fault_hours(self, compressor_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting compressors fault hours for {}'.format(compressor_ids))
-    headers = self._get_headers()   
     params = {}
     if compressor_ids:
       params['compressor_ids'] = compressor_ids
@@ -635,56 +772,21 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/compressors/fault-hours'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      compressors_fault_hours = result.json()
-      logger.debug('Compressors fault hours: {}'.format(compressors_fault_hours))
-      return compressors_fault_hours
-    else:
-      logger.exception(result.json())
-      raise Exception('Unable to retrieve compressor fault hours')
+    return self._request('GET', '/v1/compressors/fault-hours', params=params, error='Unable to retrieve compressor fault hours')
 
   def get_compressor_fault_hours(self, compressor_id, date):
-    logger.debug('Getting compressor fault hours for {} on {}'.format(compressor_id, date))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/compressors/fault-hours/{}/{}'.format(self.url, compressor_id, date), headers=headers)
-    if result.status_code == 200:
-      compressor_fault_hours = result.json()
-      logger.debug('Compressor fault hours: {}'.format(compressor_fault_hours))
-      return compressor_fault_hours
-    else:
-      logger.exception(result.json())
-      raise Exception('Unable to retrieve compressor fault hours for {} on {}'.format(compressor_id, date))
+    return self._request('GET', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, error='Unable to retrieve compressor fault hours for {} on {}'.format(compressor_id, date))
 
   def put_compressor_fault_hours(self, compressor_id, date, fault_hours):
-    logger.debug('Creating/updating compressor fault hours for {} on {}: {}'.format(compressor_id, date, fault_hours))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/compressors/fault-hours/{}/{}'.format(self.url, compressor_id, date), headers=headers, json=fault_hours)
-    if result.status_code != 200:
-      logger.exception(result.json())
-      raise Exception('Unable to create/update compressor fault hours')
-    return result.json()
+    return self._request('PUT', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, json=fault_hours, error='Unable to create/update compressor fault hours')
 
   def delete_compressor_fault_hours(self, compressor_id, date):
-    logger.debug('Deleting compressor fault hours for {} on {}'.format(compressor_id, date))
-    headers = self._get_headers()
-    result = self.session.delete('{}/v1/compressors/fault-hours/{}/{}'.format(self.url, compressor_id, date), headers=headers)
-    if result.status_code != 200:
-      logger.exception(result.json())
-      raise Exception('Unable to delete compressor fault hours for {} on {}'.format(compressor_id, date))
-    return result.json()
+    return self._request('DELETE', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, error='Unable to delete compressor fault hours for {} on {}'.format(compressor_id, date))
 
   def put_well_production(self, well_id, date, production):
-    logger.debug('Creating well production for {} {}: {}'.format(well_id, date, production))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/wells/production/{}/{}'.format(self.url, well_id, date), headers=headers, json=production)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to create well production')
-
-  def list_well_production(self, well_ids = None, facility_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting well production')
-    headers = self._get_headers()
+    self._request('PUT', '/v1/wells/production/{}/{}', well_id, date, json=production, expected=(201,), decode=None, error='Unable to create well production')
+
+  def list_well_production(self, well_ids = None, facility_ids = None, start_date = None, end_date = None, stream = False):
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -694,51 +796,26 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/wells/production'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_production = result.json()
-      logger.debug('Well production: {}'.format(well_production))
-      return well_production
-    else:
-      raise Client_Exception('Unable to retrieve well production')
+    return self._request('GET', '/v1/wells/production', params=params, decode='stream' if stream else 'json', error='Unable to retrieve well production')
     
   def list_well_optimised_production(self, well_ids = None, facility_ids = None):
-    logger.debug('Getting well optimised production')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
     if facility_ids:
       params['facility_ids'] = facility_ids
-
-    result = self.session.get('{}/v1/wells/optimized-production'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_production = result.json()
-      logger.debug('Well optimised production: {}'.format(well_production))
-      return well_production
-    else:
-      raise Client_Exception('Unable to retrieve well optimised production')    
+    return self._request('GET', '/v1/wells/optimized-production', params=params, error='Unable to retrieve well optimised production')
 
   def get_critical_rate_analysis(self, well_id, refresh = None, start_date = None, end_date = None):
-    logger.debug('Getting Critical Rate Data')
-    headers = self._get_headers()
     params = {}
     if refresh:
       params['refresh'] = refresh
     if start_date and end_date:
       params['start_date'] = start_date
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/wells/{}/critical-rate-analysis'.format(self.url,well_id), headers=headers, params=params)
-    if result.status_code == 200:
-      well_mgmt = result.json()
-      logger.debug('Well Mgmt Data: {}'.format(well_mgmt))
-      return well_mgmt
-    else:
-      raise Client_Exception('Unable to retrieve Critical Rate Data')
+    return self._request('GET', '/v1/wells/{}/critical-rate-analysis', well_id, params=params, error='Unable to retrieve Critical Rate Data')
 
-  def list_well_daily_warehouse(self, well_ids = None, facility_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting well warehouse')
-    headers = self._get_headers()
+  def list_well_daily_warehouse(self, well_ids = None, facility_ids = None, start_date = None, end_date = None, stream = False):
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -748,55 +825,21 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/wells/warehouse'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_warehouse = result.json()
-      logger.debug('Well warehouse: {}'.format(well_warehouse))
-      return well_warehouse
-    else:
-      raise Client_Exception('Unable to retrieve well warehouse')
+    return self._request('GET', '/v1/wells/warehouse', params=params, decode='stream' if stream else 'json', error='Unable to retrieve well warehouse')
 
   def list_well_status(self, well_ids = None):
-    logger.debug('Getting well status')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
-    result = self.session.get('{}/v1/wells/status/latest'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_status = result.json()
-      logger.debug('Well status: {}'.format(well_status))
-      return well_status
-    else:
-      raise Client_Exception('Unable to retrieve well status')
+    return self._request('GET', '/v1/wells/status/latest', params=params, error='Unable to retrieve well status')
 
   def get_well_config(self, well_id):
-    logger.debug('Getting config for {}'.format(well_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/wells/{}/config'.format(self.url, well_id), headers=headers)
-
-    if result.status_code == 200:
-      config = result.json()
-      logger.debug('config: {}'.format(config))
-      return config
-    else:
-      raise Client_Exception('Unable to retrieve config')
+    return self._request('GET', '/v1/wells/{}/config', well_id, error='Unable to retrieve config')
 
   def get_well_type_curve(self, well_id):
-    logger.debug('Getting type curve for {}'.format(well_id))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/wells/{}/type-curve'.format(self.url, well_id), headers=headers)
-
-    if result.status_code == 200:
-      type_curve = result.json()
-      logger.debug('Type curve: {}'.format(type_curve))
-      return type_curve
-    else:
-      raise Client_Exception('Unable to retrieve type curve')
+    return self._request('GET', '/v1/wells/{}/type-curve', well_id, error='Unable to retrieve type curve')
 
   def get_type_curves(self, well_ids = None, facility_ids = None, lease_ids = None, start_date = None, end_date = None, combine = True):
-    logger.debug('Getting type curves')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -809,125 +852,49 @@ class Client():
     if end_date:
       params['end_date'] = end_date
     params['combine'] = combine
-    result = self.session.get('{}/v1/type-curves'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      curves = result.json()
-      logger.debug('Type curves: {}'.format(curves))
-      return curves
-    else:
-      raise Client_Exception('Unable to retrieve type curves')
+    return self._request('GET', '/v1/type-curves', params=params, error='Unable to retrieve type curves')
 
   def batch_well_type_curve(self, well_id, curves):
-    logger.debug('Creating type curve for {}'.format(well_id))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/wells/{}/type-curve'.format(self.url, well_id), headers=headers, json=curves)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to create well type curves')
+    self._request('PUT', '/v1/wells/{}/type-curve', well_id, json=curves, expected=(201,), decode=None, error='Unable to create well type curves')
 
   def get_well_tpr_ipr_curve(self, well_id, refresh):
-    logger.debug('Getting TPR/IPR curve for {}'.format(well_id))
-    headers = self._get_headers()
     params = {}
     if refresh:
       params['refresh'] = refresh
-    result = self.session.get('{}/v1/wells/{}/tpr-ipr-curve'.format(self.url, well_id), headers=headers, params=params)
-    if result.status_code == 200:
-      data = result.json()
-      logger.debug('TPR/IPR curve data: {}'.format(data))
-      return data
-    else:
-      raise Client_Exception('Unable to retrieve IPR/TPR curve')
+    return self._request('GET', '/v1/wells/{}/tpr-ipr-curve', well_id, params=params, error='Unable to retrieve IPR/TPR curve')
       
   def get_res_mgmt_plots(self, well_id, refresh):
-    logger.debug('Getting resevior mgmt plot data for {}'.format(well_id))
-    headers = self._get_headers()
     params = {}
     if refresh:
       params['refresh'] = refresh
-    result = self.session.get('{}/v1/wells/{}/res_mgmt_plots'.format(self.url, well_id), headers=headers, params=params)
-    if result.status_code == 200:
-      data = result.json()
-      logger.debug('resevior mgmt plot data: {}'.format(data))
-      return data
-    else:
-      raise Client_Exception('Unable to retrieve resevior mgmt plot data')
+    return self._request('GET', '/v1/wells/{}/res_mgmt_plots', well_id, params=params, error='Unable to retrieve resevior mgmt plot data')
       
   def get_flowing_bottom_hole_pressure(self, well_id, refresh):
-    logger.debug('Getting flowing bottom hole pressure history for {}'.format(well_id))
-    headers = self._get_headers()
     params = {}
     if refresh:
       params['refresh'] = refresh
-    result = self.session.get('{}/v1/wells/{}/flowing-bottom-hole-pressure'.format(self.url, well_id), headers=headers, params=params)
-    if result.status_code == 200:
-      data = result.json()
-      logger.debug('flowing bottom hole pressure history: {}'.format(data))
-      return data
-    else:
-      raise Client_Exception('Unable to retrieve flowing bottom hole pressure history')
+    return self._request('GET', '/v1/wells/{}/flowing-bottom-hole-pressure', well_id, params=params, error='Unable to retrieve flowing bottom hole pressure history')
 
   def get_financials_categories(self):
-    logger.debug('Getting financials categories')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/financials-categories'.format(self.url), headers=headers)
+    return self._request('GET', '/v1/financials-categories', error='Unable to retrieve financials categories')
 
-    if result.status_code == 200:
-      categories = result.json()
-      logger.debug('Financials Categories: {}'.format(categories))
-      return categories
-    else:
-      raise Client_Exception('Unable to retrieve financials categories')
-
-  def post_financials_category(self, category):
-    logger.debug('Creating financials category {}'.format(category))
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/financials-categories'.format(self.url), headers=headers, json=category)
-    if result.status_code == 201:
-      created = result.json()
-      logger.debug('Financials Category: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to create financials categories')
-
-  def post_financials_category_price(self, price):
-    logger.debug('Creating financials category price {}'.format(price))
-    headers = self._get_headers()
-    result = self.session.post('{}/v1/financials-categories-price'.format(self.url), headers=headers, json=price)
-    if result.status_code == 201:
-      created = result.json()
-      logger.debug('Financials Category Price: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to create financials categories price')
+  def post_financials_category(self, category, idempotency_key = None):
+    return self._request('POST', '/v1/financials-categories', json=category, expected=(201,), idempotency_key=idempotency_key, error='Unable to create financials categories')
+
+  def post_financials_category_price(self, price, idempotency_key = None):
+    return self._request('POST', '/v1/financials-categories-price', json=price, expected=(201,), idempotency_key=idempotency_key, error='Unable to create financials categories price')
 
   def get_well_financials_category_prices(self, date, well_ids = None):
-    logger.debug('Getting financials categories prices')
-    headers = self._get_headers()
     params = {'date': date}
     if well_ids:
       params['well_ids'] = well_ids
-    result = self.session.get('{}/v1/financials-categories-well-price'.format(self.url), headers=headers, params=params)
-
-    if result.status_code == 200:
-      categories = result.json()
-      logger.debug('Financials Categories: {}'.format(categories))
-      return categories
-    else:
-      raise Client_Exception('Unable to retrieve financials categories')
+    return self._request('GET', '/v1/financials-categories-well-price', params=params, error='Unable to retrieve financials categories')
 
   def put_financials(self, type, type_id, month, financials):
-    logger.debug('Putting financials for {} {} {}'.format(type, type_id, month))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/financials/{}/{}/{}'.format(self.url, type, type_id, month), headers=headers, json=financials)
-    if result.status_code not in [200, 201]:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to put financials')
-
-  def get_financials(self, asset_type = 'wells', type = 'production', well_ids = None, facility_ids = None, lease_ids = None, start_date = None, end_date = None, start_month = None, end_month = None):
-    logger.debug('Getting type financials')
-    headers = self._get_headers()
-    params = {'asset_type': asset_type}
+    self._request('PUT', '/v1/financials/{}/{{}}/{{}}'.format(type), type_id, month, json=financials, expected=(200, 201), decode=None, error='Unable to put financials')
+
+  def get_financials(self, asset_type = 'wells', type = 'production', well_ids = None, facility_ids = None, lease_ids = None, start_date = None, end_date = None, start_month = None, end_month = None,
+                     stream = False):
     params = {'type': type}
     if well_ids:
       params['well_ids'] = well_ids
@@ -943,33 +910,15 @@ class Client():
       params['start_month'] = start_month
     if end_month:
       params['end_month'] = end_month
-    result = self.session.get('{}/v1/financials/{}'.format(self.url, asset_type), headers=headers, params=params)
-    if result.status_code == 200:
-      financials = result.json()
-      logger.debug('type financials: {}'.format(financials))
-      return financials
-    else:
-      raise Client_Exception('Unable to retrieve type financials')
+    return self._request('GET', '/v1/financials/{}'.format(asset_type), params=params, decode='stream' if stream else 'json', error='Unable to retrieve type financials')
 
   def put_facility_config(self, facility_id, config):
-    logger.debug('Putting config for {}'.format(facility_id))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/facilities/{}/config'.format(self.url, facility_id), headers=headers, json=config)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to put facility config')
+    self._request('PUT', '/v1/facilities/{}/config', facility_id, json=config, expected=(201,), decode=None, error='Unable to put facility config')
 
   def put_facility_sales(self, facility_id, month, sales):
-    logger.debug('Putting sales for {} {}'.format(facility_id, month))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/facilities/sales/{}/{}'.format(self.url, facility_id, month), headers=headers, json=sales)
-    if result.status_code not in [200, 201]:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to put sales')
+    self._request('PUT', '/v1/facilities/sales/{}/{}', facility_id, month, json=sales, expected=(200, 201), decode=None, error='Unable to put sales')
 
   def list_well_sales(self, well_ids=None, start_date=None, end_date=None):
-    logger.debug('Getting well sales')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -977,47 +926,30 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/wells/sales/daily'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_sales = result.json()
-      logger.debug('Well production: {}'.format(well_sales))
-      return well_sales
-    else:
-      raise Client_Exception('Unable to retrieve well sales')
+    return self._request('GET', '/v1/wells/sales/daily', params=params, error='Unable to retrieve well sales')
 
   def put_well_config(self, well_id, config):
-    logger.debug('Putting config for {}'.format(well_id))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/wells/{}/config'.format(self.url, well_id), headers=headers, json=config)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Client_Exception('Unable to put well config')
+    self._request('PUT', '/v1/wells/{}/config', well_id, json=config, expected=(201,), decode=None, error='Unable to put well config')
     
   def get_strapping_table(self, asset_id, type = 'tanks'):
-    logger.debug('Getting strapping table for {} of type: {}'.format(asset_id, type))
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/{}/{}/strapping'.format(self.url, type, asset_id), headers=headers)
-    if result.status_code == 200:
-      strapping_table = result.content.decode()
-      logger.debug('Strapping Table: {}'.format(strapping_table))
-      reader = csv.reader(strapping_table.split('\n'), delimiter=',')
-      strapping_table = {float(row[0]):float(row[1]) for row in reader}
-      logger.debug('Strapping Table: {}'.format(strapping_table))
-      return strapping_table
-    else:
-      raise Client_Exception('Unable to retrieve strapping table for asset {} of type {}'.format(asset_id, type))
+    strapping_table = self._request('GET', '/v1/{}/{{}}/strapping'.format(type), asset_id, decode='text', error='Unable to retrieve strapping table for asset {} of type {}'.format(asset_id, type))
+    return dict(parse_strapping_csv(strapping_table))
+
+  def get_tank_strapping_table(self, asset_id, type = 'tanks', refresh = False):
+    """`StrappingTable` of a tank, downloaded once and reused for `STRAPPING_TABLE_TTL` seconds unless `refresh`."""
+    key = (type, asset_id)
+    cached = self._strapping_tables.get(key)
+    if cached is not None and not refresh and time.monotonic() - cached[1] < STRAPPING_TABLE_TTL:
+      return cached[0]
+    strapping_table = self._request('GET', '/v1/{}/{{}}/strapping'.format(type), asset_id, decode='text', error='Unable to retrieve strapping table for asset {} of type {}'.format(asset_id, type))
+    table = StrappingTable.from_csv(strapping_table)
+    self._strapping_tables[key] = (table, time.monotonic())
+    return table
 
   def batch_put_well_datapoint(self, datapoint):
-    logger.debug('Creating well datapoint for {}'.format(datapoint))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/wells/datapoint'.format(self.url), headers=headers, json=datapoint)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to batch create well datapoint')
+    self._request('PUT', '/v1/wells/datapoint', json=datapoint, expected=(201,), decode=None, error='Unable to batch create well datapoint')
 
   def get_well_datapoint(self, well_ids = None, datapoints = None, timestamps = None):
-    logger.debug('Getting well datapoint')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -1025,28 +957,12 @@ class Client():
       params['datapoints'] = datapoints
     if timestamps:
       params['timestamps'] = timestamps
-    result = self.session.get('{}/v1/wells/datapoint'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      well_datapoint = result.json()
-      logger.debug('Well datapoint: {}'.format(well_datapoint))
-      return well_datapoint
-    else:
-      raise Client_Exception('Unable to retrieve well datapoint')
+    return self._request('GET', '/v1/wells/datapoint', params=params, error='Unable to retrieve well datapoint')
       
   def get_custom_reports(self):
-    logger.debug('Getting custom reports list')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/custom_reports'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('custom reports: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to retrieve custom reports list')
+    return self._request('GET', '/v1/custom_reports', error='Unable to retrieve custom reports list')
     
   def list_facility_production(self, facility_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting facility production list')
-    headers = self._get_headers()
     params = {}
     if facility_ids:
       params['facility_ids'] = facility_ids
@@ -1054,17 +970,9 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/facilities/production'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('facility production: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to retrieve facility production')
+    return self._request('GET', '/v1/facilities/production', params=params, error='Unable to retrieve facility production')
   
   def list_facility_daily_sales(self, facility_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting facility daily sales')
-    headers = self._get_headers()
     params = {}
     if facility_ids:
       params['facility_ids'] = facility_ids
@@ -1072,17 +980,9 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/facilities/sales/daily'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('facility daily sales: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to retrieve facility daily sales')
+    return self._request('GET', '/v1/facilities/sales/daily', params=params, error='Unable to retrieve facility daily sales')
   
   def list_report_tank_gauge(self, well_ids = None, start_date = None, end_date = None):
-    logger.debug('Getting tank gauge report list')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
@@ -1090,17 +990,48 @@ class Client():
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v1/wells/report/tank-gauge'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('custom reports: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to retrieve tank gauge report list')
+    return self._request('GET', '/v1/wells/report/tank-gauge', params=params, error='Unable to retrieve tank gauge report list')
+
+  def iter_sharded(self, report, start_date, end_date, shard_days = 31, ids_per_shard = None, max_workers = 4, date_field = 'date', key = row_key, **kwargs):
+    """Fetches a long report span as parallel shards and yields the rows in date order.
+
+    `report` names one of `SHARDABLE_REPORTS`, the other keyword arguments are
+    passed to it. Each shard covers at most `shard_days` days and, with
+    `ids_per_shard`, that many ids of its `*_ids` argument. Rows of a window are
+    yielded once its shards completed, de-duplicated by `key`.
+
+      for row in client.iter_sharded('list_well_production', '2020-01-01', '2024-12-31', well_ids=well_ids, ids_per_shard=50):
+        ...
+    """
+    if report not in SHARDABLE_REPORTS:
+      raise Client_Exception('{} cannot be sharded'.format(report))
+    check_span(start_date, end_date)
+    return iter_sharded(getattr(self, report), start_date, end_date, shard_days, ids_per_shard, max_workers, date_field, key, **kwargs)
+
+  def export(self, report, path, format = None, columns = None, shard_days = None, batch_size = 10000, schema = None, ignore_extra = False, **kwargs):
+    """Streams the rows of a report into a CSV, NDJSON, Arrow IPC or Parquet file, returns the number of rows.
+
+    `report` names one of `EXPORTABLE_REPORTS`, the other keyword arguments are
+    passed to it. The response is parsed incrementally and each row is written
+    as it arrives, or with `shard_days` fetched window by window through
+    `iter_sharded`, which holds the rows of the current window and of up to
+    `max_workers` (4) shards ahead. The format defaults to the one of the file extension,
+    `columns`, `schema` and `ignore_extra` are those of `RowWriter`.
+
+      client.export('list_well_daily_warehouse', 'warehouse.parquet', start_date='2020-01-01', end_date='2024-12-31', shard_days=31)
+    """
+    if report not in EXPORTABLE_REPORTS:
+      raise Client_Exception('{} cannot be exported'.format(report))
+    format = export_format(path, format)
+    if shard_days:
+      start_date, end_date = kwargs.pop('start_date', None), kwargs.pop('end_date', None)
+      check_span(start_date, end_date)
+      rows = self.iter_sharded(report, start_date, end_date, shard_days, **kwargs)
+    else:
+      rows = getattr(self, report)(stream=True, **kwargs)
+    return export_rows(rows, path, format, columns, batch_size, schema, ignore_extra)
 
   def list_monthly_oil_report(self, facility_ids = None, start_month = None, end_month = None):
-    logger.debug('Getting oil report list')
-    headers = self._get_headers()
     params = {}
     if facility_ids:
       params['facility_ids'] = facility_ids
@@ -1108,191 +1039,75 @@ class Client():
       params['start_month'] = start_month
     if end_month:
       params['end_month'] = end_month
-    result = self.session.get('{}/v1/facilities/report/oil'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('oil reports: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to retrieve oil report list')
+    return self._request('GET', '/v1/facilities/report/oil', params=params, error='Unable to retrieve oil report list')
 
-  def send_sms(self, to_numbers, sms_text):
-    logger.debug('Sending sms to {}'.format(to_numbers))
-    headers = self._get_headers()
+  def send_sms(self, to_numbers, sms_text, idempotency_key = None):
     body = { 'to_numbers': to_numbers, 'text': sms_text }
-    result = self.session.post('{}/v1/sms'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      response = result.json()
-      return response
-    else:
-      raise Client_Exception('Unable to send sms')
+    return self._request('POST', '/v1/sms', json=body, idempotency_key=idempotency_key, error='Unable to send sms')
   
   def get_today_predicted(self, well_ids = None, refresh = False):
-    logger.debug('Getting today predicted')
-    headers = self._get_headers()
     params = {}
     if well_ids:
       params['well_ids'] = well_ids
     if refresh:
       params['refresh'] = refresh
-    result = self.session.get('{}/v1/wells/production/today-prediction'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      response = result.json()
-      logger.debug('Today predicted: {}'.format(response))
-      return response
-    else:
-      raise Client_Exception('Unable to retrieve today predicted')    
+    return self._request('GET', '/v1/wells/production/today-prediction', params=params, error='Unable to retrieve today predicted')
 
-  def get_cimarron_raw_data(self, customer, start_date = None, end_date = None):
-    logger.debug('Getting data for cimarron')
-    headers = self._get_headers()
+  def get_cimarron_raw_data(self, customer, start_date = None, end_date = None, stream = False):
     params = {}
     params['customer'] = customer
     if start_date:
       params['start_date'] = start_date
     if end_date:
       params['end_date'] = end_date
-    result = self.session.get('{}/v2/cimarron-raw-data'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      reports = result.json()
-      logger.debug('cimarron data: {}'.format(reports))
-      return reports
-    else:
-      raise Client_Exception('Unable to load cimarron raw data')
+    return self._request('GET', '/v2/cimarron-raw-data', params=params, decode='stream' if stream else 'json', error='Unable to load cimarron raw data')
 
-  def post_cimarron_raw_data(self, body):
-    logger.debug('saving data {}'.format(body))
-    headers = self._get_headers()
-    result = self.session.post('{}/v2/cimarron-raw-data'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('Cimarron raw data: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to save Cimarron raw data')
+  def post_cimarron_raw_data(self, body, idempotency_key = None):
+    return self._request('POST', '/v2/cimarron-raw-data', json=body, idempotency_key=idempotency_key, error='Unable to save Cimarron raw data')
   
   def get_scheduled_data(self, customer, month = None):
-    logger.debug('Getting scheduled data for cimarron')
-    headers = self._get_headers()
     params = {}
     params['customer_id'] = customer
     if month:
       params['month'] = month
-    result = self.session.get('{}/v2/scheduled-data'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      scheduled_data = result.json()
-      logger.debug('cimarron scheduled data: {}'.format(scheduled_data))
-      return scheduled_data
-    else:
-      raise Client_Exception('Unable to load cimarron scheduled data')
+    return self._request('GET', '/v2/scheduled-data', params=params, error='Unable to load cimarron scheduled data')
  
   def get_vru_status_code(self, codeType):
-    logger.debug('Getting vru compressors status code')
-    headers = self._get_headers()
     params = {}
     if codeType:
       params['key'] = codeType
-    result = self.session.get('{}/v1/vru-compressors-status-code'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      status_codes = result.json()
-      logger.debug('vru compressors status code: {}'.format(status_codes))
-      return status_codes
-    else:
-      raise Client_Exception('Unable to get vru compressors status code')
+    return self._request('GET', '/v1/vru-compressors-status-code', params=params, error='Unable to get vru compressors status code')
 
   def get_collection_config(self, customer_label, facility_id):
-    logger.debug('Getting collection config')
-    headers = self._get_headers()
     params = {}
     params['customer_label'] = customer_label
     params['facility_id'] = facility_id
-    result = self.session.get('{}/v1/collection-config'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      config = result.json()
-      logger.debug('Collection config: {}'.format(config))
-      return config
-    else:
-      raise Client_Exception('Unable to get collection config')
+    return self._request('GET', '/v1/collection-config', params=params, error='Unable to get collection config')
 
   def put_facility_production(self, body):
-    logger.debug('saving data {}'.format(body))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/facilities/production'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('facility production: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to save facility production data')
+    return self._request('PUT', '/v1/facilities/production', json=body, error='Unable to save facility production data')
     
   def put_facility_daily_sales(self, body):
-    logger.debug('saving data {}'.format(body))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/facilities/sales/daily'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('facility sales: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to save facility sales data')
+    return self._request('PUT', '/v1/facilities/sales/daily', json=body, error='Unable to save facility sales data')
 
-  def put_tank_production(self, body):
-    logger.debug('saving data {}'.format(body))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/tanks/production'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('tank production: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to save tank production data')
+  def put_tank_production(self, body, idempotency_key = None):
+    return self._request('PUT', '/v1/tanks/production', json=body, idempotency_key=idempotency_key, error='Unable to save tank production data')
     
   def put_tank_daily_sales(self, body):
-    logger.debug('saving data {}'.format(body))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/tanks/sales/daily'.format(self.url), headers=headers, json=body)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('tank sales: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to save tank sales data')
+    return self._request('PUT', '/v1/tanks/sales/daily', json=body, error='Unable to save tank sales data')
 
   def get_customer_setting(self, key: str):
-    logger.debug('Getting collection config')
-    headers = self._get_headers()
     params = {}
     params['key'] = key
-    result = self.session.get('{}/v1/customers/setting'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      config = result.json()
-      logger.debug('Customers setting: {}'.format(config))
-      return config
-    else:
-      raise Client_Exception('Unable to get customers setting')
+    return self._request('GET', '/v1/customers/setting', params=params, error='Unable to get customers setting')
 
   def get_wells_setting(self):
-    logger.debug('Getting wells setting')
-    headers = self._get_headers()
-    result = self.session.get('{}/v1/wells/setting'.format(self.url), headers=headers)
-    if result.status_code == 200:
-      setting = result.json()
-      logger.debug('Wells setting: {}'.format(setting))
-      return setting
-    else:
-      return {}
+    return self._request('GET', '/v1/wells/setting', error=None) or {}
     
   def batch_put_production_field_team_with_avocet(self, production):
-    logger.debug('Creating well production by field team for {}'.format(production))
-    headers = self._get_headers()
-    result = self.session.put('{}/v2/production/field-team-with-avocet'.format(self.url), headers=headers, json=production)
-    if result.status_code != 201:
-      logger.exception(result.json())
-      raise Exception('Unable to batch create well production by field team')
+    self._request('PUT', '/v2/production/field-team-with-avocet', json=production, expected=(201,), decode=None, error='Unable to batch create well production by field team')
   
   def get_setpoint_alarm_incidents(self,asset_id: str = None, datatype_id: str = None, status: str = None, start_time: int = None, end_time: int = None):
-    logger.debug('Getting alarms')
-    headers = self._get_headers()
     params = {}
     if asset_id:
       params['asset_id'] = asset_id
@@ -1304,37 +1119,17 @@ class Client():
       params['start_time'] = start_time
     if end_time:
       params['end_date'] = end_time
-    result =  self.session.get('{}/v1/alarms-incidents'.format(self.url), headers=headers, params=params)
-    if result.status_code == 200:
-      alarms = result.json()
-      logger.debug('Alarms: {}'.format(alarms))
-      return alarms
-    else:
-      raise Client_Exception('Unable to retrieve alarms')
+    return self._request('GET', '/v1/alarms-incidents', params=params, error='Unable to retrieve alarms')
   
   def post_setpoint_alarm_incidents(self, incidents):
-    logger.debug('Creating Alarm Incidents {}'.format(incidents))
-    headers = self._get_headers()
-    result = self.session.put('{}/v1/alarms-incidents'.format(self.url), headers=headers, json=incidents)
-    if result.status_code == 200:
-      created = result.json()
-      logger.debug('Alarms Incidents: {}'.format(created))
-      return created
-    else:
-      raise Client_Exception('Unable to create Alarm Incidents')
+    return self._request('PUT', '/v1/alarms-incidents', json=incidents, error='Unable to create Alarm Incidents')
     
   def get_asset_inflections(self, asset_id, start_ts , end_ts, datatypes=[]):
-    logger.debug('Getting inflections for asset: {}'.format(asset_id))
-    headers = self._get_headers()
     params = {}
     params['start_ts'] = start_ts
     params['end_ts'] = end_ts
     if datatypes:
       params['datatypes'] = datatypes
-    result = self.session.get('{}/v1/wells/{}/analyse-inflection-points'.format(self.url, asset_id), headers=headers, params=params)
-    if result.status_code == 200:
-      datapoints = result.json()
-      logger.debug('Datapoints: {}'.format(datapoints))
-      return datapoints
-    else:
-      raise Client_Exception('Unable to get inflection regions')
\ No newline at end of file
+    return self._request('GET', '/v1/wells/{}/analyse-inflection-points', asset_id, params=params, error='Unable to get inflection regions')
+
+from .async_client import AsyncClient  # noqa: E402
@@ -0,0 +1,1181 @@
+import asyncio
+import base64
+import copy
+import itertools
+import json
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from urllib.parse import urlencode, urlparse
+
+try:
+  import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+  aiohttp = None
+
+from . import STRAPPING_TABLE_TTL, STREAM_CHUNK_SIZE, Client_Exception, _DatapointPager, _LogPayload, _map_call, logger
+from .auth import Token, TokenManager, token_cache_key
+from .columnar import Series, to_columnar
+from .export import EXPORTABLE_REPORTS, RowWriter, export_format
+from .jsonstream import JsonArrayParser
+from .jsonstream import loads as _default_loads
+from .sharding import SHARDABLE_REPORTS, RowMerger, check_span, row_key, shard_calls
+from .strapping import StrappingTable, parse_strapping_csv
+from .uploads import CHUNK_SIZE, guess_content_type, is_path, remaining_size, upload_job
+from .transport import DEFAULT_RETRY_POLICIES, IDEMPOTENCY_KEY_HEADER, CircuitBreaker, is_failure_status, select_retry_policy
+
+
+def _encode_params(params):
+  # aiohttp only accepts str/int/float values, requests also expands lists
+  # into repeated keys and renders booleans as 'True'/'False'.
+  if not params:
+    return None
+  encoded = []
+  for key, value in params.items():
+    values = value if isinstance(value, (list, tuple)) else [value]
+    for item in values:
+      if item is None:
+        continue
+      if isinstance(item, bool) or not isinstance(item, (int, float)):
+        item = str(item)
+      encoded.append((key, item))
+  return encoded
+
+
+class _Unlimited():
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    return False
+
+
+def _limiter(max_workers):
+  # Caps the calls `map` runs at once, without `max_workers` only `max_concurrency` bounds the requests
+  return asyncio.Semaphore(max_workers) if max_workers else _Unlimited()
+
+
+class _Response():
+  """Fully read response, exposing the subset of the requests API used by the client methods."""
+
+  def __init__(self, status_code, headers, content):
+    self.status_code = status_code
+    self.headers = headers
+    self.content = content
+
+  @property
+  def text(self):
+    return self.content.decode()
+
+  def json(self):
+    return json.loads(self.content.decode())
+
+
+class _FileBody():
+  """Request body streamed from a file path or file object, read again from the start on every attempt."""
+
+  def __init__(self, source):
+    self.source = source
+    self.position = None
+    if is_path(source):
+      self.size = os.path.getsize(source)
+    else:
+      try:
+        self.position = source.tell()
+      except (AttributeError, OSError):
+        pass
+      self.size = remaining_size(source)
+    self.replayable = is_path(source) or self.position is not None
+
+  def __call__(self):
+    return self._chunks()
+
+  async def _chunks(self):
+    if is_path(self.source):
+      with open(self.source, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+          yield chunk
+      return
+    if self.position is not None:
+      self.source.seek(self.position)
+    for chunk in iter(lambda: self.source.read(CHUNK_SIZE), b''):
+      yield chunk
+
+
+def _release_stream(response, release):
+  response.release()
+  release()
+
+
+class _StreamedResponse():
+  """Successful response whose body is read by the caller, it holds a concurrency slot until closed.
+
+  A response dropped without being closed gives its slot back once it is
+  garbage collected, so an abandoned stream cannot starve the client.
+  """
+
+  def __init__(self, response, release):
+    self.status_code = response.status
+    self.headers = response.headers
+    self.response = response
+    self._finalizer = weakref.finalize(self, _release_stream, response, release)
+
+  def iter_chunks(self, size):
+    return self.response.content.iter_chunked(size)
+
+  def close(self):
+    # A finalizer runs at most once, closing twice is harmless
+    self._finalizer()
+
+
+class _StreamedRows():
+  """Async iterator over the rows of a streamed response, also an async context manager closing it.
+
+    async with await client.list_well_production(stream=True) as rows:
+      async for row in rows:
+        ...
+  """
+
+  def __init__(self, rows):
+    self._rows = rows
+
+  def __aiter__(self):
+    return self
+
+  def __anext__(self):
+    return self._rows.__anext__()
+
+  async def aclose(self):
+    await self._rows.aclose()
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    await self.aclose()
+
+
+class AsyncClient():
+  """asyncio counterpart of `Client`.
+
+  Every `Client` method is available as a coroutine with the same arguments,
+  return values and `Client_Exception` errors. `max_concurrency` caps the number
+  of requests in flight at any time, so thousands of calls can be scheduled
+  with `asyncio.gather` on a single event loop. Token handling (lazy
+  authentication, refresh before expiry, one replay on 401 and `token_cache`),
+  `retry_policies`, `circuit_breaker`, `response_cache`, `json_loads` and
+  `stream=True` match `Client`, streamed rows are yielded by an async iterator.
+  A stream holds one of the `max_concurrency` slots until it is exhausted or
+  closed, iterate it inside `async with` when it may be left unfinished.
+  `metrics` records every request like it does for `Client`, except for request
+  body sizes.
+
+    async with AsyncClient(url, client_id, client_secret) as client:
+      statuses = await asyncio.gather(*[client.get_alarm(asset_id) for asset_id in asset_ids])
+  """
+
+  def __init__(self, url, client_id, client_secret, customer_id = None, max_concurrency = 100, token_cache = None, token_refresh_margin = 60,
+               retry_policies = None, circuit_breaker = None, response_cache = None, json_loads = None,
+               metrics = None, series_cache = None):
+    if aiohttp is None:
+      raise ImportError('AsyncClient requires aiohttp, install sotaog_public_api_client[async]')
+    self.url = url.rstrip('/')
+    self.customer_id = customer_id
+    self.max_concurrency = max_concurrency
+    self.retry_policies = DEFAULT_RETRY_POLICIES if retry_policies is None else retry_policies
+    self.circuit_breaker = CircuitBreaker() if circuit_breaker is None else circuit_breaker or None
+    self.response_cache = response_cache
+    self.json_loads = json_loads or _default_loads
+    self.series_cache = series_cache
+    self.session = None
+    self._client_id = client_id
+    self._client_secret = client_secret
+    self._tokens = TokenManager(token_cache_key(self.url, client_id), token_cache, token_refresh_margin)
+    self._semaphore = None
+    self._auth_lock = None
+    self.request_hooks = []
+    self._strapping_tables = {}
+    self._customer_views = {}
+    self._parent = None
+    if metrics is not None:
+      metrics.attach(self)
+    logger.info('Initializing async Sotaog API client for %s', url)
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    await self.close()
+
+  async def close(self):
+    if self._parent is not None:
+      # Customer views do not own the session
+      return
+    if self.session is not None:
+      await self.session.close()
+      self.session = None
+
+  def _get_session(self):
+    if self._parent is not None:
+      self.session = self._parent._get_session()
+      self._semaphore = self._parent._semaphore
+      self._auth_lock = self._parent._auth_lock
+      return self.session
+    # The session, semaphore and lock bind to the running loop, so they are created on first use
+    if self.session is None:
+      connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+      self.session = aiohttp.ClientSession(connector=connector)
+      self._semaphore = asyncio.Semaphore(self.max_concurrency)
+      self._auth_lock = asyncio.Lock()
+    return self.session
+
+  @property
+  def token(self):
+    token = self._tokens.current()
+    return token.access_token if token else None
+
+  async def _send(self, method, url, headers = None, params = None, json = None, data = None, stream = False):
+    session = self._get_session()
+    await self._semaphore.acquire()
+    try:
+      response = await session.request(method, url, headers=headers, params=_encode_params(params), json=json, data=data() if callable(data) else data)
+    except BaseException:
+      self._semaphore.release()
+      raise
+    if stream and response.status == 200:
+      return _StreamedResponse(response, self._semaphore.release)
+    try:
+      content = await response.read()
+    finally:
+      response.release()
+      self._semaphore.release()
+    return _Response(response.status, response.headers, content)
+
+  async def _send_authorized(self, method, url, headers = None, params = None, json = None, data = None, stream = False):
+    result = await self._send(method, url, headers=headers, params=params, json=json, data=data, stream=stream)
+    if result.status_code == 401 and headers and 'authorization' in headers:
+      logger.debug('Token rejected, re-authenticating')
+      await asyncio.get_running_loop().run_in_executor(None, self._tokens.invalidate, headers['authorization'][len('Bearer '):])
+      if isinstance(data, _FileBody) and not data.replayable:
+        return result
+      headers = dict(headers, authorization='Bearer {}'.format(await self._get_token()))
+      result = await self._send(method, url, headers=headers, params=params, json=json, data=data, stream=stream)
+    return result
+
+  async def _request(self, method, path, *path_args, params = None, json = None, data = None, headers = None, expected = (200,),
+                     decode = 'json', idempotency_key = None, retry = False, error = 'Request failed'):
+    """Counterpart of `Client._request`."""
+    url = self.url + path.format(*path_args)
+    request_headers = await self._get_headers(idempotency_key)
+    if headers:
+      request_headers.update(headers)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+      logger.debug('%s %s params=%s body=%s', method, url, _LogPayload(params), _LogPayload(json))
+    stream = decode == 'stream'
+    start = time.perf_counter()
+    try:
+      result = await self._fetch(method, url, headers=request_headers, params=params, json=json, data=data, stream=stream, retry=retry)
+    except Exception as e:
+      self._call_hooks(method, path, None, time.perf_counter() - start, e)
+      raise
+    elapsed = time.perf_counter() - start
+    self._call_hooks(method, path, result, elapsed, None)
+    if result.status_code not in expected:
+      if error is None:
+        logger.debug('%s %s returned %s', method, url, result.status_code)
+        return None
+      logger.error('%s %s returned %s: %s', method, url, result.status_code, _LogPayload(result.text))
+      raise Client_Exception(error)
+    if stream:
+      return _StreamedRows(self._stream_json(result))
+    if decode is None:
+      payload = None
+    elif decode == 'text':
+      payload = result.content.decode()
+    else:
+      payload = self.json_loads(result.content)
+    if debug:
+      logger.debug('%s %s returned %s in %.1fms: %s', method, url, result.status_code, elapsed * 1000, _LogPayload(payload))
+    return payload
+
+  async def _stream_json(self, response):
+    parser = JsonArrayParser(self.json_loads)
+    try:
+      async for chunk in response.iter_chunks(STREAM_CHUNK_SIZE):
+        for value in parser.feed(chunk):
+          yield value
+      for value in parser.close():
+        yield value
+    finally:
+      response.close()
+
+  def _call_hooks(self, method, path, response, elapsed, exception):
+    for hook in self.request_hooks:
+      try:
+        hook(method, path, response, elapsed, exception)
+      except Exception:
+        logger.exception('Request hook %r failed', hook)
+
+  async def _fetch(self, method, url, headers = None, params = None, json = None, data = None, stream = False, retry = False):
+    cache = self.response_cache
+    ttl = cache.ttl_for(url) if cache is not None and method.upper() == 'GET' and not stream else None
+    if ttl is None:
+      return await self._retrying_request(method, url, headers=headers, params=params, json=json, data=data, stream=stream, retry=retry)
+    encoded = _encode_params(params)
+    key = cache.key('{}?{}'.format(url, urlencode(encoded)) if encoded else url, (headers or {}).get('x-sotaog-customer-id'), self._client_id)
+    entry = cache.get(key)
+    if entry is not None:
+      if entry.is_fresh():
+        cache.count('hits')
+        return _Response(200, entry.headers, entry.content)
+      if entry.can_revalidate():
+        headers = dict(headers or {}, **cache.conditional_headers(entry))
+    result = await self._retrying_request(method, url, headers=headers, params=params)
+    if result.status_code == 304 and entry is not None:
+      logger.debug('Revalidated cached response for %s', url)
+      cache.count('revalidated')
+      cache.touch(entry, result.headers)
+      return _Response(200, entry.headers, entry.content)
+    cache.count('misses')
+    if result.status_code == 200:
+      cache.store(key, result.headers, result.content, ttl)
+    return result
+
+  async def _retrying_request(self, method, url, headers = None, params = None, json = None, data = None, stream = False, retry = False):
+    policy = select_retry_policy(self.retry_policies, method, headers, retry)
+    if isinstance(data, _FileBody) and not data.replayable:
+      policy = None
+    host = urlparse(url).netloc
+    attempt = 0
+    while True:
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.before_request(host)
+      try:
+        result = await self._send_authorized(method, url, headers=headers, params=params, json=json, data=data, stream=stream)
+      except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True)
+        delay = policy.get_delay(attempt, error=True) if policy else None
+        if delay is None:
+          raise
+        reason = e
+      except BaseException:
+        # Payload errors and cancellation still end a half-open trial, or the circuit would stay open for good
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True)
+        raise
+      else:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, is_failure_status(result.status_code))
+        delay = policy.get_delay(attempt, result.status_code, result.headers.get('Retry-After')) if policy else None
+        if delay is None:
+          result.retries = attempt
+          return result
+        reason = result.status_code
+      attempt += 1
+      logger.warning('Retrying %s %s in %.2fs after %s (attempt %s)', method.upper(), url, delay, reason, attempt)
+      await asyncio.sleep(delay)
+
+  async def _authenticate(self):
+    logger.debug('Authenticating to API: %s', self.url)
+    data = {
+        'grant_type': 'client_credentials'
+    }
+    # Same Basic credentials as requests sends, latin-1 encoded
+    credentials = base64.b64encode('{}:{}'.format(self._client_id, self._client_secret).encode('latin1')).decode('ascii')
+    headers = {'authorization': 'Basic {}'.format(credentials)}
+    result = await self._send('post', '{}/v1/authenticate'.format(self.url), headers=headers, data=data)
+    if result.status_code == 200:
+      token = Token.from_response(result.json())
+      logger.debug('Token expires at: %s', token.expires_at)
+      return token
+    else:
+      raise Client_Exception('Unable to authenticate to API')
+
+  async def _get_token(self):
+    token = self._tokens.current()
+    if token is None:
+      self._get_session()
+      async with self._auth_lock:
+        token = self._tokens.current() or await self._refresh_token()
+    return token.access_token
+
+  async def _refresh_token(self):
+    # Same protocol as `TokenManager.get`, with the token cache file I/O and its lock kept off the event loop
+    cache = self._tokens.cache
+    if cache is None:
+      token = await self._authenticate()
+      self._tokens.store(token)
+      return token
+    loop = asyncio.get_running_loop()
+    token = await loop.run_in_executor(None, self._tokens.cached)
+    if token is not None:
+      return token
+    lock = cache.lock(self._tokens.key)
+    acquire = loop.run_in_executor(None, lock.__enter__)
+    try:
+      await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+      # The lock is still taken by the executor thread, give it back once that happened
+      acquire.add_done_callback(lambda future: future.cancelled() or future.exception() or lock.__exit__(None, None, None))
+      raise
+    try:
+      token = await loop.run_in_executor(None, self._tokens.cached)
+      if token is None:
+        token = await self._authenticate()
+        await loop.run_in_executor(None, self._tokens.store, token)
+    finally:
+      await asyncio.shield(loop.run_in_executor(None, lock.__exit__, None, None, None))
+    return token
+
+  async def _get_headers(self, idempotency_key = None):
+    headers = {
+        'authorization': 'Bearer {}'.format(await self._get_token())
+    }
+    if self.customer_id:
+      headers['x-sotaog-customer-id'] = self.customer_id
+    if idempotency_key:
+      headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+    return headers
+
+  def for_customer(self, customer_id):
+    """View of the client sending its requests for `customer_id`, see `Client.for_customer`.
+
+    The view uses the session of the client, created on first use by either of them,
+    and closing it is a no-op.
+    """
+    view = self._customer_views.get(customer_id)
+    if view is None:
+      view = copy.copy(self)
+      view.customer_id = customer_id
+      view._parent = self._parent or self
+      view._strapping_tables = {}
+      view = self._customer_views.setdefault(customer_id, view)
+    return view
+
+  async def map_customers(self, method, customer_ids, *args, max_workers = None, **kwargs):
+    """Async counterpart of `Client.map_customers`, at most `max_workers` calls run at once and requests are bounded by `max_concurrency`."""
+    customer_ids = list(customer_ids)
+    limit = _limiter(max_workers)
+
+    async def call(customer_id):
+      view = self.for_customer(customer_id)
+      async with limit:
+        if callable(method):
+          return await method(view, *args, **kwargs)
+        return await getattr(view, method)(*args, **kwargs)
+
+    results = await asyncio.gather(*[call(customer_id) for customer_id in customer_ids], return_exceptions=True)
+    return dict(zip(customer_ids, results))
+
+  async def map(self, method, args_list, max_workers = None):
+    """Async counterpart of `Client.map`, at most `max_workers` calls run at once and requests are bounded by `max_concurrency`."""
+    if isinstance(method, str):
+      method = getattr(self, method)
+    limit = _limiter(max_workers)
+
+    async def call(args):
+      async with limit:
+        return await _map_call(method, args)
+
+    return await asyncio.gather(*[call(args) for args in args_list], return_exceptions=True)
+
+  async def get_alarm_services(self):
+    return await self._request('GET', '/v1/alarm-services', error='Unable to retrieve alarm services')
+
+  async def get_alarm_service(self, alarm_service_id):
+    return await self._request('GET', '/v1/alarm-services/{}', alarm_service_id, error='Unable to retrieve alarm service {}'.format(alarm_service_id))
+
+  async def get_alarms(self):
+    return await self._request('GET', '/v1/alarms', error='Unable to retrieve alarms')
+    
+  async def get_custom_alarms(self):
+    return await self._request('GET', '/v1/custom-alarms', error='Unable to retrieve alarms')
+  
+  async def get_custom_alarm(self,alarms_id):
+    return await self._request('GET', '/v1/custom-alarms/{}', alarms_id, error='Unable to retrieve alarms')
+  
+  async def get_custom_alarm_new(self,alarm_id):
+    return await self._request('GET', '/v2/custom-alarms-new/{}', alarm_id, error='Unable to retrieve alarms')
+
+  async def get_custom_alarms_new(self):
+    return await self._request('GET', '/v2/custom-alarms-new', error='Unable to retrieve alarms')
+
+  async def get_alarm_incidents_new(self,alarm_id,customer_id=None, asset_id=None, alarm_status=None):
+    params = {'alarm_id': alarm_id}
+    if customer_id:
+      params['customer_id'] = customer_id
+    if asset_id:
+      params['asset_id'] = asset_id
+    if alarm_status:
+      params['alarm_status'] = alarm_status
+    return await self._request('GET', '/v2/custom-alarms-incidents-new', params=params, error='Unable to retrieve alarms incidents')
+  
+  async def post_custom_alarm_incidents_new(self, incidents):
+    return await self._request('PUT', '/v2/custom-alarms-incidents-new', json=incidents, error='Unable to create Alarm Incidents')
+  
+  async def get_alarm_incidents(self,alarm_id, well_id, alarm_status):
+    params = {'alarm_id': alarm_id, 'well_id': well_id, 'alarm_status': alarm_status}
+    return await self._request('GET', '/v1/custom-alarms-incidents', params=params, error='Unable to retrieve alarms')
+  
+  async def get_alarm_notifications(self):
+    return await self._request('GET', '/v1/alarm-notifications', error='Unable to get Alarm notification')
+
+  async def post_custom_alarm_incidents(self, incidents):
+    return await self._request('PUT', '/v1/custom-alarms-incidents', json=incidents, expected=(201,), error='Unable to create Alarm Incidents')
+
+  async def get_alarm(self, asset_id, datatype = None):
+    if datatype:
+      return await self._request('GET', '/v1/alarms/{}/{}', asset_id, datatype, error='Unable to retrieve alarms for {}'.format(asset_id))
+    return await self._request('GET', '/v1/alarms/{}', asset_id, error='Unable to retrieve alarms for {}'.format(asset_id))
+
+  async def get_leases(self):
+    return await self._request('GET', '/v1/leases', error='Unable to retrieve leases')
+
+  async def get_facilities(self):
+    return await self._request('GET', '/v1/facilities', error='Unable to retrieve facilities')
+
+  async def get_facility(self, facility_id):
+    return await self._request('GET', '/v1/facilities/{}', facility_id, error='Unable to retrieve facility {}'.format(facility_id))
+
+  async def get_facility_config(self, facility_id):
+    return await self._request('GET', '/v1/facilities/{}/config', facility_id, error='Unable to retrieve config')
+
+  async def get_platforms(self):
+    return await self._request('GET', '/v1/platforms', error='Unable to retrieve platforms')
+
+  async def get_asset(self, asset_id, type = 'assets'):
+    return await self._request('GET', '/v1/{}/{{}}'.format(type), asset_id, error='Unable to retrieve asset {} of type {}'.format(asset_id, type))
+
+  async def get_assets(self, type = 'assets', facility = None, asset_type = None):
+    assets = await self._request('GET', '/v1/{}'.format(type), error='Unable to retrieve assets of type {}'.format(asset_type))
+    if facility:
+      assets = [asset for asset in assets if 'facility' in asset and asset['facility'] == facility]
+    if asset_type:
+      assets = [asset for asset in assets if 'asset_type' in asset and asset['asset_type'] == asset_type]
+    return assets
+
+  async def get_asset_type(self, asset_type_id):
+    return await self._request('GET', '/v1/asset-types/{}', asset_type_id, error='Unable to retrieve asset {}'.format(asset_type_id))
+
+  async def get_asset_types(self):
+    return await self._request('GET', '/v1/asset-types', error='Unable to get asset types')
+
+  async def get_compressors(self):
+    return await self._request('GET', '/v1/compressors', error='Unable to get compressors')
+
+    
+  async def get_vru_compressors(self):
+    return await self._request('GET', '/v1/vru-compressors', error='Unable to get compressors')
+
+  async def get_customers(self):
+    return await self._request('GET', '/v1/customers', error='Unable to get customers')
+
+  async def get_customer(self, customer_id):
+    return await self._request('GET', '/v1/customers/{}', customer_id, error='Unable to get customer {}'.format(customer_id))
+
+  async def get_datatypes(self, group_by='asset'):
+    params = {}
+    if group_by:
+      params['group_by'] = group_by
+    return await self._request('GET', '/v1/datatypes', params=params, error='Unable to get datatypes')
+
+  async def get_datatype(self, datatype_id):
+    params = {'group_by': 'asset'}
+    return await self._request('GET', '/v1/datatypes/{}', datatype_id, params=params, error='Unable to get datatype {}'.format(datatype_id))
+
+  async def get_datapoints(self, asset_datatypes, start_ts = None, end_ts = None, sort = 'desc', limit = 100, format = 'json'):
+    """With `format='columnar'` every series is returned as a `Series` of int64 timestamps and float64 values."""
+    body = {
+        'asset_datatypes': asset_datatypes
+    }
+    if start_ts:
+      body['start_ts'] = start_ts
+    if end_ts:
+      body['end_ts'] = end_ts
+    if sort:
+      body['sort'] = sort
+    if limit:
+      body['limit'] = limit
+    # A read sent as POST, safe to retry like a GET
+    datapoints = await self._request('POST', '/v1/datapoints', json=body, retry=True, error='Unable to get datapoints')
+    if format == 'columnar':
+      return to_columnar(datapoints)
+    return datapoints
+
+  async def iter_datapoints(self, asset_datatypes, start_ts = None, end_ts = None, sort = 'asc', page_size = 100):
+    """Async generator counterpart of `Client.iter_datapoints`."""
+    pager = _DatapointPager(start_ts, end_ts, sort, page_size)
+    while not pager.done:
+      datapoints = await self.get_datapoints(asset_datatypes, start_ts=pager.start_ts, end_ts=pager.end_ts, sort=sort, limit=page_size)
+      for point in pager.consume(datapoints):
+        yield point
+
+  async def get_oil_gas_price(self, start_date = None, end_date = None):
+    params = {}
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/financials/oil-gas-price', params=params, error='Unable to retrieve Oil Gas prices')
+
+  async def get_oil_gas_future_price(self, start_month = None, end_month = None):
+    params = {}
+    if start_month:
+      params['start_month'] = start_month
+    if end_month:
+      params['end_month'] = end_month
+    return await self._request('GET', '/v1/financials/oil-gas-future-price', params=params, error='Unable to retrieve Oil Gas prices')
+
+  async def put_oil_gas_future_price(self, body):
+    return await self._request('PUT', '/v1/financials/oil-gas-future-price', json=body, error='Unable to retrieve Oil Gas prices')
+
+  async def get_asset_datapoints(self, asset_id, datatypes = [], start_ts = None, end_ts = None, sort = 'desc', limit = 100, format = 'json'):
+    """With `format='columnar'` every series is returned as a `Series` of int64 timestamps and float64 values."""
+    params = {}
+    if datatypes:
+      params['datatypes'] = datatypes
+    if start_ts:
+      params['start_ts'] = start_ts
+    if end_ts:
+      params['end_ts'] = end_ts
+    if sort:
+      params['sort'] = sort
+    if limit:
+      params['limit'] = limit
+    datapoints = await self._request('GET', '/v1/datapoints/{}', asset_id, params=params, error='Unable to get datapoints')
+    if format == 'columnar':
+      return to_columnar(datapoints)
+    return datapoints
+
+  async def iter_asset_datapoints(self, asset_id, datatypes = [], start_ts = None, end_ts = None, sort = 'asc', page_size = 100):
+    """Async generator counterpart of `Client.iter_asset_datapoints`."""
+    pager = _DatapointPager(start_ts, end_ts, sort, page_size)
+    while not pager.done:
+      datapoints = await self.get_asset_datapoints(asset_id, datatypes, start_ts=pager.start_ts, end_ts=pager.end_ts, sort=sort, limit=page_size)
+      for point in pager.consume(datapoints):
+        yield point
+
+  async def get_asset_series(self, asset_id, datatypes, start_ts, end_ts, page_size = 1000):
+    cache = self.series_cache
+    if cache is None:
+      return await self._fetch_series(asset_id, datatypes, start_ts, end_ts, page_size)
+    groups = {}
+    for datatype in datatypes:
+      groups.setdefault(tuple(cache.missing(asset_id, datatype, start_ts, end_ts)), []).append(datatype)
+    for gaps, group in groups.items():
+      for gap_start, gap_end in gaps:
+        fetched = await self._fetch_series(asset_id, group, gap_start, gap_end, page_size)
+        for datatype in group:
+          cache.write(asset_id, datatype, fetched[datatype], gap_start, gap_end)
+    return {datatype: cache.read(asset_id, datatype, start_ts, end_ts) for datatype in datatypes}
+
+  async def get_series(self, asset_datatypes, start_ts, end_ts, page_size = 1000):
+    series = await asyncio.gather(*[self.get_asset_series(asset_id, datatypes, start_ts, end_ts, page_size) for asset_id, datatypes in asset_datatypes.items()])
+    return dict(zip(asset_datatypes, series))
+
+  async def _fetch_series(self, asset_id, datatypes, start_ts, end_ts, page_size):
+    points = {datatype: [] for datatype in datatypes}
+    async for datatype, ts, value in self.iter_asset_datapoints(asset_id, datatypes, start_ts=start_ts, end_ts=end_ts, sort='asc', page_size=page_size):
+      points.setdefault(datatype, []).append((ts, value))
+    return {datatype: Series.from_points(series) for datatype, series in points.items()}
+
+  async def get_swd_networks(self, facility = None):
+    swd_networks = await self._request('GET', '/v1/swd-networks', error='Unable to retrieve SWD networks')
+    if facility:
+      swd_networks = [swd_network for swd_network in swd_networks if facility in swd_network['facilities']]
+    return swd_networks
+
+  async def get_truck_tickets(self, facility = None, type = None, start_ts = None, end_ts = None, stream = False):
+    params = {}
+    if start_ts:
+      params['start_ts'] = start_ts
+    if end_ts:
+      params['end_ts'] = end_ts
+    if type:
+      params['type'] = type
+    if facility:
+      params['facility'] = facility
+    return await self._request('GET', '/v1/truck-tickets', params=params, decode='stream' if stream else 'json', error='Unable to retrieve truck tickets')
+
+  async def get_auto_truck_tickets(self, facility = None, type = None, start_ts = None, end_ts = None):
+    params = {}
+    if start_ts:
+      params['start_ts'] = start_ts
+    if end_ts:
+      params['end_ts'] = end_ts
+    if type:
+      params['type'] = type
+    if facility:
+      params['facility'] = facility
+    return await self._request('GET', '/v1/auto-truck-tickets', params=params, error='Unable to retrieve truck tickets')
+
+  async def post_truck_ticket(self, truck_ticket, idempotency_key = None):
+    return await self._request('POST', '/v1/truck-tickets', json=truck_ticket, expected=(201,), idempotency_key=idempotency_key, error='Unable to create truck ticket')
+
+  async def post_auto_truck_ticket(self, truck_ticket, idempotency_key = None):
+    return await self._request('POST', '/v1/auto-truck-tickets', json=truck_ticket, expected=(201,), idempotency_key=idempotency_key, error='Unable to create auto truck ticket')
+
+  async def put_truck_ticket(self, truck_ticket_id, timestamp,  truck_ticket, idempotency_key = None):
+    await self._request('POST', '/v1/truck-tickets/{}/{}', truck_ticket_id, timestamp, json=truck_ticket, expected=(200, 201), decode=None, idempotency_key=idempotency_key, error='Unable to update truck-ticket')
+
+  async def put_truck_ticket_image(self, truck_ticket_id, timestamp, image, content_type = None):
+    headers = {'content-type': content_type or guess_content_type(image)}
+    if not isinstance(image, (bytes, bytearray, memoryview)):
+      image = _FileBody(image)
+      if image.size is not None:
+        headers['content-length'] = str(image.size)
+    await self._request('PUT', '/v1/truck-tickets/{}/{}/image', truck_ticket_id, timestamp, headers=headers, data=image, expected=(204,), decode=None, error='Unable to create truck ticket image')
+
+  async def put_truck_ticket_images(self, jobs, content_type = None, max_workers = 8):
+    """Async generator counterpart of `Client.put_truck_ticket_images`, `max_workers` uploads run at once."""
+    async def upload(job):
+      truck_ticket_id, timestamp, image, job_content_type = upload_job(job, content_type)
+      try:
+        await self.put_truck_ticket_image(truck_ticket_id, timestamp, image, job_content_type)
+      except Exception as e:
+        return truck_ticket_id, timestamp, e
+      return truck_ticket_id, timestamp, None
+
+    pending = set()
+    try:
+      for job in jobs:
+        if len(pending) >= max_workers:
+          done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+          for task in done:
+            yield task.result()
+        pending.add(asyncio.ensure_future(upload(job)))
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          yield task.result()
+    finally:
+      for task in pending:
+        task.cancel()
+
+  async def put_alarm(self, asset_id, datatype, alarm):
+    await self._request('PUT', '/v1/alarms/{}/{}', asset_id, datatype, json=alarm, expected=(201,), decode=None, error='Unable to create alarm')
+
+  async def post_datapoints(self, asset_id, datapoints, idempotency_key = None):
+    await self._request('POST', '/v1/datapoints/{}', asset_id, json=datapoints, expected=(202,), decode=None, idempotency_key=idempotency_key, error='Unable to post datapoints')
+
+  """
+    Write datapoints for multiple entities in a single request.
+    
+    Expected body format:
+    {
+        "entities": {
+            "entity_id_1": {
+                "datatype_1": [[timestamp1, value1], [timestamp2, value2]],
+                "datatype_2": [[timestamp1, value1], [timestamp2, value2]]
+            },
+            "entity_id_2": {
+                "datatype_1": [[timestamp1, value1], [timestamp2, value2]]
+            }
+        }
+    }
+  """
+  async def batch_multiple_datapoints(self, datapoints, idempotency_key = None):
+    await self._request('POST', '/v1/datapoints/multiple', json=datapoints, expected=(202,), decode=None, idempotency_key=idempotency_key, error='Unable to post multiple datapoints')
+
+  async def batch_put_well_production(self, production, idempotency_key = None):
+    await self._request('PUT', '/v1/wells/production', json=production, expected=(201,), decode=None, idempotency_key=idempotency_key, error='Unable to batch create well production')
+  
+  async def get_compressors_downtime(self, compressor_ids = None, facility_ids = None, start_date = None, end_date = None):
+    params = {}
+    if compressor_ids:
+      params['compressor_ids'] = compressor_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/compressors/downtime', params=params, error='Unable to retrieve compressor downtime')
+    
+  async def put_compressor_downtime(self, compressor):
+    await self._request('PUT', '/v1/compressors/downtime', json=compressor, expected=(201,), decode=None, error='Unable to create compressor downtime')
+
+  async def get_compressors_fault_hours(self, compressor_ids = None, start_date = None, end_date = None):
+    params = {}
+    if compressor_ids:
+      params['compressor_ids'] = compressor_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/compressors/fault-hours', params=params, error='Unable to retrieve compressor fault hours')
+
+  async def get_compressor_fault_hours(self, compressor_id, date):
+    return await self._request('GET', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, error='Unable to retrieve compressor fault hours for {} on {}'.format(compressor_id, date))
+
+  async def put_compressor_fault_hours(self, compressor_id, date, fault_hours):
+    return await self._request('PUT', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, json=fault_hours, error='Unable to create/update compressor fault hours')
+
+  async def delete_compressor_fault_hours(self, compressor_id, date):
+    return await self._request('DELETE', '/v1/compressors/fault-hours/{}/{}', compressor_id, date, error='Unable to delete compressor fault hours for {} on {}'.format(compressor_id, date))
+
+  async def put_well_production(self, well_id, date, production):
+    await self._request('PUT', '/v1/wells/production/{}/{}', well_id, date, json=production, expected=(201,), decode=None, error='Unable to create well production')
+
+  async def list_well_production(self, well_ids = None, facility_ids = None, start_date = None, end_date = None, stream = False):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/wells/production', params=params, decode='stream' if stream else 'json', error='Unable to retrieve well production')
+    
+  async def list_well_optimised_production(self, well_ids = None, facility_ids = None):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    return await self._request('GET', '/v1/wells/optimized-production', params=params, error='Unable to retrieve well optimised production')
+
+  async def get_critical_rate_analysis(self, well_id, refresh = None, start_date = None, end_date = None):
+    params = {}
+    if refresh:
+      params['refresh'] = refresh
+    if start_date and end_date:
+      params['start_date'] = start_date
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/wells/{}/critical-rate-analysis', well_id, params=params, error='Unable to retrieve Critical Rate Data')
+
+  async def list_well_daily_warehouse(self, well_ids = None, facility_ids = None, start_date = None, end_date = None, stream = False):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/wells/warehouse', params=params, decode='stream' if stream else 'json', error='Unable to retrieve well warehouse')
+
+  async def list_well_status(self, well_ids = None):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    return await self._request('GET', '/v1/wells/status/latest', params=params, error='Unable to retrieve well status')
+
+  async def get_well_config(self, well_id):
+    return await self._request('GET', '/v1/wells/{}/config', well_id, error='Unable to retrieve config')
+
+  async def get_well_type_curve(self, well_id):
+    return await self._request('GET', '/v1/wells/{}/type-curve', well_id, error='Unable to retrieve type curve')
+
+  async def get_type_curves(self, well_ids = None, facility_ids = None, lease_ids = None, start_date = None, end_date = None, combine = True):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if lease_ids:
+      params['lease_ids'] = lease_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    params['combine'] = combine
+    return await self._request('GET', '/v1/type-curves', params=params, error='Unable to retrieve type curves')
+
+  async def batch_well_type_curve(self, well_id, curves):
+    await self._request('PUT', '/v1/wells/{}/type-curve', well_id, json=curves, expected=(201,), decode=None, error='Unable to create well type curves')
+
+  async def get_well_tpr_ipr_curve(self, well_id, refresh):
+    params = {}
+    if refresh:
+      params['refresh'] = refresh
+    return await self._request('GET', '/v1/wells/{}/tpr-ipr-curve', well_id, params=params, error='Unable to retrieve IPR/TPR curve')
+      
+  async def get_res_mgmt_plots(self, well_id, refresh):
+    params = {}
+    if refresh:
+      params['refresh'] = refresh
+    return await self._request('GET', '/v1/wells/{}/res_mgmt_plots', well_id, params=params, error='Unable to retrieve resevior mgmt plot data')
+      
+  async def get_flowing_bottom_hole_pressure(self, well_id, refresh):
+    params = {}
+    if refresh:
+      params['refresh'] = refresh
+    return await self._request('GET', '/v1/wells/{}/flowing-bottom-hole-pressure', well_id, params=params, error='Unable to retrieve flowing bottom hole pressure history')
+
+  async def get_financials_categories(self):
+    return await self._request('GET', '/v1/financials-categories', error='Unable to retrieve financials categories')
+
+  async def post_financials_category(self, category, idempotency_key = None):
+    return await self._request('POST', '/v1/financials-categories', json=category, expected=(201,), idempotency_key=idempotency_key, error='Unable to create financials categories')
+
+  async def post_financials_category_price(self, price, idempotency_key = None):
+    return await self._request('POST', '/v1/financials-categories-price', json=price, expected=(201,), idempotency_key=idempotency_key, error='Unable to create financials categories price')
+
+  async def get_well_financials_category_prices(self, date, well_ids = None):
+    params = {'date': date}
+    if well_ids:
+      params['well_ids'] = well_ids
+    return await self._request('GET', '/v1/financials-categories-well-price', params=params, error='Unable to retrieve financials categories')
+
+  async def put_financials(self, type, type_id, month, financials):
+    await self._request('PUT', '/v1/financials/{}/{{}}/{{}}'.format(type), type_id, month, json=financials, expected=(200, 201), decode=None, error='Unable to put financials')
+
+  async def get_financials(self, asset_type = 'wells', type = 'production', well_ids = None, facility_ids = None, lease_ids = None, start_date = None, end_date = None, start_month = None, end_month = None,
+                           stream = False):
+    params = {'type': type}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if lease_ids:
+      params['lease_ids'] = lease_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    if start_month:
+      params['start_month'] = start_month
+    if end_month:
+      params['end_month'] = end_month
+    return await self._request('GET', '/v1/financials/{}'.format(asset_type), params=params, decode='stream' if stream else 'json', error='Unable to retrieve type financials')
+
+  async def put_facility_config(self, facility_id, config):
+    await self._request('PUT', '/v1/facilities/{}/config', facility_id, json=config, expected=(201,), decode=None, error='Unable to put facility config')
+
+  async def put_facility_sales(self, facility_id, month, sales):
+    await self._request('PUT', '/v1/facilities/sales/{}/{}', facility_id, month, json=sales, expected=(200, 201), decode=None, error='Unable to put sales')
+
+  async def list_well_sales(self, well_ids=None, start_date=None, end_date=None):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/wells/sales/daily', params=params, error='Unable to retrieve well sales')
+
+  async def put_well_config(self, well_id, config):
+    await self._request('PUT', '/v1/wells/{}/config', well_id, json=config, expected=(201,), decode=None, error='Unable to put well config')
+    
+  async def get_strapping_table(self, asset_id, type = 'tanks'):
+    strapping_table = await self._request('GET', '/v1/{}/{{}}/strapping'.format(type), asset_id, decode='text', error='Unable to retrieve strapping table for asset {} of type {}'.format(asset_id, type))
+    return dict(parse_strapping_csv(strapping_table))
+
+  async def get_tank_strapping_table(self, asset_id, type = 'tanks', refresh = False):
+    key = (type, asset_id)
+    cached = self._strapping_tables.get(key)
+    if cached is not None and not refresh and time.monotonic() - cached[1] < STRAPPING_TABLE_TTL:
+      return cached[0]
+    strapping_table = await self._request('GET', '/v1/{}/{{}}/strapping'.format(type), asset_id, decode='text', error='Unable to retrieve strapping table for asset {} of type {}'.format(asset_id, type))
+    table = StrappingTable.from_csv(strapping_table)
+    self._strapping_tables[key] = (table, time.monotonic())
+    return table
+
+  async def batch_put_well_datapoint(self, datapoint):
+    await self._request('PUT', '/v1/wells/datapoint', json=datapoint, expected=(201,), decode=None, error='Unable to batch create well datapoint')
+
+  async def get_well_datapoint(self, well_ids = None, datapoints = None, timestamps = None):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if datapoints:
+      params['datapoints'] = datapoints
+    if timestamps:
+      params['timestamps'] = timestamps
+    return await self._request('GET', '/v1/wells/datapoint', params=params, error='Unable to retrieve well datapoint')
+      
+  async def get_custom_reports(self):
+    return await self._request('GET', '/v1/custom_reports', error='Unable to retrieve custom reports list')
+    
+  async def list_facility_production(self, facility_ids = None, start_date = None, end_date = None):
+    params = {}
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/facilities/production', params=params, error='Unable to retrieve facility production')
+  
+  async def list_facility_daily_sales(self, facility_ids = None, start_date = None, end_date = None):
+    params = {}
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/facilities/sales/daily', params=params, error='Unable to retrieve facility daily sales')
+  
+  async def list_report_tank_gauge(self, well_ids = None, start_date = None, end_date = None):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v1/wells/report/tank-gauge', params=params, error='Unable to retrieve tank gauge report list')
+
+  async def iter_sharded(self, report, start_date, end_date, shard_days = 31, ids_per_shard = None, max_workers = 4, date_field = 'date', key = row_key, **kwargs):
+    """Async generator counterpart of `Client.iter_sharded`, at most `max_workers` shards are fetched ahead of the one being read."""
+    if report not in SHARDABLE_REPORTS:
+      raise Client_Exception('{} cannot be sharded'.format(report))
+    method = getattr(self, report)
+    windows = shard_calls(start_date, end_date, shard_days, ids_per_shard, kwargs)
+    calls = itertools.chain.from_iterable(windows)
+    merger = RowMerger(date_field, key)
+    pending = deque()
+
+    def submit():
+      for call in itertools.islice(calls, max_workers - len(pending)):
+        pending.append(asyncio.ensure_future(method(**call)))
+
+    try:
+      submit()
+      for window in windows:
+        rows = []
+        for _ in window:
+          rows.extend(await pending.popleft() or [])
+          submit()
+        for row in merger.merge(rows):
+          yield row
+    finally:
+      for task in pending:
+        task.cancel()
+
+  async def export(self, report, path, format = None, columns = None, shard_days = None, batch_size = 10000, schema = None, ignore_extra = False, **kwargs):
+    """Coroutine counterpart of `Client.export`, rows are written as they are parsed from the response."""
+    if report not in EXPORTABLE_REPORTS:
+      raise Client_Exception('{} cannot be exported'.format(report))
+    format = export_format(path, format)
+    if shard_days:
+      start_date, end_date = kwargs.pop('start_date', None), kwargs.pop('end_date', None)
+      check_span(start_date, end_date)
+      rows = self.iter_sharded(report, start_date, end_date, shard_days, **kwargs)
+    else:
+      rows = await getattr(self, report)(stream=True, **kwargs)
+    # The file is opened, written and closed from an executor thread, a batch of rows at a time
+    loop = asyncio.get_running_loop()
+    writer = await loop.run_in_executor(None, RowWriter, path, format, columns, batch_size, schema, ignore_extra)
+    try:
+      batch = []
+      async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+          await loop.run_in_executor(None, writer.write_many, batch)
+          batch = []
+      await loop.run_in_executor(None, writer.write_many, batch)
+    finally:
+      await loop.run_in_executor(None, writer.close)
+    return writer.rows
+
+  async def list_monthly_oil_report(self, facility_ids = None, start_month = None, end_month = None):
+    params = {}
+    if facility_ids:
+      params['facility_ids'] = facility_ids
+    if start_month:
+      params['start_month'] = start_month
+    if end_month:
+      params['end_month'] = end_month
+    return await self._request('GET', '/v1/facilities/report/oil', params=params, error='Unable to retrieve oil report list')
+
+  async def send_sms(self, to_numbers, sms_text, idempotency_key = None):
+    body = { 'to_numbers': to_numbers, 'text': sms_text }
+    return await self._request('POST', '/v1/sms', json=body, idempotency_key=idempotency_key, error='Unable to send sms')
+  
+  async def get_today_predicted(self, well_ids = None, refresh = False):
+    params = {}
+    if well_ids:
+      params['well_ids'] = well_ids
+    if refresh:
+      params['refresh'] = refresh
+    return await self._request('GET', '/v1/wells/production/today-prediction', params=params, error='Unable to retrieve today predicted')
+
+  async def get_cimarron_raw_data(self, customer, start_date = None, end_date = None, stream = False):
+    params = {}
+    params['customer'] = customer
+    if start_date:
+      params['start_date'] = start_date
+    if end_date:
+      params['end_date'] = end_date
+    return await self._request('GET', '/v2/cimarron-raw-data', params=params, decode='stream' if stream else 'json', error='Unable to load cimarron raw data')
+
+  async def post_cimarron_raw_data(self, body, idempotency_key = None):
+    return await self._request('POST', '/v2/cimarron-raw-data', json=body, idempotency_key=idempotency_key, error='Unable to save Cimarron raw data')
+  
+  async def get_scheduled_data(self, customer, month = None):
+    params = {}
+    params['customer_id'] = customer
+    if month:
+      params['month'] = month
+    return await self._request('GET', '/v2/scheduled-data', params=params, error='Unable to load cimarron scheduled data')
+ 
+  async def get_vru_status_code(self, codeType):
+    params = {}
+    if codeType:
+      params['key'] = codeType
+    return await self._request('GET', '/v1/vru-compressors-status-code', params=params, error='Unable to get vru compressors status code')
+
+  async def get_collection_config(self, customer_label, facility_id):
+    params = {}
+    params['customer_label'] = customer_label
+    params['facility_id'] = facility_id
+    return await self._request('GET', '/v1/collection-config', params=params, error='Unable to get collection config')
+
+  async def put_facility_production(self, body):
+    return await self._request('PUT', '/v1/facilities/production', json=body, error='Unable to save facility production data')
+    
+  async def put_facility_daily_sales(self, body):
+    return await self._request('PUT', '/v1/facilities/sales/daily', json=body, error='Unable to save facility sales data')
+
+  async def put_tank_production(self, body, idempotency_key = None):
+    return await self._request('PUT', '/v1/tanks/production', json=body, idempotency_key=idempotency_key, error='Unable to save tank production data')
+    
+  async def put_tank_daily_sales(self, body):
+    return await self._request('PUT', '/v1/tanks/sales/daily', json=body, error='Unable to save tank sales data')
+
+  async def get_customer_setting(self, key: str):
+    params = {}
+    params['key'] = key
+    return await self._request('GET', '/v1/customers/setting', params=params, error='Unable to get customers setting')
+
+  async def get_wells_setting(self):
+    return await self._request('GET', '/v1/wells/setting', error=None) or {}
+    
+  async def batch_put_production_field_team_with_avocet(self, production):
+    await self._request('PUT', '/v2/production/field-team-with-avocet', json=production, expected=(201,), decode=None, error='Unable to batch create well production by field team')
+  
+  async def get_setpoint_alarm_incidents(self,asset_id: str = None, datatype_id: str = None, status: str = None, start_time: int = None, end_time: int = None):
+    params = {}
+    if asset_id:
+      params['asset_id'] = asset_id
+    if datatype_id:
+      params['datatype_id'] = datatype_id
+    if status:
+      params['status'] = status
+    if start_time:
+      params['start_time'] = start_time
+    if end_time:
+      params['end_date'] = end_time
+    return await self._request('GET', '/v1/alarms-incidents', params=params, error='Unable to retrieve alarms')
+  
+  async def post_setpoint_alarm_incidents(self, incidents):
+    return await self._request('PUT', '/v1/alarms-incidents', json=incidents, error='Unable to create Alarm Incidents')
+    
+  async def get_asset_inflections(self, asset_id, start_ts , end_ts, datatypes=[]):
+    params = {}
+    params['start_ts'] = start_ts
+    params['end_ts'] = end_ts
+    if datatypes:
+      params['datatypes'] = datatypes
+    return await self._request('GET', '/v1/wells/{}/analyse-inflection-points', asset_id, params=params, error='Unable to get inflection regions')
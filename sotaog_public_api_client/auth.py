@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+  import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+  fcntl = None
+
+
+def token_cache_key(url, client_id):
+  return hashlib.sha256('{}|{}'.format(url, client_id).encode()).hexdigest()
+
+
+class Token():
+  def __init__(self, access_token, expires_at = None):
+    self.access_token = access_token
+    self.expires_at = expires_at
+
+  @classmethod
+  def from_response(cls, payload):
+    # expires_in is relative, store an absolute wall clock time so the token can be shared between processes
+    expires_in = payload.get('expires_in')
+    expires_at = time.time() + float(expires_in) if expires_in else None
+    return cls(payload['access_token'], expires_at)
+
+  def is_valid(self, margin = 0):
+    return self.expires_at is None or time.time() + margin < self.expires_at
+
+  def to_dict(self):
+    return {'access_token': self.access_token, 'expires_at': self.expires_at}
+
+
+class TokenCache():
+  """In-process token cache, shared by every client constructed with it.
+
+  Clients using the same URL and client id reuse a single token, and only one of
+  them authenticates when it has to be refreshed.
+  """
+
+  def __init__(self):
+    self._tokens = {}
+    self._locks = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    return self._tokens.get(key)
+
+  def set(self, key, token):
+    self._tokens[key] = token
+
+  def delete(self, key, access_token):
+    token = self._tokens.get(key)
+    if token is not None and token.access_token == access_token:
+      del self._tokens[key]
+
+  @contextmanager
+  def lock(self, key):
+    with self._lock:
+      lock = self._locks.setdefault(key, threading.Lock())
+    with lock:
+      yield
+
+
+class FileTokenCache(TokenCache):
+  """Token cache on disk, shared by every process using the same directory.
+
+  Tokens are written atomically with owner only permissions, and an advisory file
+  lock (where available) makes sure only one process authenticates at a time.
+  """
+
+  def __init__(self, directory = None):
+    super().__init__()
+    self.directory = directory or os.path.join(tempfile.gettempdir(), 'sotaog-tokens-{}'.format(os.getuid() if hasattr(os, 'getuid') else 0))
+    os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+  def _path(self, key):
+    return os.path.join(self.directory, '{}.json'.format(key))
+
+  def get(self, key):
+    try:
+      with open(self._path(key)) as f:
+        payload = json.load(f)
+    except (OSError, ValueError):
+      return None
+    return Token(payload['access_token'], payload.get('expires_at'))
+
+  def set(self, key, token):
+    path = self._path(key)
+    fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+    try:
+      with os.fdopen(fd, 'w') as f:
+        json.dump(token.to_dict(), f)
+      os.replace(tmp, path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+  def delete(self, key, access_token):
+    token = self.get(key)
+    if token is not None and token.access_token == access_token:
+      try:
+        os.unlink(self._path(key))
+      except OSError:
+        pass
+
+  @contextmanager
+  def lock(self, key):
+    with super().lock(key):
+      if fcntl is None:
+        yield
+        return
+      with open(self._path(key) + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+          yield
+        finally:
+          fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TokenManager():
+  """Holds the current token of a client and coordinates refreshes through an optional `TokenCache`."""
+
+  def __init__(self, key, cache = None, refresh_margin = 60):
+    self.key = key
+    self.cache = cache
+    self.refresh_margin = refresh_margin
+    self.token = None
+    self._lock = threading.Lock()
+
+  def current(self):
+    token = self.token
+    if token is not None and token.is_valid(self.refresh_margin):
+      return token
+    return None
+
+  def cached(self):
+    if self.cache is None:
+      return None
+    token = self.cache.get(self.key)
+    if token is not None and token.is_valid(self.refresh_margin):
+      self.token = token
+      return token
+    return None
+
+  def store(self, token):
+    self.token = token
+    if self.cache is not None:
+      self.cache.set(self.key, token)
+
+  def invalidate(self, access_token):
+    # Only drop the token if nobody replaced it since the rejected request was sent
+    if self.token is not None and self.token.access_token == access_token:
+      self.token = None
+    if self.cache is not None:
+      self.cache.delete(self.key, access_token)
+
+  def get(self, authenticate):
+    token = self.current()
+    if token is not None:
+      return token
+    with self._lock:
+      token = self.current() or self.cached()
+      if token is not None:
+        return token
+      if self.cache is None:
+        token = authenticate()
+        self.store(token)
+        return token
+      with self.cache.lock(self.key):
+        token = self.cached()
+        if token is None:
+          token = authenticate()
+          self.store(token)
+        return token
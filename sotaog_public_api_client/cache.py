@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from requests.structures import CaseInsensitiveDict
+
+# Seconds a catalog response is served without asking the API again, keyed by path
+DEFAULT_TTLS = {
+    '/v1/assets': 300,
+    '/v1/asset-types': 3600,
+    '/v1/datatypes': 3600,
+    '/v1/facilities': 600,
+    '/v1/customers': 3600,
+    '/v1/leases': 600,
+    '/v1/platforms': 3600,
+}
+
+
+class _CacheEntry():
+  def __init__(self, headers, content, ttl):
+    self.headers = headers
+    self.content = content
+    self.ttl = ttl
+    self.stored_at = time.monotonic()
+    self.etag = headers.get('etag')
+    self.last_modified = headers.get('last-modified')
+
+  def is_fresh(self):
+    return time.monotonic() - self.stored_at < self.ttl
+
+  def can_revalidate(self):
+    return bool(self.etag or self.last_modified)
+
+
+class ResponseCache():
+  """LRU cache of GET responses for slow changing reference data.
+
+  Only paths listed in `ttls` are cached. Within its TTL a response is served
+  without a request, after that it is revalidated with `If-None-Match` /
+  `If-Modified-Since` when the API sent an `ETag` / `Last-Modified`, so an
+  unchanged catalog costs a 304. Entries are evicted least recently used first
+  once `max_entries` or `max_bytes` of response bodies is exceeded. Entries
+  are keyed by API client id as well as URL and customer, so clients with
+  different credentials sharing a cache never see each other's responses.
+  """
+
+  def __init__(self, ttls = None, max_entries = 256, max_bytes = 64 * 1024 * 1024):
+    self.ttls = DEFAULT_TTLS if ttls is None else ttls
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.size = 0
+    self.hits = 0
+    self.revalidated = 0
+    self.misses = 0
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def ttl_for(self, url):
+    path = urlparse(url).path.rstrip('/')
+    for endpoint, ttl in self.ttls.items():
+      if path.endswith(endpoint):
+        return ttl
+    return None
+
+  def key(self, url, customer_id = None, client_id = None):
+    return (client_id, url, customer_id)
+
+  def count(self, outcome):
+    # Adapters of several threads and clients update the counters concurrently
+    with self._lock:
+      setattr(self, outcome, getattr(self, outcome) + 1)
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+      return entry
+
+  def conditional_headers(self, entry):
+    headers = {}
+    if entry.etag:
+      headers['if-none-match'] = entry.etag
+    if entry.last_modified:
+      headers['if-modified-since'] = entry.last_modified
+    return headers
+
+  def store(self, key, headers, content, ttl):
+    headers = CaseInsensitiveDict(headers)
+    if 'no-store' in headers.get('cache-control', '') or len(content) > self.max_bytes:
+      return None
+    entry = _CacheEntry(headers, content, ttl)
+    with self._lock:
+      previous = self._entries.pop(key, None)
+      if previous is not None:
+        self.size -= len(previous.content)
+      self._entries[key] = entry
+      self.size += len(content)
+      while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+        _, evicted = self._entries.popitem(last=False)
+        self.size -= len(evicted.content)
+    return entry
+
+  def touch(self, entry, headers = None):
+    # A 304 confirms the cached body, restart its TTL and pick up new validators
+    entry.stored_at = time.monotonic()
+    if headers:
+      entry.etag = headers.get('etag') or entry.etag
+      entry.last_modified = headers.get('last-modified') or entry.last_modified
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.size = 0
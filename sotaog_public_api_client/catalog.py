@@ -0,0 +1,148 @@
+import logging
+import threading
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+
+class _Table():
+  """Records keyed by id plus secondary hash indexes, kept in sync by diffing reloads."""
+
+  def __init__(self, id_field, indexes = None):
+    self.id_field = id_field
+    self.indexes = indexes or {}
+    self.by_id = {}
+    self._buckets = {name: {} for name in self.indexes}
+
+  def _index(self, record_id, record):
+    for name, keys in self.indexes.items():
+      buckets = self._buckets[name]
+      for key in keys(record):
+        buckets.setdefault(key, {})[record_id] = record
+
+  def _unindex(self, record_id, record):
+    for name, keys in self.indexes.items():
+      buckets = self._buckets[name]
+      for key in keys(record):
+        bucket = buckets.get(key)
+        if bucket is not None:
+          bucket.pop(record_id, None)
+          if not bucket:
+            del buckets[key]
+
+  def sync(self, records):
+    """Applies a full listing, only touching the index entries of records that changed."""
+    seen = set()
+    added = updated = 0
+    for record in records:
+      record_id = record.get(self.id_field)
+      if record_id is None:
+        continue
+      seen.add(record_id)
+      previous = self.by_id.get(record_id)
+      if previous == record:
+        continue
+      if previous is None:
+        added += 1
+      else:
+        updated += 1
+        self._unindex(record_id, previous)
+      self.by_id[record_id] = record
+      self._index(record_id, record)
+    removed = [record_id for record_id in self.by_id if record_id not in seen]
+    for record_id in removed:
+      self._unindex(record_id, self.by_id.pop(record_id))
+    return {'added': added, 'updated': updated, 'removed': len(removed)}
+
+  def lookup(self, index, key):
+    bucket = self._buckets[index].get(key)
+    return list(bucket.values()) if bucket else []
+
+  def ids(self, index, key):
+    bucket = self._buckets[index].get(key)
+    return bucket.keys() if bucket else {}.keys()
+
+
+def _field(name):
+  return lambda record: [record[name]] if record.get(name) is not None else []
+
+
+class AssetCatalog():
+  """In-memory catalog of assets, asset types, facilities and SWD networks.
+
+  Everything is loaded once and indexed by id, facility, asset type and SWD
+  network membership so lookups do not rescan the lists. `refresh()` reloads the
+  lists and only reindexes records that were added, changed or removed; with a
+  `ResponseCache` on the client an unchanged list only costs a 304. Lookups
+  take the same lock as `refresh()`, so a reader running during a refresh
+  never iterates an index that is being changed.
+
+    catalog = AssetCatalog(client)
+    tanks = catalog.get_assets(facility=facility_id, asset_type='tank')
+  """
+
+  def __init__(self, client, type = 'assets', id_field = 'id', load = True):
+    self.client = client
+    self.type = type
+    self.assets = _Table(id_field, {'facility': _field('facility'), 'asset_type': _field('asset_type')})
+    self.asset_types = _Table(id_field)
+    self.facilities = _Table(id_field)
+    self.swd_networks = _Table(id_field, {'facility': lambda network: network.get('facilities') or []})
+    self._lock = threading.Lock()
+    if load:
+      self.refresh()
+
+  def refresh(self):
+    assets = self.client.get_assets(self.type)
+    asset_types = self.client.get_asset_types()
+    facilities = self.client.get_facilities()
+    swd_networks = self.client.get_swd_networks()
+    with self._lock:
+      changes = {
+          'assets': self.assets.sync(assets),
+          'asset_types': self.asset_types.sync(asset_types),
+          'facilities': self.facilities.sync(facilities),
+          'swd_networks': self.swd_networks.sync(swd_networks),
+      }
+    logger.debug('Asset catalog refreshed: %s', changes)
+    return changes
+
+  def get_asset(self, asset_id):
+    with self._lock:
+      return self.assets.by_id.get(asset_id)
+
+  def get_assets(self, facility = None, asset_type = None):
+    """Same filtering as `Client.get_assets`, answered from the indexes."""
+    with self._lock:
+      if facility is None and asset_type is None:
+        return list(self.assets.by_id.values())
+      if facility is None:
+        return self.assets.lookup('asset_type', asset_type)
+      if asset_type is None:
+        return self.assets.lookup('facility', facility)
+      by_type = self.assets.ids('asset_type', asset_type)
+      return [self.assets.by_id[asset_id] for asset_id in self.assets.ids('facility', facility) if asset_id in by_type]
+
+  def get_asset_type(self, asset_type_id):
+    with self._lock:
+      return self.asset_types.by_id.get(asset_type_id)
+
+  def get_facility(self, facility_id):
+    with self._lock:
+      return self.facilities.by_id.get(facility_id)
+
+  def get_swd_network(self, swd_network_id):
+    with self._lock:
+      return self.swd_networks.by_id.get(swd_network_id)
+
+  def get_swd_networks(self, facility = None):
+    """Same filtering as `Client.get_swd_networks`, answered from the membership index."""
+    with self._lock:
+      if facility is None:
+        return list(self.swd_networks.by_id.values())
+      return self.swd_networks.lookup('facility', facility)
+
+  def get_asset_swd_networks(self, asset_id):
+    asset = self.get_asset(asset_id)
+    if asset is None or asset.get('facility') is None:
+      return []
+    return self.get_swd_networks(asset['facility'])
@@ -0,0 +1,56 @@
+import threading
+
+
+class _Call():
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+class SingleFlight():
+  """Shares one in-flight call between the threads asking for the same key at the same time.
+
+  The first caller runs the call, the others wait for it and get the same
+  result or exception. Nothing is kept once the call completed, so a later
+  caller always starts a new one. `calls` counts the calls made and `coalesced`
+  the callers that joined one already in flight.
+  """
+
+  def __init__(self):
+    self.calls = 0
+    self.coalesced = 0
+    self._calls = {}
+    self._lock = threading.Lock()
+
+  def do(self, key, fn):
+    with self._lock:
+      call = self._calls.get(key)
+      if call is None:
+        call = self._calls[key] = _Call()
+        self.calls += 1
+        leader = True
+      else:
+        self.coalesced += 1
+        leader = False
+    if not leader:
+      call.done.wait()
+      if call.error is not None:
+        raise call.error
+      return call.result
+    try:
+      call.result = fn()
+    except BaseException as e:
+      call.error = e
+      raise
+    finally:
+      with self._lock:
+        del self._calls[key]
+      call.done.set()
+    return call.result
+
+
+def request_key(method, url, params = None, customer_id = None):
+  # Lists are expanded into repeated query keys, so their order is significant
+  params = tuple(sorted((key, tuple(value) if isinstance(value, list) else value) for key, value in (params or {}).items()))
+  return (method, url, params, customer_id)
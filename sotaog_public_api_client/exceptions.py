@@ -0,0 +1,7 @@
+class Client_Exception(Exception):
+  pass
+
+
+class Circuit_Open_Exception(Client_Exception):
+  """Raised without sending the request while the circuit breaker for a host is open."""
+  pass
@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+
+try:
+  import pyarrow
+  import pyarrow.ipc
+  import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+  pyarrow = None
+
+from .uploads import is_path
+
+# Reports that can be exported, all of them return a flat list of rows
+EXPORTABLE_REPORTS = (
+    'list_well_daily_warehouse',
+    'list_well_production',
+    'get_truck_tickets',
+    'get_financials',
+)
+
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.parquet': 'parquet',
+}
+
+
+def export_format(path, format = None):
+  """`format` or the format matching the extension of `path`."""
+  if format is None and is_path(path):
+    format = EXPORT_FORMATS.get(os.path.splitext(os.fspath(path))[1].lower())
+  if format not in EXPORT_FORMATS.values():
+    raise ValueError('Unknown export format {}, expected one of {}'.format(format, sorted(set(EXPORT_FORMATS.values()))))
+  if format in ('arrow', 'parquet') and pyarrow is None:
+    raise ImportError('pyarrow is required to export {} files'.format(format))
+  return format
+
+
+# Batches held back at most while a column of an Arrow or Parquet export has no value to type it
+DEFERRED_BATCHES = 10
+
+
+def _cell(value):
+  if value is None:
+    return ''
+  if isinstance(value, (dict, list)):
+    return json.dumps(value, separators=(',', ':'))
+  return value
+
+
+class RowWriter():
+  """Writes rows one at a time to a CSV, NDJSON, Arrow IPC or Parquet file.
+
+  The columns are fixed for the whole file: `columns`, the fields of `schema`
+  or the keys of the first row, missing keys are left empty. When they come
+  from the first row, a later row with other keys raises ValueError instead
+  of losing them, unless `ignore_extra` is set. CSV and NDJSON rows go
+  straight to the file.
+
+  Arrow and Parquet rows are buffered `batch_size` at a time into record
+  batches. Column types are those of `schema` (a `pyarrow.Schema` or a
+  `{column: type}` mapping), or of the first batch holding a value for the
+  column: up to `DEFERRED_BATCHES` batches are held back while a column only
+  has nulls, after that it is written as strings. Every batch is cast safely
+  to these types, a value that does not fit, like 2.5 in an integer column,
+  raises ValueError instead of being truncated.
+  """
+
+  def __init__(self, path, format = None, columns = None, batch_size = 10000, schema = None, ignore_extra = False):
+    self.format = export_format(path, format)
+    self.types = {field.name: field.type for field in schema} if pyarrow is not None and isinstance(schema, pyarrow.Schema) else dict(schema or {})
+    self.columns = list(columns) if columns else list(self.types) or None
+    self.batch_size = batch_size
+    self.rows = 0
+    self._strict = self.columns is None and not ignore_extra
+    self._known = None
+    self._owned = is_path(path)
+    binary = self.format in ('arrow', 'parquet')
+    if self._owned:
+      self._file = open(path, 'wb') if binary else open(path, 'w', newline='', encoding='utf-8')
+    else:
+      self._file = path
+    self._csv = None
+    self._batch = []
+    self._held = []
+    self._schema = None
+    self._writer = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def write(self, row):
+    if self.columns is None:
+      self.columns = list(row)
+      if self._strict:
+        self._known = set(self.columns)
+    elif self._known is not None and not self._known.issuperset(row):
+      extra = sorted(str(key) for key in row if key not in self._known)
+      raise ValueError('Row {} has columns {} missing from the first row, pass columns or ignore_extra=True'.format(self.rows, extra))
+    if self.format == 'csv':
+      if self._csv is None:
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+      self._csv.writerow([_cell(row.get(column)) for column in self.columns])
+    elif self.format == 'ndjson':
+      self._file.write(json.dumps({column: row.get(column) for column in self.columns}, separators=(',', ':'), default=str) + '\n')
+    else:
+      self._batch.append(row)
+      if len(self._batch) >= self.batch_size:
+        self._write_batch()
+    self.rows += 1
+
+  def write_many(self, rows):
+    for row in rows:
+      self.write(row)
+    return self.rows
+
+  def _table(self, rows):
+    arrays = []
+    for column in self.columns:
+      try:
+        arrays.append(pyarrow.array([row.get(column) for row in rows]))
+      except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+        raise ValueError('Column {} mixes values of different types, pass its type in schema: {}'.format(column, e))
+    return pyarrow.Table.from_arrays(arrays, names=self.columns)
+
+  def _cast(self, table):
+    arrays = []
+    for field, array in zip(self._schema, table.columns):
+      if array.type != field.type:
+        try:
+          array = array.cast(field.type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError) as e:
+          raise ValueError('Column {} has {} values that cannot be written as {}, pass its type in schema: {}'.format(field.name, array.type, field.type, e))
+      arrays.append(array)
+    return pyarrow.Table.from_arrays(arrays, schema=self._schema)
+
+  def _open(self):
+    # Types of the columns, from schema or the first batch with a value, strings for columns never seen with one
+    types = dict(self.types)
+    for table in self._held:
+      for field in table.schema:
+        if field.name not in types and not pyarrow.types.is_null(field.type):
+          types[field.name] = field.type
+    self._schema = pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in self.columns])
+    if self.format == 'parquet':
+      self._writer = pyarrow.parquet.ParquetWriter(self._file, self._schema)
+    else:
+      self._writer = pyarrow.ipc.new_file(self._file, self._schema)
+    held = self._held
+    self._held = []
+    for table in held:
+      self._writer.write_table(self._cast(table))
+
+  def _write_batch(self):
+    table = self._table(self._batch)
+    self._batch = []
+    if self._writer is not None:
+      self._writer.write_table(self._cast(table))
+      return
+    self._held.append(table)
+    typed = set(self.types)
+    for held in self._held:
+      typed.update(field.name for field in held.schema if not pyarrow.types.is_null(field.type))
+    if typed.issuperset(self.columns) or len(self._held) >= DEFERRED_BATCHES:
+      self._open()
+
+  def close(self):
+    if self.format in ('arrow', 'parquet'):
+      if self._batch:
+        self._write_batch()
+      if self._writer is None and self.columns:
+        self._open()
+      if self._writer is not None:
+        self._writer.close()
+        self._writer = None
+    if self._owned:
+      self._file.close()
+    else:
+      self._file.flush()
+
+
+def export_rows(rows, path, format = None, columns = None, batch_size = 10000, schema = None, ignore_extra = False):
+  """Writes an iterable of rows to `path` (a path or an open file), returns the number of rows written."""
+  with RowWriter(path, format, columns, batch_size, schema, ignore_extra) as writer:
+    return writer.write_many(rows)
@@ -0,0 +1,105 @@
+import logging
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+# Client calls and status field of each kind of incident
+INCIDENT_KINDS = {
+    'custom': ('get_alarm_incidents_new', 'post_custom_alarm_incidents_new', 'alarm_status'),
+    'setpoint': ('get_setpoint_alarm_incidents', 'post_setpoint_alarm_incidents', 'status'),
+}
+
+
+def _key_function(key):
+  if callable(key):
+    return key
+  fields = (key,) if isinstance(key, str) else tuple(key)
+  return lambda incident: tuple(incident.get(field) for field in fields)
+
+
+class IncidentReconciler():
+  """Sends only the incidents that changed since the last alarm evaluation.
+
+  Keeps a snapshot of the open incidents keyed by `key` (field names or a
+  function of the incident), seeded from the API with `seed`. `reconcile`
+  takes the full list of incidents open after an evaluation and diffs it
+  against the snapshot:
+
+  - opened: keys not in the snapshot, sent as they are
+  - updated: keys whose incident changed, ignoring the `ignore` fields
+  - closed: keys missing from the evaluation, sent as `close_fn(incident)`, by
+    default the snapshot incident with its status field set to `closed_status`
+
+  The deltas are sent with `post_custom_alarm_incidents_new` or
+  `post_setpoint_alarm_incidents` (`kind='custom'` or `'setpoint'`) in batches
+  of `batch_size`, and the snapshot follows each batch that was accepted, so
+  a failed cycle is picked up by the next one.
+
+    reconciler = IncidentReconciler(client, ('asset_id', 'datatype_id'), kind='setpoint')
+    reconciler.seed(status='open')
+    while True:
+      reconciler.reconcile(evaluate_alarms())
+  """
+
+  def __init__(self, client, key, kind = 'custom', ignore = (), closed_status = 'closed', close_fn = None, batch_size = 500):
+    if kind not in INCIDENT_KINDS:
+      raise ValueError('Unknown incident kind {}, expected one of {}'.format(kind, sorted(INCIDENT_KINDS)))
+    self.client = client
+    self.kind = kind
+    self.key = _key_function(key)
+    self.ignore = frozenset(ignore)
+    self.closed_status = closed_status
+    self.close_fn = close_fn or self._close
+    self.batch_size = batch_size
+    self.incidents = {}
+    self._get, self._post, self.status_field = INCIDENT_KINDS[kind]
+
+  def _close(self, incident):
+    return dict(incident, **{self.status_field: self.closed_status})
+
+  def _compared(self, incident):
+    if not self.ignore:
+      return incident
+    return {field: value for field, value in incident.items() if field not in self.ignore}
+
+  def seed(self, incidents = None, **query):
+    """Replaces the snapshot with `incidents`, or with the incidents returned by the API for `query`."""
+    if incidents is None:
+      incidents = getattr(self.client, self._get)(**query) or []
+    self.incidents = {self.key(incident): incident for incident in incidents}
+    logger.debug('Seeded %s open %s incidents', len(self.incidents), self.kind)
+    return len(self.incidents)
+
+  def diff(self, incidents):
+    """`{'opened': [...], 'updated': [...], 'closed': [...]}` of the evaluation against the snapshot, nothing is sent."""
+    opened = []
+    updated = []
+    current = set()
+    for incident in incidents:
+      key = self.key(incident)
+      current.add(key)
+      previous = self.incidents.get(key)
+      if previous is None:
+        opened.append(incident)
+      elif self._compared(previous) != self._compared(incident):
+        updated.append(incident)
+    closed = [incident for key, incident in self.incidents.items() if key not in current]
+    return {'opened': opened, 'updated': updated, 'closed': closed}
+
+  def reconcile(self, incidents):
+    """Sends the deltas between the evaluation and the snapshot, returns them as `diff` does."""
+    delta = self.diff(incidents)
+    changes = [(incident, self.key(incident), incident) for incident in delta['opened'] + delta['updated']]
+    changes += [(self.close_fn(incident), self.key(incident), None) for incident in delta['closed']]
+    if changes:
+      logger.debug('Reconciling %s %s incidents: %s opened, %s updated, %s closed', len(self.incidents), self.kind,
+                   len(delta['opened']), len(delta['updated']), len(delta['closed']))
+    post = getattr(self.client, self._post)
+    for i in range(0, len(changes), self.batch_size):
+      batch = changes[i:i + self.batch_size]
+      post([payload for payload, _, _ in batch])
+      for _, key, incident in batch:
+        if incident is None:
+          self.incidents.pop(key, None)
+        else:
+          self.incidents[key] = incident
+    return delta
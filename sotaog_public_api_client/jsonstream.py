@@ -0,0 +1,138 @@
+import codecs
+import json
+
+try:
+  import orjson
+except ImportError:  # pragma: no cover - optional dependency
+  orjson = None
+
+
+def _orjson_loads(data):
+  # orjson rejects NaN, Infinity and out of range numbers like 1e400 that json accepts, decode those with json
+  try:
+    return orjson.loads(data)
+  except orjson.JSONDecodeError:
+    return json.loads(data)
+
+
+# Fastest decoder available, both accept the raw response bytes
+loads = _orjson_loads if orjson is not None else json.loads
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+_decoder = json.JSONDecoder()
+
+
+class JsonArrayParser():
+  """Incremental parser for a top level JSON array fed with byte chunks.
+
+  `feed` returns the elements completed by a chunk and `close` the rest, so
+  only the element being parsed and the unparsed tail of the current chunk are
+  held in memory. Elements are decoded with the stdlib C scanner, which can
+  resume at any offset, never with `loads`: orjson only decodes a whole
+  document. Chunks are only joined and parsed again once one holds
+  a `,` or `]` and the pending text at least doubled since the last attempt, so
+  an element spanning many chunks is not rescanned from its start each time.
+  A trailing comma before `]` is rejected. A document that is not an array is
+  buffered and decoded whole with `loads` into a single element.
+  """
+
+  def __init__(self, loads = loads):
+    self.loads = loads
+    self._utf8 = codecs.getincrementaldecoder('utf-8')()
+    self._buf = ''
+    self._pos = 0
+    self._pending = []
+    self._pending_size = 0
+    self._retry_size = 0
+    self._started = False
+    self._finished = False
+    self._expect_value = True
+    self._after_comma = False
+    self._document = None
+
+  def feed(self, chunk):
+    if self._document is not None:
+      self._document.append(chunk)
+      return []
+    text = self._utf8.decode(chunk)
+    self._pending.append(text)
+    self._pending_size += len(text)
+    if (',' not in text and ']' not in text) or len(self._buf) - self._pos + self._pending_size < self._retry_size:
+      return []
+    self._join()
+    return self._parse(False)
+
+  def close(self):
+    if self._document is not None:
+      return [self.loads(b''.join(self._document))]
+    self._pending.append(self._utf8.decode(b'', final=True))
+    self._join()
+    values = self._parse(True)
+    if self._document is not None:
+      return [self.loads(b''.join(self._document))]
+    if self._started and not self._finished:
+      raise ValueError('Unterminated JSON array')
+    return values
+
+  def _join(self):
+    self._buf = self._buf[self._pos:] + ''.join(self._pending)
+    self._pos = 0
+    self._pending = []
+    self._pending_size = 0
+
+  def _parse(self, final):
+    values = []
+    buf = self._buf
+    pos = self._pos
+    while not self._finished:
+      while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+      if pos == len(buf):
+        break
+      if not self._started:
+        if buf[pos] != '[':
+          self._document = [buf[pos:].encode()]
+          self._buf = ''
+          return values
+        self._started = True
+        pos += 1
+        continue
+      char = buf[pos]
+      if char == ']':
+        if self._after_comma:
+          raise ValueError('Trailing comma in JSON array')
+        self._finished = True
+        pos += 1
+        break
+      if not self._expect_value:
+        if char != ',':
+          raise ValueError('Expected "," or "]" in JSON array, got {!r}'.format(char))
+        self._expect_value = True
+        self._after_comma = True
+        pos += 1
+        continue
+      try:
+        value, end = _decoder.raw_decode(buf, pos)
+      except json.JSONDecodeError:
+        if final:
+          raise
+        break
+      # A number is only complete once a delimiter follows, "1." or "1e" may continue in the next chunk
+      if not final and isinstance(value, (int, float)) and (end == len(buf) or buf[end] not in _DELIMITERS):
+        break
+      values.append(value)
+      self._expect_value = False
+      self._after_comma = False
+      pos = end
+    self._pos = pos
+    self._retry_size = 2 * (len(buf) - pos)
+    return values
+
+
+def iter_json_array(chunks, loads = loads):
+  """Yields the elements of a top level JSON array read from an iterable of byte chunks."""
+  parser = JsonArrayParser(loads)
+  for chunk in chunks:
+    yield from parser.feed(chunk)
+  yield from parser.close()
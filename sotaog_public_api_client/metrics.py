@@ -0,0 +1,168 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def endpoint_template(path):
+  # Paths are templates filled positionally, '/v1/wells/{}/config' reads better as '/v1/wells/{id}/config'.
+  # Collection names like the asset type are already in the template, only ids are left to fill.
+  return path.replace('{}', '{id}')
+
+
+def _response_size(response):
+  length = response.headers.get('Content-Length')
+  if length is not None:
+    return int(length)
+  # requests only sets _content once the body was read, a streamed body is not read here
+  content = getattr(response, '_content', None)
+  if content is None:
+    content = getattr(response, 'content', None)
+  return len(content) if isinstance(content, bytes) else 0
+
+
+def _request_size(response):
+  body = getattr(getattr(response, 'request', None), 'body', None)
+  return len(body) if isinstance(body, (bytes, str)) else 0
+
+
+def _escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _EndpointStats():
+  def __init__(self, buckets):
+    self.count = 0
+    self.errors = 0
+    self.retries = 0
+    self.request_bytes = 0
+    self.response_bytes = 0
+    self.statuses = {}
+    self.exceptions = {}
+    self.latency_counts = [0] * (len(buckets) + 1)
+    self.latency_sum = 0.0
+
+  def to_dict(self, buckets):
+    cumulative = 0
+    histogram = {}
+    for bound, count in zip(buckets + (float('inf'),), self.latency_counts):
+      cumulative += count
+      histogram[bound] = cumulative
+    return {
+        'count': self.count,
+        'errors': self.errors,
+        'retries': self.retries,
+        'request_bytes': self.request_bytes,
+        'response_bytes': self.response_bytes,
+        'statuses': dict(self.statuses),
+        'exceptions': dict(self.exceptions),
+        'latency': {'sum': self.latency_sum, 'buckets': histogram},
+    }
+
+
+class ClientMetrics():
+  """Per endpoint call counts, latency histograms, byte sizes, status codes, retries and errors.
+
+  Installed as a request hook, so a client without it pays nothing more than an
+  empty loop. Endpoints are keyed by HTTP method and path template, e.g.
+  `GET /v1/wells/{id}/config` or `GET /v1/tanks/{id}`. A call counts as an error when it raised or got a
+  status of 400 or more.
+
+    metrics = ClientMetrics()
+    client = Client(url, client_id, client_secret, metrics=metrics)
+    ...
+    print(metrics.to_prometheus())
+  """
+
+  def __init__(self, buckets = DEFAULT_BUCKETS, namespace = 'sotaog_client'):
+    self.buckets = tuple(buckets)
+    self.namespace = namespace
+    self._endpoints = {}
+    self._lock = threading.Lock()
+
+  def attach(self, client):
+    if self not in client.request_hooks:
+      client.request_hooks.append(self)
+    return client
+
+  def detach(self, client):
+    if self in client.request_hooks:
+      client.request_hooks.remove(self)
+
+  def __call__(self, method, path, response, elapsed, exception):
+    key = (method.upper(), endpoint_template(path))
+    if response is not None:
+      status = response.status_code
+      request_bytes = _request_size(response)
+      response_bytes = _response_size(response)
+      retries = getattr(response, 'retries', 0)
+    else:
+      status = request_bytes = response_bytes = retries = 0
+    bucket = bisect_left(self.buckets, elapsed)
+    with self._lock:
+      stats = self._endpoints.get(key)
+      if stats is None:
+        stats = self._endpoints[key] = _EndpointStats(self.buckets)
+      stats.count += 1
+      stats.latency_counts[bucket] += 1
+      stats.latency_sum += elapsed
+      stats.request_bytes += request_bytes
+      stats.response_bytes += response_bytes
+      stats.retries += retries
+      if exception is not None:
+        name = type(exception).__name__
+        stats.exceptions[name] = stats.exceptions.get(name, 0) + 1
+        stats.errors += 1
+      else:
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if status >= 400:
+          stats.errors += 1
+
+  def snapshot(self):
+    """Current values as `{'GET /v1/wells/{id}/config': {...}}`, latency buckets are cumulative like Prometheus'."""
+    with self._lock:
+      return {'{} {}'.format(method, template): stats.to_dict(self.buckets) for (method, template), stats in self._endpoints.items()}
+
+  def reset(self):
+    with self._lock:
+      self._endpoints.clear()
+
+  def to_prometheus(self):
+    """Renders the metrics in the Prometheus text exposition format."""
+    with self._lock:
+      endpoints = sorted((key, stats.to_dict(self.buckets)) for key, stats in self._endpoints.items())
+    ns = self.namespace
+    lines = []
+
+    def family(name, type, help):
+      lines.append('# HELP {}_{} {}'.format(ns, name, help))
+      lines.append('# TYPE {}_{} {}'.format(ns, name, type))
+
+    def labels(method, template, **extra):
+      pairs = [('method', method), ('endpoint', template)] + list(extra.items())
+      return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+    family('requests_total', 'counter', 'Completed requests by endpoint and status code.')
+    for (method, template), stats in endpoints:
+      for status, count in sorted(stats['statuses'].items()):
+        lines.append('{}_requests_total{} {}'.format(ns, labels(method, template, status=status), count))
+    family('request_exceptions_total', 'counter', 'Requests that raised before a response, by exception type.')
+    for (method, template), stats in endpoints:
+      for name, count in sorted(stats['exceptions'].items()):
+        lines.append('{}_request_exceptions_total{} {}'.format(ns, labels(method, template, exception=name), count))
+    for name, field, help in (('request_errors_total', 'errors', 'Requests that raised or got a status of 400 or more.'),
+                              ('request_retries_total', 'retries', 'Retries made by the transport.'),
+                              ('request_bytes_total', 'request_bytes', 'Request body bytes sent.'),
+                              ('response_bytes_total', 'response_bytes', 'Response body bytes received.')):
+      family(name, 'counter', help)
+      for (method, template), stats in endpoints:
+        lines.append('{}_{}{} {}'.format(ns, name, labels(method, template), stats[field]))
+    family('request_duration_seconds', 'histogram', 'Request latency including retries.')
+    for (method, template), stats in endpoints:
+      for bound, count in stats['latency']['buckets'].items():
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append('{}_request_duration_seconds_bucket{} {}'.format(ns, labels(method, template, le=le), count))
+      lines.append('{}_request_duration_seconds_sum{} {}'.format(ns, labels(method, template), stats['latency']['sum']))
+      lines.append('{}_request_duration_seconds_count{} {}'.format(ns, labels(method, template), stats['count']))
+    return '\n'.join(lines) + '\n'
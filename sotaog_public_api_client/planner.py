@@ -0,0 +1,88 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .columnar import to_columnar
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+
+def _pairs(asset_datatypes):
+  if isinstance(asset_datatypes, dict):
+    return [(asset_id, datatype) for asset_id, datatypes in asset_datatypes.items() for datatype in datatypes]
+  return [tuple(pair) for pair in asset_datatypes]
+
+
+class DatapointPlanner():
+  """Splits thousands of `(asset, datatype)` pairs into `get_datapoints` requests of a sensible size.
+
+  Each group holds at most `max_pairs` pairs and at most `max_points` expected
+  points, estimated from `points_per_series` or from the range and the
+  `interval` between points. Pairs of the same asset are kept together so the
+  request bodies stay compact, and every group is sent as `asset_datatypes` in
+  the shape it was given: an `{asset: [datatypes]}` mapping or a list of
+  `[asset, datatype]` pairs. Groups are paged through concurrently by
+  `max_workers` threads and merged back into one
+  `{asset: {datatype: [[ts, value], ...]}}` mapping.
+
+    planner = DatapointPlanner(client)
+    datapoints = planner.fetch(pairs, start_ts, end_ts, interval=60000)
+  """
+
+  def __init__(self, client, max_pairs = 100, max_points = 100000, page_size = 1000, max_workers = 8):
+    self.client = client
+    self.max_pairs = max_pairs
+    self.max_points = max_points
+    self.page_size = page_size
+    self.max_workers = max_workers
+
+  def expected_points(self, start_ts = None, end_ts = None, interval = None, points_per_series = None):
+    if points_per_series:
+      return points_per_series
+    if interval and start_ts is not None and end_ts is not None:
+      return max(1, (end_ts - start_ts) // interval + 1)
+    # Unknown density, assume every series fills a page
+    return self.page_size
+
+  def plan(self, asset_datatypes, start_ts = None, end_ts = None, interval = None, points_per_series = None):
+    """Groups of `asset_datatypes`, `{asset: [datatypes]}` mappings for a mapping and lists of `[asset, datatype]` pairs for pairs."""
+    as_mapping = isinstance(asset_datatypes, dict)
+    expected = self.expected_points(start_ts, end_ts, interval, points_per_series)
+    group_size = max(1, min(self.max_pairs, self.max_points // expected))
+    groups = []
+    group = {} if as_mapping else []
+    size = 0
+    for asset_id, datatype in sorted(set(_pairs(asset_datatypes)), key=lambda pair: (str(pair[0]), str(pair[1]))):
+      if size == group_size:
+        groups.append(group)
+        group = {} if as_mapping else []
+        size = 0
+      if as_mapping:
+        group.setdefault(asset_id, []).append(datatype)
+      else:
+        group.append([asset_id, datatype])
+      size += 1
+    if group:
+      groups.append(group)
+    return groups
+
+  def _fetch_group(self, group, start_ts, end_ts):
+    datapoints = {}
+    for asset_id, datatype, ts, value in self.client.iter_datapoints(group, start_ts=start_ts, end_ts=end_ts, sort='asc', page_size=self.page_size):
+      datapoints.setdefault(asset_id, {}).setdefault(datatype, []).append([ts, value])
+    return datapoints
+
+  def fetch(self, asset_datatypes, start_ts = None, end_ts = None, interval = None, points_per_series = None, format = 'json'):
+    """Every point of the range for all pairs, with `format='columnar'` every series is a `Series`."""
+    groups = self.plan(asset_datatypes, start_ts, end_ts, interval, points_per_series)
+    logger.debug('Fetching datapoints in %s request groups', len(groups))
+    # Pairs without points in the range still get an empty series
+    merged = {}
+    for asset_id, datatype in _pairs(asset_datatypes):
+      merged.setdefault(asset_id, {})[datatype] = []
+    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+      for datapoints in executor.map(lambda group: self._fetch_group(group, start_ts, end_ts), groups):
+        for asset_id, series in datapoints.items():
+          merged.setdefault(asset_id, {}).update(series)
+    if format == 'columnar':
+      return to_columnar(merged)
+    return merged
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+
+from .columnar import Series
+
+try:
+  import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+  fcntl = None
+
+
+def _merge_ranges(ranges):
+  merged = []
+  for start, end in sorted(ranges):
+    if merged and start <= merged[-1][1] + 1:
+      merged[-1][1] = max(merged[-1][1], end)
+    else:
+      merged.append([start, end])
+  return merged
+
+
+def _map(path):
+  # An empty file cannot be mapped, and a missing one means nothing was cached yet
+  try:
+    with open(path, 'rb') as f:
+      if os.fstat(f.fileno()).st_size == 0:
+        return Series()
+      view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+  except FileNotFoundError:
+    return Series()
+  split = len(view) // 2
+  return Series(view[:split].cast('q'), view[split:].cast('d'))
+
+
+class SeriesCache():
+  """On disk cache of datapoint series, read back through memory-mapped files.
+
+  Each series is stored as two fixed-width columns in one file, all the int64
+  timestamps then all the float64 values in native byte order, so a single
+  atomic rename replaces both. A JSON file next to it lists the
+  inclusive `[start_ts, end_ts]` ranges already fetched. Reads map the columns
+  and return zero-copy `Series` slices, so processes reading the same series
+  share the pages. Writers replace the files atomically under a lock, readers
+  holding an older mapping keep a consistent snapshot.
+
+  A range is never fetched again once it is covered, so only the part ending
+  `settle_window` milliseconds before now is recorded as covered: recent points
+  still arriving are fetched again by the next read, and replace the ones
+  stored for that part.
+  """
+
+  def __init__(self, directory, settle_window = 15 * 60 * 1000):
+    self.directory = directory
+    self.settle_window = settle_window
+    os.makedirs(directory, exist_ok=True)
+
+  def _path(self, asset_id, datatype):
+    return os.path.join(self.directory, hashlib.sha1('{}|{}'.format(asset_id, datatype).encode()).hexdigest())
+
+  def covered(self, asset_id, datatype):
+    try:
+      with open(os.path.join(self._path(asset_id, datatype), 'meta.json')) as f:
+        return json.load(f)['ranges']
+    except (OSError, ValueError):
+      return []
+
+  def missing(self, asset_id, datatype, start_ts, end_ts):
+    """Inclusive `(start_ts, end_ts)` gaps of the range that are not cached yet."""
+    gaps = []
+    cursor = start_ts
+    for range_start, range_end in self.covered(asset_id, datatype):
+      if range_end < cursor:
+        continue
+      if range_start > end_ts:
+        break
+      if range_start > cursor:
+        gaps.append((cursor, range_start - 1))
+      cursor = range_end + 1
+    if cursor <= end_ts:
+      gaps.append((cursor, end_ts))
+    return gaps
+
+  def read(self, asset_id, datatype, start_ts = None, end_ts = None):
+    """Cached points with `start_ts <= ts <= end_ts` as a `Series` over the mapped files."""
+    return _map(os.path.join(self._path(asset_id, datatype), 'series.bin')).slice(start_ts, end_ts)
+
+  def write(self, asset_id, datatype, series, start_ts, end_ts):
+    """Stores the points fetched for `[start_ts, end_ts]`, replacing any cached point in that range."""
+    path = self._path(asset_id, datatype)
+    os.makedirs(path, exist_ok=True)
+    with self._lock(path):
+      cached = self.read(asset_id, datatype)
+      i, j = cached.index_range(start_ts, end_ts)
+      first, last = series.index_range(start_ts, end_ts)
+      timestamps = array('q')
+      values = array('d')
+      for column, old, new in ((timestamps, cached.timestamps, series.timestamps), (values, cached.values, series.values)):
+        column.frombytes(memoryview(old[:i]).cast('B'))
+        column.frombytes(memoryview(new[first:last]).cast('B'))
+        column.frombytes(memoryview(old[j:]).cast('B'))
+      self._replace(os.path.join(path, 'series.bin'), timestamps.tobytes() + values.tobytes())
+      settled_ts = min(end_ts, int(time.time() * 1000) - self.settle_window)
+      if settled_ts >= start_ts:
+        meta = {'asset': asset_id, 'datatype': datatype, 'ranges': _merge_ranges(self.covered(asset_id, datatype) + [[start_ts, settled_ts]])}
+        self._replace(os.path.join(path, 'meta.json'), json.dumps(meta).encode())
+
+  def _replace(self, path, content):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+      os.replace(tmp, path)
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+  @contextmanager
+  def _lock(self, path):
+    if fcntl is None:
+      yield
+      return
+    with open(os.path.join(path, '.lock'), 'a') as f:
+      fcntl.flock(f, fcntl.LOCK_EX)
+      try:
+        yield
+      finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,130 @@
+import datetime
+import itertools
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import Client_Exception
+
+# Reports taking a start_date/end_date span that can be split into shards
+SHARDABLE_REPORTS = (
+    'list_well_production',
+    'list_well_daily_warehouse',
+    'list_facility_production',
+    'list_facility_daily_sales',
+    'list_report_tank_gauge',
+)
+
+
+def _to_date(value):
+  if isinstance(value, datetime.datetime):
+    return value.date()
+  if isinstance(value, datetime.date):
+    return value
+  return datetime.datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def date_shards(start_date, end_date, days):
+  """Consecutive inclusive `(start_date, end_date)` ISO date ranges of at most `days` days covering the span."""
+  start, end = _to_date(start_date), _to_date(end_date)
+  shards = []
+  while start <= end:
+    shard_end = min(end, start + datetime.timedelta(days=days - 1))
+    shards.append((start.isoformat(), shard_end.isoformat()))
+    start = shard_end + datetime.timedelta(days=1)
+  return shards
+
+
+def check_span(start_date, end_date):
+  if start_date is None or end_date is None:
+    raise Client_Exception('shard_days requires start_date and end_date')
+
+
+def id_shards(ids, size):
+  if not ids or not size:
+    return [ids]
+  ids = list(ids)
+  return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def row_key(row):
+  return json.dumps(row, sort_keys=True, default=str)
+
+
+def shard_calls(start_date, end_date, shard_days, ids_per_shard, kwargs):
+  """Keyword arguments of every shard call, grouped by date window in date order."""
+  check_span(start_date, end_date)
+  ids_param = None
+  if ids_per_shard:
+    id_lists = [name for name, value in kwargs.items() if name.endswith('_ids') and isinstance(value, (list, tuple))]
+    if len(id_lists) != 1:
+      raise Client_Exception('ids_per_shard needs exactly one list of ids, got {}'.format(id_lists or 'none'))
+    ids_param = id_lists[0]
+  groups = id_shards(kwargs.get(ids_param), ids_per_shard) if ids_param else [None]
+  windows = []
+  for window_start, window_end in date_shards(start_date, end_date, shard_days):
+    calls = []
+    for group in groups:
+      call = dict(kwargs, start_date=window_start, end_date=window_end)
+      if ids_param:
+        call[ids_param] = group
+      calls.append(call)
+    windows.append(calls)
+  return windows
+
+
+class RowMerger():
+  """Orders the rows of one date window and drops duplicates, also against the previous window."""
+
+  def __init__(self, date_field = 'date', key = row_key):
+    self.date_field = date_field
+    self.key = key
+    self._previous = set()
+
+  def merge(self, rows):
+    rows.sort(key=lambda row: str(row.get(self.date_field, '')) if isinstance(row, dict) else '')
+    seen = set()
+    merged = []
+    for row in rows:
+      key = self.key(row)
+      if key in seen or key in self._previous:
+        continue
+      seen.add(key)
+      merged.append(row)
+    self._previous = seen
+    return merged
+
+
+def iter_sharded(method, start_date, end_date, shard_days = 31, ids_per_shard = None, max_workers = 4, date_field = 'date', key = row_key, **kwargs):
+  """Calls a report once per shard in parallel and yields its rows in date order.
+
+  The span is split into windows of `shard_days` days, and with
+  `ids_per_shard` the single `*_ids` list argument into chunks of that size.
+  The rows of a window are yielded as soon as its shards and every earlier
+  window completed, sorted by `date_field` and de-duplicated by `key`.
+
+  At most `max_workers` shards are submitted ahead of the one being read, a
+  new one as each result is taken, so memory holds the rows of the current
+  window and of `max_workers` shards whatever the length of the span.
+  """
+  windows = shard_calls(start_date, end_date, shard_days, ids_per_shard, kwargs)
+  calls = itertools.chain.from_iterable(windows)
+  merger = RowMerger(date_field, key)
+  pending = deque()
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+    def submit():
+      for call in itertools.islice(calls, max_workers - len(pending)):
+        pending.append(executor.submit(method, **call))
+
+    try:
+      submit()
+      for window in windows:
+        rows = []
+        for _ in window:
+          rows.extend(pending.popleft().result() or [])
+          submit()
+        yield from merger.merge(rows)
+    finally:
+      for future in pending:
+        future.cancel()
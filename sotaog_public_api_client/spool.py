@@ -0,0 +1,488 @@
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import Circuit_Open_Exception, Client_Exception
+
+try:
+  import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+  fcntl = None
+  import msvcrt
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+# Operations that can be replayed from the spool, all of them accept an idempotency key
+SPOOLED_OPERATIONS = (
+    'post_datapoints',
+    'batch_multiple_datapoints',
+    'batch_put_well_production',
+    'put_tank_production',
+    'post_cimarron_raw_data',
+)
+
+_SEGMENT_NAME = re.compile(r'^spool-(\d+)\.log$')
+
+
+def _batchable(entry):
+  # Only plain `{"entities": {...}}` bodies can be merged into one request
+  return entry['op'] == 'batch_multiple_datapoints' and set(entry['args'][0]) == {'entities'}
+
+
+def merge_entities(bodies):
+  """Merges `{"entities": {entity: {datatype: points}}}` bodies in order, without touching the originals."""
+  entities = {}
+  for body in bodies:
+    for entity_id, datatypes in body['entities'].items():
+      for datatype, points in datatypes.items():
+        entities.setdefault(entity_id, {}).setdefault(datatype, []).extend(points)
+  return {'entities': entities}
+
+
+def _write(f, content, fsync):
+  f.write(content)
+  f.flush()
+  if fsync:
+    os.fsync(f.fileno())
+
+
+class _Segment():
+  """One file of the spool log, with the acknowledgements of its entries next to it."""
+
+  def __init__(self, directory, first_seq):
+    self.first_seq = first_seq
+    self.path = os.path.join(directory, 'spool-{:012d}.log'.format(first_seq))
+    self.acks_path = os.path.join(directory, 'spool-{:012d}.acks'.format(first_seq))
+    self.pending = 0
+    self.split = set()
+    self._acks = None
+
+  def read_acks(self):
+    """Sequence numbers acknowledged so far, also loads the batches that were split."""
+    acked = set()
+    try:
+      with open(self.acks_path, encoding='utf-8') as f:
+        for line in f:
+          # A line torn by a crash was never acted upon
+          if not line.endswith('\n'):
+            continue
+          if line.startswith('split '):
+            self.split.add(int(line[6:]))
+          elif line.strip().isdigit():
+            acked.add(int(line))
+    except FileNotFoundError:
+      pass
+    return acked
+
+  def record(self, content, fsync):
+    if self._acks is None:
+      self._acks = open(self.acks_path, 'a', encoding='utf-8')
+    _write(self._acks, content, fsync)
+
+  def close(self):
+    if self._acks is not None:
+      self._acks.close()
+      self._acks = None
+
+  def remove(self):
+    self.close()
+    for path in (self.path, self.acks_path):
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        pass
+
+
+def _read_entry(f, path):
+  # Next complete entry of a segment file, None at its end or at a line torn by a crash
+  while True:
+    offset = f.tell()
+    line = f.readline()
+    if not line.endswith(b'\n'):
+      f.seek(offset)
+      return None
+    try:
+      return json.loads(line.decode('utf-8'))
+    except ValueError:
+      logger.warning('Skipping a corrupt spool entry in %s', path)
+
+
+def _lock_directory(directory):
+  f = open(os.path.join(directory, '.lock'), 'a+b')
+  try:
+    if fcntl is not None:
+      fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:  # pragma: no cover - Windows
+      f.seek(0)
+      msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+  except OSError:
+    f.close()
+    raise ValueError('Spool directory {} is used by another WriteSpool'.format(directory))
+  return f
+
+
+class WriteSpool():
+  """Durable write-ahead spool for datapoint and production writes.
+
+  Every write is appended to the spool log in `directory` (and fsynced with
+  `fsync`) before it returns, a background thread then replays the log
+  through the client. Each entry gets an idempotency key when it is spooled
+  and keeps it across retries and restarts. Entries of the same entity are
+  delivered in order: an entry is only sent once every earlier entry of its
+  entities was acknowledged.
+
+  Consecutive `batch_multiple_datapoints` entries are grouped into batches of
+  up to `batch_size` entries as they are appended, and a batch is sent as one
+  request keyed by its entries. A batch is final once it is first sent, so a
+  retry after a failure or a restart sends the same entries with the same
+  key. Each round sends at most `max_workers` requests in parallel. A batch
+  the API answered with an error is retried entry by entry, so a bad entry
+  only fails itself.
+
+  The log is split in files of `segment_size` entries, a file is deleted
+  once all its entries were acknowledged. Only `window_size` entries are
+  held in memory, the rest of a backlog is read from disk as it is
+  delivered. Failed sends are retried with an exponential backoff up to
+  `max_backoff` seconds. With `max_attempts`, an entry failing that many times
+  on its own is moved to `rejected.log` and `on_error` is called with the
+  entry and the exception.
+
+    with WriteSpool(client, '/var/spool/sotaog') as spool:
+      spool.batch_multiple_datapoints({'entities': {asset_id: {'oil_level': [[ts, value]]}}})
+
+  Entries still pending on close stay on disk and are sent by the next spool
+  opened on the directory. A directory is used by one spool at a time, opening
+  a second one raises ValueError.
+  """
+
+  def __init__(self, client, directory, batch_size = 100, max_workers = 4, drain_interval = 1.0, fsync = True, segment_size = 10000,
+               window_size = 10000, retry_backoff = 1.0, max_backoff = 60.0, max_attempts = None, on_error = None):
+    self.client = client
+    self.directory = directory
+    self.batch_size = batch_size
+    self.max_workers = max_workers
+    self.drain_interval = drain_interval
+    self.fsync = fsync
+    self.segment_size = segment_size
+    self.window_size = window_size
+    self.retry_backoff = retry_backoff
+    self.max_backoff = max_backoff
+    self.max_attempts = max_attempts
+    self.on_error = on_error
+    self.entries_sent = 0
+    self.requests_sent = 0
+    self.requests_failed = 0
+    os.makedirs(directory, exist_ok=True)
+    self._directory_lock = _lock_directory(directory)
+    self._lock = threading.Lock()
+    self._changed = threading.Condition(self._lock)
+    self._window = OrderedDict()
+    self._attempts = {}
+    self._load()
+    self._wakeup = threading.Event()
+    self._closed = threading.Event()
+    self._executor = ThreadPoolExecutor(max_workers=max_workers)
+    self._thread = threading.Thread(target=self._run, name='sotaog-write-spool', daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def _load(self):
+    self._segments = OrderedDict()
+    self._pending = 0
+    self._seq = 0
+    names = (_SEGMENT_NAME.match(name) for name in os.listdir(self.directory))
+    for first_seq in sorted(int(match.group(1)) for match in names if match):
+      segment = _Segment(self.directory, first_seq)
+      acked = segment.read_acks()
+      self._seq = max(self._seq, first_seq - 1)
+      with open(segment.path, 'rb') as f:
+        entry = _read_entry(f, segment.path)
+        while entry is not None:
+          self._seq = max(self._seq, entry['seq'])
+          if entry['seq'] not in acked:
+            segment.pending += 1
+          entry = _read_entry(f, segment.path)
+        if f.read(1):
+          # A write torn by a crash, it was never acknowledged to the caller
+          logger.warning('Skipping a truncated spool entry in %s', segment.path)
+      if segment.pending:
+        self._segments[first_seq] = segment
+        self._pending += segment.pending
+      else:
+        segment.remove()
+    if self._pending:
+      logger.info('Resuming %s spooled writes from %s', self._pending, self.directory)
+    self._reading = None
+    self._reader = None
+    self._acked = set()
+    self._next = None
+    self._last_batch = None
+    self._log = None
+    self._roll()
+
+  @property
+  def pending(self):
+    with self._lock:
+      return self._pending
+
+  def append(self, operation, args, entities):
+    """Spools a call of the client `operation` with `args`, delivered in order with the other writes of `entities`."""
+    if operation not in SPOOLED_OPERATIONS:
+      raise ValueError('{} cannot be spooled'.format(operation))
+    with self._lock:
+      if self._closed.is_set():
+        raise ValueError('WriteSpool is closed')
+      if self._appended >= self.segment_size:
+        self._roll()
+      seq = self._seq + 1
+      entry = {'seq': seq, 'op': operation, 'args': list(args), 'key': str(uuid.uuid4()), 'entities': sorted(str(entity) for entity in entities)}
+      if not _batchable(entry):
+        self._open_batch = None
+      elif self._open_batch is None or self._open_batch[1] >= self.batch_size:
+        self._open_batch = [seq, 0]
+      if self._open_batch is not None:
+        self._open_batch[1] += 1
+        entry['batch'] = self._open_batch[0]
+      _write(self._log, (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8'), self.fsync)
+      self._seq = seq
+      self._appended += 1
+      self._appending.pending += 1
+      self._pending += 1
+    self._wakeup.set()
+    return seq
+
+  def post_datapoints(self, asset_id, datapoints):
+    return self.append('post_datapoints', (asset_id, datapoints), [asset_id])
+
+  def batch_multiple_datapoints(self, datapoints):
+    return self.append('batch_multiple_datapoints', (datapoints,), datapoints.get('entities', {}))
+
+  def batch_put_well_production(self, production, entity = 'well_production'):
+    return self.append('batch_put_well_production', (production,), [entity])
+
+  def put_tank_production(self, body, entity = 'tank_production'):
+    return self.append('put_tank_production', (body,), [entity])
+
+  def post_cimarron_raw_data(self, body, entity = 'cimarron_raw_data'):
+    return self.append('post_cimarron_raw_data', (body,), [entity])
+
+  def _roll(self):
+    # Starts the segment new entries are appended to, batches never span two segments
+    if self._log is not None:
+      self._log.close()
+    self._appending = _Segment(self.directory, self._seq + 1)
+    self._segments[self._appending.first_seq] = self._appending
+    self._log = open(self._appending.path, 'ab')
+    self._appended = 0
+    self._open_batch = None
+
+  def _segment_of(self, seq):
+    for first_seq in reversed(self._segments):
+      if first_seq <= seq:
+        return self._segments[first_seq]
+    raise KeyError(seq)
+
+  def _read(self):
+    # Next unacknowledged entry of the log, None once every entry appended so far was read
+    while True:
+      if self._reader is not None:
+        entry = _read_entry(self._reader, self._reading.path)
+        if entry is not None:
+          if entry['seq'] not in self._acked:
+            return entry
+          continue
+        if self._reading is self._appending:
+          return None
+        if self._reader.read(1):
+          logger.warning('Skipping a truncated spool entry in %s', self._reading.path)
+        self._reader.close()
+        self._reader = None
+      following = [segment for first_seq, segment in self._segments.items() if self._reading is None or first_seq > self._reading.first_seq]
+      if not following:
+        return None
+      self._reading = following[0]
+      self._acked = self._reading.read_acks()
+      self._reader = open(self._reading.path, 'rb')
+
+  def _fill(self):
+    # Loads entries up to `window_size`, and past it the rest of a batch so it is never sent partially
+    while True:
+      if self._next is None:
+        self._next = self._read()
+        if self._next is None:
+          return
+      batch = self._next.get('batch')
+      if len(self._window) >= self.window_size and (batch is None or batch != self._last_batch):
+        return
+      self._window[self._next['seq']] = self._next
+      self._last_batch = batch
+      self._next = None
+
+  def _plan(self):
+    # Requests that can be sent now, entities with an earlier entry waiting are blocked for this round
+    with self._lock:
+      self._fill()
+      units = []
+      for entry in self._window.values():
+        batch = entry.get('batch')
+        if batch is not None and units and units[-1][0].get('batch') == batch and batch not in self._segment_of(batch).split:
+          units[-1].append(entry)
+        else:
+          units.append([entry])
+      blocked = set()
+      sends = []
+      for entries in units:
+        entities = set().union(*(entry['entities'] for entry in entries))
+        if not entities & blocked:
+          sends.append(entries)
+          if len(sends) == self.max_workers:
+            break
+        blocked |= entities
+      # Entries appended from now on start a new batch, the ones being sent are final
+      if self._open_batch is not None and any(entries[0].get('batch') == self._open_batch[0] for entries in sends):
+        self._open_batch = None
+    return sends
+
+  def _send(self, entries):
+    if len(entries) == 1:
+      entry = entries[0]
+      getattr(self.client, entry['op'])(*entry['args'], idempotency_key=entry['key'])
+    else:
+      # The entries of a batch are fixed once it is sent, a retry reuses the key
+      key = str(uuid.uuid5(uuid.NAMESPACE_OID, '|'.join(entry['key'] for entry in entries)))
+      self.client.batch_multiple_datapoints(merge_entities(entry['args'][0] for entry in entries), idempotency_key=key)
+
+  def _deliver(self, entries):
+    try:
+      self._send(entries)
+    except Exception as e:
+      return e
+    return None
+
+  def _dispatch(self, sends):
+    failed = False
+    for entries, error in zip(sends, self._executor.map(self._deliver, sends)):
+      if error is None:
+        self.requests_sent += 1
+        self.entries_sent += len(entries)
+        self._ack(entries)
+        continue
+      failed = True
+      self.requests_failed += 1
+      if len(entries) > 1:
+        # Only a request the API answered says something about its entries, a network error or an open circuit does not
+        if isinstance(error, Client_Exception) and not isinstance(error, Circuit_Open_Exception):
+          logger.warning('Unable to replay a batch of %s spooled writes, retrying them one by one: %s', len(entries), error)
+          self._split(entries[0]['batch'])
+        else:
+          logger.warning('Unable to replay a batch of %s spooled writes: %s', len(entries), error)
+      else:
+        logger.warning('Unable to replay spooled %s %s: %s', entries[0]['op'], entries[0]['seq'], error)
+        if self.max_attempts:
+          self._reject(entries[0], error)
+    return failed
+
+  def _split(self, batch):
+    with self._lock:
+      segment = self._segment_of(batch)
+      segment.record('split {}\n'.format(batch), self.fsync)
+      segment.split.add(batch)
+
+  def _reject(self, entry, error):
+    attempts = self._attempts.get(entry['seq'], 0) + 1
+    self._attempts[entry['seq']] = attempts
+    if attempts < self.max_attempts:
+      return
+    with open(os.path.join(self.directory, 'rejected.log'), 'a', encoding='utf-8') as f:
+      _write(f, json.dumps(entry, separators=(',', ':')) + '\n', self.fsync)
+    self._ack([entry])
+    if self.on_error is not None:
+      self.on_error(entry, error)
+    else:
+      logger.error('Rejected spooled %s %s after %s attempts', entry['op'], entry['seq'], self.max_attempts)
+
+  def _ack(self, entries):
+    with self._lock:
+      segments = OrderedDict()
+      for entry in entries:
+        segments.setdefault(self._segment_of(entry['seq']), []).append(entry['seq'])
+      for segment, seqs in segments.items():
+        segment.record(''.join('{}\n'.format(seq) for seq in seqs), self.fsync)
+        segment.pending -= len(seqs)
+      for entry in entries:
+        self._window.pop(entry['seq'], None)
+        self._attempts.pop(entry['seq'], None)
+      self._pending -= len(entries)
+      self._compact()
+      self._changed.notify_all()
+
+  def compact(self):
+    """Deletes the log files whose entries were all delivered, done after every acknowledgement."""
+    with self._lock:
+      self._compact()
+
+  def _compact(self):
+    for first_seq, segment in list(self._segments.items()):
+      if segment.pending or segment is self._appending or segment is self._reading:
+        continue
+      segment.remove()
+      del self._segments[first_seq]
+      logger.debug('Removed delivered spool segment %s', segment.path)
+
+  def _run(self):
+    backoff = 0
+    while not self._closed.is_set():
+      self._wakeup.clear()
+      sends = self._plan()
+      if not sends:
+        self._wakeup.wait(self.drain_interval)
+        continue
+      try:
+        failed = self._dispatch(sends)
+      except Exception:
+        logger.exception('Spool replay failed')
+        failed = True
+      if failed:
+        backoff = min(self.max_backoff, backoff * 2 or self.retry_backoff)
+        self._closed.wait(backoff)
+      else:
+        backoff = 0
+
+  def drain(self, timeout = None):
+    """Waits until every spooled write was delivered, returns False if `timeout` expired first."""
+    self._wakeup.set()
+    with self._changed:
+      return self._changed.wait_for(lambda: not self._pending, timeout)
+
+  def close(self, timeout = 30.0):
+    """Waits up to `timeout` seconds for pending writes (forever with None), then stops the background thread."""
+    if self._closed.is_set():
+      return
+    if timeout != 0:
+      self.drain(timeout)
+    with self._lock:
+      self._closed.set()
+    self._wakeup.set()
+    self._thread.join()
+    self._executor.shutdown(wait=True)
+    with self._lock:
+      self._log.close()
+      if self._reader is not None:
+        self._reader.close()
+        self._reader = None
+      self._reading = None
+      self._appending = None
+      self._compact()
+      for segment in self._segments.values():
+        segment.close()
+      self._directory_lock.close()
@@ -0,0 +1,61 @@
+import csv
+from array import array
+from bisect import bisect_left
+
+try:
+  import numpy
+except ImportError:  # pragma: no cover - optional dependency
+  numpy = None
+
+NAN = float('nan')
+
+
+def parse_strapping_csv(text):
+  """`(level, volume)` pairs of a strapping table CSV, blank lines are skipped."""
+  return [(float(row[0]), float(row[1])) for row in csv.reader(text.split('\n'), delimiter=',') if row]
+
+
+class StrappingTable():
+  """Gauge level to volume conversion of a tank, interpolating linearly between strapping points.
+
+  Levels and volumes are kept as parallel sorted `array('d')`s. Levels outside
+  the strapped range convert to NaN rather than being extrapolated.
+
+    table = client.get_tank_strapping_table(tank_id)
+    volume = table.interpolate(gauge)
+    volumes = table.interpolate_many(gauges)
+  """
+
+  def __init__(self, points):
+    points = sorted(points)
+    self.levels = array('d', [level for level, _ in points])
+    self.volumes = array('d', [volume for _, volume in points])
+
+  @classmethod
+  def from_csv(cls, text):
+    return cls(parse_strapping_csv(text))
+
+  def __len__(self):
+    return len(self.levels)
+
+  def __repr__(self):
+    return 'StrappingTable({} points)'.format(len(self))
+
+  def interpolate(self, level):
+    levels = self.levels
+    i = bisect_left(levels, level)
+    if i == len(levels):
+      return NAN
+    if levels[i] == level:
+      return self.volumes[i]
+    if i == 0:
+      return NAN
+    low, high = levels[i - 1], levels[i]
+    return self.volumes[i - 1] + (self.volumes[i] - self.volumes[i - 1]) * (level - low) / (high - low)
+
+  def interpolate_many(self, levels):
+    """Volumes of many gauge levels at once, a NumPy array when NumPy is installed and an `array('d')` otherwise."""
+    if numpy is None or not self.levels:
+      return array('d', map(self.interpolate, levels))
+    return numpy.interp(numpy.asarray(levels, dtype=numpy.float64), numpy.frombuffer(self.levels, dtype=numpy.float64),
+                        numpy.frombuffer(self.volumes, dtype=numpy.float64), left=NAN, right=NAN)
@@ -0,0 +1,171 @@
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from .columnar import NAN, Series
+from .exceptions import Client_Exception
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS series (
+  asset TEXT NOT NULL,
+  datatype TEXT NOT NULL,
+  high_water_mark INTEGER,
+  synced_at REAL,
+  PRIMARY KEY (asset, datatype)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS points (
+  asset TEXT NOT NULL,
+  datatype TEXT NOT NULL,
+  ts INTEGER NOT NULL,
+  value REAL,
+  PRIMARY KEY (asset, datatype, ts)
+) WITHOUT ROWID;
+'''
+
+
+class DatapointStore():
+  """Local SQLite copy of datapoint series, with the newest synced timestamp of each series.
+
+  Points are clustered by `(asset, datatype, ts)` so a range read is a single
+  index scan. The store can be shared between threads, writes are serialized.
+  Marks are upserted with `ON CONFLICT ... DO UPDATE`, which needs SQLite 3.24
+  or newer.
+  """
+
+  def __init__(self, path):
+    if sqlite3.sqlite_version_info < (3, 24, 0):
+      raise Client_Exception('DatapointStore requires SQLite 3.24 or newer, found {}'.format(sqlite3.sqlite_version))
+    self.path = path
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    if path != ':memory:':
+      self._conn.execute('PRAGMA journal_mode=WAL')
+    self._conn.execute('PRAGMA synchronous=NORMAL')
+    self._conn.executescript(_SCHEMA)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def close(self):
+    with self._lock:
+      self._conn.close()
+
+  def high_water_mark(self, asset_id, datatype):
+    with self._lock:
+      row = self._conn.execute('SELECT high_water_mark FROM series WHERE asset = ? AND datatype = ?', (asset_id, datatype)).fetchone()
+    return row[0] if row else None
+
+  def series(self):
+    """`{(asset, datatype): high_water_mark}` of every synced series."""
+    with self._lock:
+      return {(asset, datatype): mark for asset, datatype, mark in self._conn.execute('SELECT asset, datatype, high_water_mark FROM series')}
+
+  def write(self, asset_id, points):
+    """Stores `(datatype, ts, value)` points in one transaction and moves the marks of their series forward."""
+    marks = {}
+    rows = []
+    for datatype, ts, value in points:
+      rows.append((asset_id, datatype, ts, value))
+      if datatype not in marks or ts > marks[datatype]:
+        marks[datatype] = ts
+    if not rows:
+      return 0
+    now = time.time()
+    with self._lock:
+      conn = self._conn
+      conn.execute('BEGIN')
+      try:
+        conn.executemany('INSERT OR REPLACE INTO points (asset, datatype, ts, value) VALUES (?, ?, ?, ?)', rows)
+        conn.executemany(
+            'INSERT INTO series (asset, datatype, high_water_mark, synced_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (asset, datatype) DO UPDATE SET high_water_mark = MAX(COALESCE(high_water_mark, excluded.high_water_mark), excluded.high_water_mark), '
+            'synced_at = excluded.synced_at',
+            [(asset_id, datatype, mark, now) for datatype, mark in marks.items()])
+        conn.execute('COMMIT')
+      except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return len(rows)
+
+  def read(self, asset_id, datatype, start_ts = None, end_ts = None):
+    """Points of a series with `start_ts <= ts <= end_ts` as a `Series`, in ascending order."""
+    query = 'SELECT ts, value FROM points WHERE asset = ? AND datatype = ?'
+    args = [asset_id, datatype]
+    if start_ts is not None:
+      query += ' AND ts >= ?'
+      args.append(start_ts)
+    if end_ts is not None:
+      query += ' AND ts <= ?'
+      args.append(end_ts)
+    with self._lock:
+      rows = self._conn.execute(query + ' ORDER BY ts', args).fetchall()
+    return Series(array('q', [row[0] for row in rows]), array('d', [NAN if row[1] is None else row[1] for row in rows]))
+
+  def delete(self, asset_id, datatype):
+    with self._lock, self._conn as conn:
+      # Committed together or rolled back on error
+      conn.execute('BEGIN')
+      conn.execute('DELETE FROM points WHERE asset = ? AND datatype = ?', (asset_id, datatype))
+      conn.execute('DELETE FROM series WHERE asset = ? AND datatype = ?', (asset_id, datatype))
+
+
+class DatapointSync():
+  """Keeps a `DatapointStore` up to date by fetching only points newer than each series' high water mark.
+
+  Series of an asset synced before are fetched together from the oldest of
+  their marks, series never synced are fetched from `start_ts` (their whole
+  history by default). Points are committed with their marks every
+  `batch_size` points, so an interrupted sync resumes where it stopped.
+
+    with DatapointStore('datapoints.db') as store:
+      DatapointSync(client, store).sync_many({asset_id: ['oil_level', 'water_level']})
+      series = store.read(asset_id, 'oil_level', start_ts, end_ts)
+  """
+
+  def __init__(self, client, store, page_size = 1000, batch_size = 10000, max_workers = 4):
+    self.client = client
+    self.store = store
+    self.page_size = page_size
+    self.batch_size = batch_size
+    self.max_workers = max_workers
+
+  def sync(self, asset_id, datatypes, start_ts = None):
+    """Fetches the new points of an asset's series, returns how many were stored."""
+    marks = {datatype: self.store.high_water_mark(asset_id, datatype) for datatype in datatypes}
+    synced = [datatype for datatype in datatypes if marks[datatype] is not None]
+    new = [datatype for datatype in datatypes if marks[datatype] is None]
+    stored = 0
+    if synced:
+      stored += self._fetch(asset_id, synced, min(marks[datatype] for datatype in synced), marks)
+    if new:
+      stored += self._fetch(asset_id, new, start_ts, marks)
+    logger.debug('Synced %s new datapoints for asset %s', stored, asset_id)
+    return stored
+
+  def _fetch(self, asset_id, datatypes, start_ts, marks):
+    stored = 0
+    batch = []
+    for datatype, ts, value in self.client.iter_asset_datapoints(asset_id, datatypes, start_ts=start_ts, sort='asc', page_size=self.page_size):
+      mark = marks.get(datatype)
+      if mark is not None and ts <= mark:
+        continue
+      batch.append((datatype, ts, value))
+      if len(batch) >= self.batch_size:
+        stored += self.store.write(asset_id, batch)
+        batch = []
+    stored += self.store.write(asset_id, batch)
+    return stored
+
+  def sync_many(self, asset_datatypes, start_ts = None):
+    """Syncs `{asset_id: [datatypes]}` with up to `max_workers` assets in parallel, returns the points stored per asset."""
+    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+      futures = {asset_id: executor.submit(self.sync, asset_id, datatypes, start_ts) for asset_id, datatypes in asset_datatypes.items()}
+      return {asset_id: future.result() for asset_id, future in futures.items()}
@@ -0,0 +1,505 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError, Timeout
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+  import httpx
+except ImportError:  # pragma: no cover - optional dependency
+  httpx = None
+
+from .exceptions import Circuit_Open_Exception
+from .uploads import CHUNK_SIZE
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+IDEMPOTENCY_KEY_HEADER = 'idempotency-key'
+# Seconds to connect and between two reads of a response, for requests sent without a timeout
+DEFAULT_TIMEOUT = (10, 300)
+
+
+def parse_retry_after(value):
+  # Retry-After is either a number of seconds or an HTTP date
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+  except (TypeError, ValueError):
+    return None
+
+
+class RetryPolicy():
+  """When and how long to wait before retrying a request.
+
+  Delays use exponential backoff with full jitter, `backoff_factor * 2 ** attempt`
+  capped at `backoff_max`, unless the response carries a `Retry-After` header.
+  With `requires_idempotency_key` the policy only applies to requests sent with an
+  `idempotency-key` header, or to read-only calls sent with `retry=True`.
+  """
+
+  def __init__(self, total = 3, backoff_factor = 0.5, backoff_max = 30, statuses = (429, 500, 502, 503, 504),
+               retry_errors = True, respect_retry_after = True, retry_after_max = 300, requires_idempotency_key = False):
+    self.total = total
+    self.backoff_factor = backoff_factor
+    self.backoff_max = backoff_max
+    self.statuses = frozenset(statuses)
+    self.retry_errors = retry_errors
+    self.respect_retry_after = respect_retry_after
+    self.retry_after_max = retry_after_max
+    self.requires_idempotency_key = requires_idempotency_key
+
+  def applies(self, headers, retry = False):
+    return retry or not self.requires_idempotency_key or IDEMPOTENCY_KEY_HEADER in {key.lower() for key in headers or {}}
+
+  def get_delay(self, attempt, status = None, retry_after = None, error = False):
+    """Returns the number of seconds to wait before the next attempt, or None to give up."""
+    if attempt >= self.total:
+      return None
+    if error:
+      if not self.retry_errors:
+        return None
+    elif status not in self.statuses:
+      return None
+    if self.respect_retry_after:
+      delay = parse_retry_after(retry_after)
+      if delay is not None:
+        return min(delay, self.retry_after_max)
+    return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+
+DEFAULT_RETRY_POLICIES = {
+    'GET': RetryPolicy(),
+    'HEAD': RetryPolicy(),
+    'OPTIONS': RetryPolicy(),
+    'PUT': RetryPolicy(),
+    'DELETE': RetryPolicy(),
+    'POST': RetryPolicy(requires_idempotency_key=True),
+}
+
+
+def select_retry_policy(policies, method, headers, retry = False):
+  policy = policies.get(method.upper())
+  if policy is not None and policy.applies(headers, retry):
+    return policy
+  return None
+
+
+class CircuitBreaker():
+  """Per host circuit breaker.
+
+  After `failure_threshold` consecutive failures (connection errors or 5xx
+  responses) requests to the host fail fast with `Circuit_Open_Exception` for
+  `reset_timeout` seconds. After that a single trial request is let through, and
+  its outcome closes the circuit or opens it again.
+  """
+
+  def __init__(self, failure_threshold = 5, reset_timeout = 30):
+    self.failure_threshold = failure_threshold
+    self.reset_timeout = reset_timeout
+    self._failures = {}
+    self._opened_at = {}
+    self._trial = set()
+    self._lock = threading.Lock()
+
+  def before_request(self, host):
+    with self._lock:
+      opened_at = self._opened_at.get(host)
+      if opened_at is None:
+        return
+      if time.monotonic() - opened_at < self.reset_timeout or host in self._trial:
+        raise Circuit_Open_Exception('Circuit open for {}'.format(host))
+      self._trial.add(host)
+
+  def record(self, host, failed):
+    with self._lock:
+      self._trial.discard(host)
+      if not failed:
+        self._failures.pop(host, None)
+        self._opened_at.pop(host, None)
+        return
+      failures = self._failures.get(host, 0) + 1
+      self._failures[host] = failures
+      if failures >= self.failure_threshold:
+        if host not in self._opened_at:
+          logger.warning('Opening circuit for %s after %s consecutive failures', host, failures)
+        self._opened_at[host] = time.monotonic()
+
+  def is_open(self, host):
+    return host in self._opened_at
+
+
+def is_failure_status(status):
+  return status >= 500
+
+
+class RetryAdapter(HTTPAdapter):
+  """HTTPAdapter retrying requests according to per verb `RetryPolicy`s and guarded by a `CircuitBreaker`.
+
+  `timeout`, a number of seconds or a `(connect, read)` tuple, applies to
+  requests sent without one.
+  """
+
+  def __init__(self, retry_policies = None, circuit_breaker = None, sleep = time.sleep, timeout = None, **kwargs):
+    self.retry_policies = DEFAULT_RETRY_POLICIES if retry_policies is None else retry_policies
+    self.circuit_breaker = circuit_breaker
+    self.sleep = sleep
+    self.timeout = timeout
+    super().__init__(**kwargs)
+
+  def send(self, request, retry = False, **kwargs):
+    if kwargs.get('timeout') is None and self.timeout is not None:
+      kwargs['timeout'] = self.timeout
+    policy = select_retry_policy(self.retry_policies, request.method, request.headers, retry)
+    host = urlparse(request.url).netloc
+    position = request.body.tell() if hasattr(request.body, 'tell') else None
+    if position is None and request.body is not None and not isinstance(request.body, (bytes, str)):
+      # A streamed body cannot be replayed unless it can be rewound
+      policy = None
+    attempt = 0
+    while True:
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.before_request(host)
+      try:
+        response = super().send(request, **kwargs)
+      except (ConnectionError, Timeout) as e:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True)
+        delay = policy.get_delay(attempt, error=True) if policy else None
+        if delay is None:
+          raise
+        reason = e
+      except BaseException:
+        # Any other error still ends a half-open trial, or the circuit would stay open for good
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True)
+        raise
+      else:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, is_failure_status(response.status_code))
+        delay = policy.get_delay(attempt, response.status_code, response.headers.get('Retry-After')) if policy else None
+        if delay is None:
+          response.retries = attempt
+          return response
+        reason = response.status_code
+        response.close()
+      attempt += 1
+      if position is not None:
+        request.body.seek(position)
+      logger.warning('Retrying %s %s in %.2fs after %s (attempt %s)', request.method, request.url, delay, reason, attempt)
+      self.sleep(delay)
+
+
+class CachingAdapter(RetryAdapter):
+  """RetryAdapter serving cacheable GETs from a `ResponseCache`."""
+
+  def __init__(self, response_cache, *args, client_id = None, **kwargs):
+    self.response_cache = response_cache
+    self.client_id = client_id
+    super().__init__(*args, **kwargs)
+
+  def _from_cache(self, request, entry):
+    response = Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = entry.content
+    response.url = request.url
+    response.request = request
+    response.connection = self
+    response.from_cache = True
+    return response
+
+  def send(self, request, **kwargs):
+    cache = self.response_cache
+    ttl = cache.ttl_for(request.url) if request.method == 'GET' else None
+    if ttl is None or kwargs.get('stream'):
+      return super().send(request, **kwargs)
+    key = cache.key(request.url, request.headers.get('x-sotaog-customer-id'), self.client_id)
+    entry = cache.get(key)
+    if entry is not None:
+      if entry.is_fresh():
+        cache.count('hits')
+        return self._from_cache(request, entry)
+      if entry.can_revalidate():
+        request.headers.update(cache.conditional_headers(entry))
+    response = super().send(request, **kwargs)
+    if response.status_code == 304 and entry is not None:
+      logger.debug('Revalidated cached response for %s', request.url)
+      cache.count('revalidated')
+      cache.touch(entry, response.headers)
+      return self._from_cache(request, entry)
+    cache.count('misses')
+    if response.status_code == 200:
+      cache.store(key, response.headers, response.content, ttl)
+    return response
+
+
+class Transport():
+  """How a `Client` sends its requests, the default sends them with urllib3 through `requests`.
+
+  The client keeps its `requests.Session`, and mounts the adapter built by
+  `adapter`: `retry_adapter_class`, or `caching_adapter_class` with a response
+  cache, so retries, the circuit breaker and the response cache work the same
+  whatever sends the bytes. Another HTTP stack plugs in by subclassing with
+  adapter classes layering `RetryAdapter` and `CachingAdapter` over its own
+  `HTTPAdapter`.
+
+  `timeout` (seconds, or a `(connect, read)` tuple, `DEFAULT_TIMEOUT` by
+  default and None to wait forever) applies to every request, `pool_block`
+  makes requests wait for a free connection instead of opening one that is
+  discarded afterwards. `stats()` tells how many connections were opened for
+  how many requests. A transport can be shared by several clients, `close()`
+  only closes it once every client that `acquire`d it closed it.
+  """
+
+  retry_adapter_class = RetryAdapter
+  caching_adapter_class = CachingAdapter
+
+  def __init__(self, timeout = DEFAULT_TIMEOUT, pool_connections = DEFAULT_POOLSIZE, pool_block = False):
+    self.timeout = timeout
+    self.pool_connections = pool_connections
+    self.pool_block = pool_block
+    self._adapters = []
+    self._released = (0, 0)
+    self._users = 0
+    self._lock = threading.Lock()
+
+  def acquire(self):
+    """Counts one more client using the transport and returns it."""
+    with self._lock:
+      self._users += 1
+    return self
+
+  def _release_user(self):
+    # True once no client uses the transport anymore
+    with self._lock:
+      self._users = max(0, self._users - 1)
+      return self._users == 0
+
+  def adapter(self, retry_policies, circuit_breaker, response_cache = None, pool_maxsize = DEFAULT_POOLSIZE, client_id = None):
+    kwargs = {'timeout': self.timeout, 'pool_connections': self.pool_connections, 'pool_maxsize': pool_maxsize, 'pool_block': self.pool_block}
+    if response_cache is not None:
+      adapter = self.caching_adapter_class(response_cache, retry_policies, circuit_breaker, client_id=client_id, **kwargs)
+    else:
+      adapter = self.retry_adapter_class(retry_policies, circuit_breaker, **kwargs)
+    with self._lock:
+      self._adapters.append(adapter)
+    return adapter
+
+  def release(self, adapter):
+    """Closes an adapter the session no longer uses, its requests still count in `stats()`."""
+    with self._lock:
+      if adapter in self._adapters:
+        self._adapters.remove(adapter)
+        requests, connections = self._counts(adapter)
+        self._released = (self._released[0] + requests, self._released[1] + connections)
+    adapter.close()
+
+  def _counts(self, adapter):
+    requests = connections = 0
+    pools = adapter.poolmanager.pools
+    for key in pools.keys():
+      pool = pools.get(key)
+      if pool is not None:
+        requests += pool.num_requests
+        connections += pool.num_connections
+    return requests, connections
+
+  def stats(self):
+    """`{'requests': ..., 'connections_opened': ..., 'connections_reused': ...}` since the transport was created."""
+    with self._lock:
+      adapters = list(self._adapters)
+      requests, connections = self._released
+    for adapter in adapters:
+      counts = self._counts(adapter)
+      requests += counts[0]
+      connections += counts[1]
+    return {'requests': requests, 'connections_opened': connections, 'connections_reused': max(0, requests - connections)}
+
+  def close(self):
+    if not self._release_user():
+      return
+    with self._lock:
+      adapters = self._adapters
+      self._adapters = []
+    for adapter in adapters:
+      adapter.close()
+
+
+def _httpx_timeout(timeout):
+  if isinstance(timeout, httpx.Timeout):
+    return timeout
+  if isinstance(timeout, tuple):
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+  return httpx.Timeout(timeout)
+
+
+def _body(body):
+  # File bodies are sent in chunks, httpx would iterate them line by line
+  if body is None or isinstance(body, (bytes, str)):
+    return body
+  if hasattr(body, 'read'):
+    return iter(lambda: body.read(CHUNK_SIZE), b'')
+  return body
+
+
+@contextmanager
+def _httpx_errors(request, reading = False):
+  # Raise what requests raises for the same failure, so callers only handle requests exceptions
+  try:
+    yield
+  except httpx.TimeoutException as e:
+    raise Timeout(e, request=request)
+  except httpx.DecodingError as e:
+    raise ContentDecodingError(e, request=request)
+  except (httpx.RemoteProtocolError, httpx.ReadError) as e:
+    if reading:
+      # A body cut short, urllib3 reports it as a ProtocolError that requests turns into this
+      raise ChunkedEncodingError(e, request=request)
+    raise ConnectionError(e, request=request)
+  except httpx.TransportError as e:
+    raise ConnectionError(e, request=request)
+
+
+class _RawResponse():
+  # The parts of urllib3's response `requests.Response` uses to stream the body
+  def __init__(self, response, request):
+    self._response = response
+    self._request = request
+
+  def stream(self, chunk_size = None, decode_content = True):
+    with _httpx_errors(self._request, reading=True):
+      yield from self._response.iter_bytes(chunk_size)
+
+  def read(self, amt = None):
+    with _httpx_errors(self._request, reading=True):
+      return b''.join(self._response.iter_bytes(amt))
+
+  def close(self):
+    self._response.close()
+
+  def release_conn(self):
+    self._response.close()
+
+
+class HttpxAdapter(HTTPAdapter):
+  """Requests adapter sending through an `httpx.Client`, over HTTP/2 when the server supports it.
+
+  With HTTP/2 concurrent requests to the API are multiplexed over one TLS
+  connection. TLS verification, certificates and proxies are those of the
+  httpx client, not the per request settings of `requests`.
+  """
+
+  def __init__(self, transport, **kwargs):
+    self.transport = transport
+    super().__init__(**kwargs)
+
+  def send(self, request, stream = False, timeout = None, verify = True, cert = None, proxies = None):
+    client = self.transport.client
+    httpx_request = client.build_request(request.method, request.url, headers=request.headers, content=_body(request.body),
+                                         timeout=_httpx_timeout(timeout), extensions={'trace': self.transport._trace})
+    with _httpx_errors(request):
+      response = client.send(httpx_request, stream=True)
+    self.transport._count(response.http_version)
+    result = Response()
+    result.status_code = response.status_code
+    result.reason = response.reason_phrase
+    result.headers = CaseInsensitiveDict(response.headers.items())
+    result.encoding = get_encoding_from_headers(result.headers)
+    result.url = request.url
+    result.request = request
+    result.connection = self
+    result.raw = _RawResponse(response, request)
+    if not stream:
+      try:
+        with _httpx_errors(request, reading=True):
+          result._content = response.read()
+      finally:
+        response.close()
+    return result
+
+
+class HttpxRetryAdapter(RetryAdapter, HttpxAdapter):
+  pass
+
+
+class HttpxCachingAdapter(CachingAdapter, HttpxAdapter):
+  pass
+
+
+class HttpxTransport(Transport):
+  """Transport sending requests with httpx, over HTTP/2 unless `http2=False`.
+
+  Every adapter shares one `httpx.Client`, so a fan-out of concurrent calls
+  reuses a few multiplexed connections instead of opening one TLS connection
+  per thread. `max_connections`, `max_keepalive_connections` and
+  `keepalive_expiry` (seconds an idle connection is kept open) tune its
+  pool. `stats()` also counts TLS handshakes and requests per HTTP version.
+
+    client = Client(url, client_id, client_secret, transport=HttpxTransport(timeout=(5, 60)))
+
+  Needs `httpx[http2]`, install sotaog_public_api_client[http2].
+  """
+
+  retry_adapter_class = HttpxRetryAdapter
+  caching_adapter_class = HttpxCachingAdapter
+
+  def __init__(self, http2 = True, timeout = DEFAULT_TIMEOUT, max_connections = 100, max_keepalive_connections = 20, keepalive_expiry = 30.0, verify = True):
+    if httpx is None:
+      raise ImportError('HttpxTransport requires httpx, install sotaog_public_api_client[http2]')
+    super().__init__(timeout)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry)
+    self.client = httpx.Client(http2=http2, limits=limits, verify=verify, timeout=_httpx_timeout(timeout))
+    self._requests = 0
+    self._connections = 0
+    self._handshakes = 0
+    self._versions = {}
+
+  def adapter(self, retry_policies, circuit_breaker, response_cache = None, pool_maxsize = DEFAULT_POOLSIZE, client_id = None):
+    # Pooling is done by the shared httpx client, the urllib3 pool of the adapter stays unused
+    kwargs = {'timeout': self.timeout, 'pool_connections': 1, 'pool_maxsize': 1}
+    if response_cache is not None:
+      return self.caching_adapter_class(response_cache, retry_policies, circuit_breaker, transport=self, client_id=client_id, **kwargs)
+    return self.retry_adapter_class(retry_policies, circuit_breaker, transport=self, **kwargs)
+
+  def _trace(self, event, info):
+    if event == 'connection.connect_tcp.complete':
+      with self._lock:
+        self._connections += 1
+    elif event == 'connection.start_tls.complete':
+      with self._lock:
+        self._handshakes += 1
+
+  def _count(self, http_version):
+    with self._lock:
+      self._requests += 1
+      self._versions[http_version] = self._versions.get(http_version, 0) + 1
+
+  def stats(self):
+    with self._lock:
+      return {
+          'requests': self._requests,
+          'connections_opened': self._connections,
+          'connections_reused': max(0, self._requests - self._connections),
+          'tls_handshakes': self._handshakes,
+          'http_versions': dict(self._versions),
+      }
+
+  def close(self):
+    if self._release_user():
+      self.client.close()
@@ -0,0 +1,32 @@
+import mimetypes
+import os
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_path(image):
+  return isinstance(image, (str, os.PathLike))
+
+
+def guess_content_type(image):
+  """Content type from the file name of a path or file object, `application/octet-stream` when unknown."""
+  name = image if is_path(image) else getattr(image, 'name', None)
+  if is_path(name):
+    content_type, _ = mimetypes.guess_type(os.fspath(name))
+    if content_type:
+      return content_type
+  return 'application/octet-stream'
+
+
+def remaining_size(f):
+  # Bytes left in a regular file from its current position, None for pipes and other streams
+  try:
+    return os.fstat(f.fileno()).st_size - f.tell()
+  except (AttributeError, OSError, ValueError):
+    return None
+
+
+def upload_job(job, content_type = None):
+  """`(truck_ticket_id, timestamp, image, content_type)` of a bulk upload job, the content type is optional."""
+  truck_ticket_id, timestamp, image = job[:3]
+  return truck_ticket_id, timestamp, image, job[3] if len(job) > 3 else content_type
@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .exceptions import Client_Exception
+
+logger = logging.getLogger('sotaog_public_api_client')
+
+
+def _point_size(ts, value):
+  # Serialized size of `[ts, value], ` without running json.dumps on the hot path, repr matches json for numbers
+  return len(repr(ts)) + len(repr(value)) + 6
+
+
+def _key_size(key):
+  # `"key": {}, ` / `"key": [], `
+  return len(str(key)) + 8
+
+
+def split_entities(entities, max_bytes):
+  """Splits an `{entity: {datatype: [[ts, value], ...]}}` mapping into chunks of at most ~`max_bytes` serialized.
+
+  A single point larger than `max_bytes` still gets a chunk of its own.
+  """
+  chunk = {}
+  size = 0
+  for entity_id, datatypes in entities.items():
+    for datatype, points in datatypes.items():
+      overhead = _key_size(entity_id) + _key_size(datatype)
+      series_size = overhead
+      start = 0
+      for i, (ts, value) in enumerate(points):
+        point_size = _point_size(ts, value)
+        if size + series_size + point_size > max_bytes and (chunk or i > start):
+          if i > start:
+            chunk.setdefault(entity_id, {})[datatype] = points[start:i]
+          yield chunk
+          chunk = {}
+          size = 0
+          series_size = overhead
+          start = i
+        series_size += point_size
+      if len(points) > start:
+        chunk.setdefault(entity_id, {})[datatype] = points[start:]
+        size += series_size
+  if chunk:
+    yield chunk
+
+
+class DatapointWriter():
+  """Buffers datapoints and posts them with `batch_multiple_datapoints` from background threads.
+
+  Points are grouped per entity and datatype into the `{"entities": {...}}` body.
+  The buffer is flushed once it holds `max_points` points or ~`max_bytes`
+  serialized, or `flush_interval` seconds after its first point. Each flush is
+  split into requests of at most ~`max_request_bytes` and sent by
+  `max_workers` threads. Once `max_pending` requests are queued or in flight,
+  `write` blocks until one completes.
+
+    with DatapointWriter(client) as writer:
+      for entity_id, datatype, ts, value in readings:
+        writer.write(entity_id, datatype, ts, value)
+  """
+
+  def __init__(self, client, max_points = 10000, max_bytes = 1024 * 1024, flush_interval = 5.0, max_request_bytes = 1024 * 1024,
+               max_workers = 4, max_pending = None, on_error = None):
+    if not flush_interval > 0:
+      raise Client_Exception('flush_interval must be positive, got {}'.format(flush_interval))
+    self.client = client
+    self.max_points = max_points
+    self.max_bytes = max_bytes
+    self.flush_interval = flush_interval
+    self.max_request_bytes = max_request_bytes
+    self.on_error = on_error
+    self.points_written = 0
+    self.requests_sent = 0
+    self.requests_failed = 0
+    self._entities = {}
+    self._points = 0
+    self._bytes = 0
+    self._first_write = None
+    self._lock = threading.Lock()
+    self._pending = threading.BoundedSemaphore(max_pending or 2 * max_workers)
+    self._executor = ThreadPoolExecutor(max_workers=max_workers)
+    self._futures = set()
+    self._closed = threading.Event()
+    self._thread = threading.Thread(target=self._run, name='sotaog-datapoint-writer', daemon=True)
+    self._thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def write(self, entity_id, datatype, ts, value):
+    with self._lock:
+      self._append(entity_id, datatype, [[ts, value]])
+      full = self._is_full()
+    if full:
+      self.flush()
+
+  def write_many(self, points):
+    """Buffers an iterable of `(entity_id, datatype, ts, value)` tuples."""
+    for entity_id, datatype, ts, value in points:
+      self.write(entity_id, datatype, ts, value)
+
+  def write_entities(self, entities):
+    """Buffers an `{entity_id: {datatype: [[ts, value], ...]}}` mapping, the shape of the `entities` body."""
+    with self._lock:
+      for entity_id, datatypes in entities.items():
+        for datatype, points in datatypes.items():
+          self._append(entity_id, datatype, points)
+      full = self._is_full()
+    if full:
+      self.flush()
+
+  def _append(self, entity_id, datatype, points):
+    if self._closed.is_set():
+      raise ValueError('DatapointWriter is closed')
+    self._entities.setdefault(entity_id, {}).setdefault(datatype, []).extend(points)
+    self._points += len(points)
+    self._bytes += sum(_point_size(ts, value) for ts, value in points)
+    if self._first_write is None:
+      self._first_write = time.monotonic()
+
+  def _is_full(self):
+    return self._points >= self.max_points or self._bytes >= self.max_bytes
+
+  def _take(self):
+    with self._lock:
+      entities = self._entities
+      points = self._points
+      self._entities = {}
+      self._points = 0
+      self._bytes = 0
+      self._first_write = None
+    return entities, points
+
+  def flush(self, block = False):
+    """Submits the buffered points, with `block` waits until every submitted request completed."""
+    entities, points = self._take()
+    if points:
+      logger.debug('Flushing %s datapoints for %s entities', points, len(entities))
+      for chunk in split_entities(entities, self.max_request_bytes):
+        self._pending.acquire()
+        try:
+          future = self._executor.submit(self._send, chunk)
+        except BaseException:
+          self._pending.release()
+          raise
+        with self._lock:
+          self._futures.add(future)
+        future.add_done_callback(self._done)
+    if block:
+      with self._lock:
+        futures = list(self._futures)
+      wait(futures)
+
+  def _done(self, future):
+    with self._lock:
+      self._futures.discard(future)
+
+  def _send(self, entities):
+    try:
+      self.client.batch_multiple_datapoints({'entities': entities}, idempotency_key=str(uuid.uuid4()))
+      points = sum(len(points) for datatypes in entities.values() for points in datatypes.values())
+      with self._lock:
+        self.requests_sent += 1
+        self.points_written += points
+    except Exception as e:
+      with self._lock:
+        self.requests_failed += 1
+      if self.on_error is not None:
+        self.on_error(entities, e)
+      else:
+        logger.exception('Unable to write datapoints for %s entities', len(entities))
+    finally:
+      self._pending.release()
+
+  def _run(self):
+    while not self._closed.wait(min(1.0, self.flush_interval)):
+      first_write = self._first_write
+      if first_write is not None and time.monotonic() - first_write >= self.flush_interval:
+        try:
+          self.flush()
+        except Exception:
+          logger.exception('Background datapoint flush failed')
+
+  def close(self):
+    """Flushes the remaining points, waits for every request and stops the background threads."""
+    if self._closed.is_set():
+      return
+    self._closed.set()
+    self._thread.join()
+    self.flush()
+    self._executor.shutdown(wait=True)
@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubRequest:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode())
+
+
+class StubApi:
+    """Local stand-in for the Public API.
+
+    `routes` maps `(method, path)` to a function of the `StubRequest` returning
+    `(status, body)` or `(status, body, headers)`, a body that is not bytes is
+    sent as JSON. Authentication always succeeds.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+        self.tokens = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                request = StubRequest(self.command, url.path, parse_qs(url.query), self.headers, self.rfile.read(length) if length else b'')
+                api.calls.append(request)
+                if url.path == '/v1/authenticate':
+                    api.tokens += 1
+                    result = (200, {'access_token': 'token{}'.format(api.tokens), 'expires_in': 3600})
+                else:
+                    route = api.routes.get((self.command, url.path))
+                    result = route(request) if route else (404, {'error': 'not found'})
+                status, body = result[:2]
+                headers = result[2] if len(result) > 2 else {}
+                content = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api():
+    stub = StubApi()
+    yield stub
+    stub.close()
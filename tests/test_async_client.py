@@ -0,0 +1,145 @@
+import asyncio
+import gc
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+pytest.importorskip('aiohttp')
+
+from sotaog_public_api_client import AsyncClient, RowWriter  # noqa: E402
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestStreamedResponses:
+    def test_dropped_stream_releases_its_slot(self, api):
+        api.route('GET', '/v1/wells/production', lambda request: (200, [{'date': '2024-01-01'}]))
+
+        async def main():
+            async with AsyncClient(api.url, 'id', 'secret', max_concurrency=2) as client:
+                for _ in range(3):
+                    await client.list_well_production(stream=True)
+                gc.collect()
+                return await asyncio.wait_for(client.list_well_production(), 5)
+
+        assert run(main()) == [{'date': '2024-01-01'}]
+
+    def test_async_with_closes_an_unfinished_stream(self, api):
+        api.route('GET', '/v1/wells/production', lambda request: (200, [{'date': '2024-01-0{}'.format(day)} for day in range(1, 10)]))
+
+        async def main():
+            async with AsyncClient(api.url, 'id', 'secret', max_concurrency=1) as client:
+                for _ in range(3):
+                    async with await client.list_well_production(stream=True) as rows:
+                        async for row in rows:
+                            break
+                return await asyncio.wait_for(client.list_well_production(), 5)
+
+        assert len(run(main())) == 9
+
+
+class TestTokenCache:
+    def test_clients_sharing_a_file_cache_authenticate_once(self, api, tmp_path):
+        from sotaog_public_api_client import FileTokenCache
+
+        api.route('GET', '/v1/facilities', lambda request: (200, [{'id': 'f1'}]))
+
+        async def main():
+            cache = FileTokenCache(str(tmp_path))
+            async with AsyncClient(api.url, 'id', 'secret', token_cache=cache) as first, \
+                    AsyncClient(api.url, 'id', 'secret', token_cache=cache) as second:
+                return await asyncio.gather(first.get_facilities(), second.get_facilities())
+
+        assert run(main()) == [[{'id': 'f1'}], [{'id': 'f1'}]]
+        assert api.tokens == 1
+
+
+class TestAuthentication:
+    def test_basic_credentials_match_the_sync_client(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+
+        async def main():
+            async with AsyncClient(api.url, 'id', 'sécret') as client:
+                return await client.get_facilities()
+
+        assert run(main()) == []
+        assert api.calls[0].headers['Authorization'] == requests.auth._basic_auth_str('id', 'sécret')
+
+
+class TestRetries:
+    def test_read_only_post_is_retried_without_idempotency_key(self, api):
+        attempts = []
+
+        def datapoints(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                return 503, {'error': 'unavailable'}, {'Retry-After': '0'}
+            return 200, {'a1': {'oil': [[1, 1.0]]}}
+
+        api.route('POST', '/v1/datapoints', datapoints)
+
+        async def main():
+            async with AsyncClient(api.url, 'id', 'secret', circuit_breaker=False) as client:
+                return await client.get_datapoints({'a1': ['oil']})
+
+        assert run(main()) == {'a1': {'oil': [[1, 1.0]]}}
+        assert len(attempts) == 2
+        assert all('idempotency-key' not in request.headers for request in attempts)
+
+
+class TestMap:
+    def test_max_workers_bounds_the_calls_in_flight(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        running = []
+
+        async def call(client, index):
+            running.append(index)
+            peak = len(running)
+            await asyncio.sleep(0.01)
+            running.remove(index)
+            if index == 3:
+                raise ValueError('failed')
+            return index, peak
+
+        async def main():
+            async with AsyncClient(api.url, 'id', 'secret') as client:
+                return await client.map(lambda index: call(client, index), list(range(10)), max_workers=3), \
+                    await client.map_customers(lambda view, index: call(view, index), ['c{}'.format(i) for i in range(6)], 0, max_workers=2)
+
+        results, by_customer = run(main())
+        assert [result[0] for result in results if not isinstance(result, Exception)] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+        assert isinstance(results[3], ValueError)
+        assert max(result[1] for result in results if not isinstance(result, Exception)) == 3
+        assert max(peak for _, peak in by_customer.values()) == 2
+
+
+class TestExport:
+    def test_rows_are_written_off_the_event_loop(self, api, tmp_path):
+        api.route('GET', '/v1/wells/production', lambda request: (200, [{'date': '2024-01-0{}'.format(day), 'oil': day} for day in range(1, 6)]))
+        path = tmp_path / 'rows.csv'
+        loop_threads = []
+        write_threads = []
+        write_many = RowWriter.write_many
+
+        def recording_write_many(self, rows):
+            write_threads.append(threading.get_ident())
+            return write_many(self, rows)
+
+        async def main():
+            loop_threads.append(threading.get_ident())
+            async with AsyncClient(api.url, 'id', 'secret') as client:
+                return await client.export('list_well_production', str(path), batch_size=2)
+
+        with mock.patch.object(RowWriter, 'write_many', recording_write_many):
+            assert run(main()) == 5
+        assert len(write_threads) == 3
+        assert loop_threads[0] not in write_threads
+        assert path.read_text().splitlines() == ['date,oil'] + ['2024-01-0{},{}'.format(day, day) for day in range(1, 6)]
@@ -0,0 +1,32 @@
+import threading
+
+from sotaog_public_api_client import Client, ResponseCache
+
+
+class TestResponseCache:
+    def test_clients_with_different_credentials_do_not_share_responses(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, [{'token': request.headers['Authorization']}]))
+        cache = ResponseCache()
+        first = Client(api.url, 'first', 'secret', response_cache=cache)
+        second = Client(api.url, 'second', 'secret', response_cache=cache)
+        try:
+            assert first.get_facilities() != second.get_facilities()
+            assert first.get_facilities() == first.get_facilities()
+        finally:
+            first.close()
+            second.close()
+        assert (cache.hits, cache.misses) == (2, 2)
+
+    def test_counters_are_not_lost_under_concurrency(self):
+        cache = ResponseCache()
+
+        def count():
+            for _ in range(10000):
+                cache.count('hits')
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.hits == 80000
@@ -0,0 +1,63 @@
+from sotaog_public_api_client import AssetCatalog, Client
+
+
+class Catalog:
+    """Routes the catalog listings of the stub API to mutable lists."""
+
+    def __init__(self, api):
+        self.assets = [
+            {'id': 'w1', 'facility': 'f1', 'asset_type': 'well'},
+            {'id': 't1', 'facility': 'f1', 'asset_type': 'tank'},
+            {'id': 't2', 'facility': 'f2', 'asset_type': 'tank'},
+        ]
+        self.asset_types = [{'id': 'well'}, {'id': 'tank'}]
+        self.facilities = [{'id': 'f1'}, {'id': 'f2'}]
+        self.swd_networks = [{'id': 'n1', 'facilities': ['f1', 'f2']}, {'id': 'n2', 'facilities': ['f2']}]
+        api.route('GET', '/v1/assets', lambda request: (200, self.assets))
+        api.route('GET', '/v1/asset-types', lambda request: (200, self.asset_types))
+        api.route('GET', '/v1/facilities', lambda request: (200, self.facilities))
+        api.route('GET', '/v1/swd-networks', lambda request: (200, self.swd_networks))
+
+
+def ids(records):
+    return sorted(record['id'] for record in records)
+
+
+class TestAssetCatalog:
+    def test_lookups_match_the_client(self, api):
+        Catalog(api)
+        client = Client(api.url, 'id', 'secret')
+        catalog = AssetCatalog(client)
+        for facility in (None, 'f1', 'f2', 'f3'):
+            for asset_type in (None, 'well', 'tank'):
+                assert ids(catalog.get_assets(facility, asset_type)) == ids(client.get_assets(facility=facility, asset_type=asset_type))
+            assert ids(catalog.get_swd_networks(facility)) == ids(client.get_swd_networks(facility))
+        assert catalog.get_asset('t1')['facility'] == 'f1'
+        assert ids(catalog.get_asset_swd_networks('t2')) == ['n1', 'n2']
+        assert catalog.get_asset('missing') is None
+        client.close()
+
+    def test_refresh_only_reindexes_changes(self, api):
+        listings = Catalog(api)
+        client = Client(api.url, 'id', 'secret')
+        catalog = AssetCatalog(client)
+        assert catalog.refresh() == {name: {'added': 0, 'updated': 0, 'removed': 0}
+                                     for name in ('assets', 'asset_types', 'facilities', 'swd_networks')}
+
+        listings.assets = [
+            {'id': 'w1', 'facility': 'f1', 'asset_type': 'well'},
+            {'id': 't1', 'facility': 'f2', 'asset_type': 'tank'},
+            {'id': 'w2', 'facility': 'f2', 'asset_type': 'well'},
+        ]
+        listings.swd_networks = [{'id': 'n1', 'facilities': ['f1']}, {'id': 'n2', 'facilities': ['f2']}]
+        changes = catalog.refresh()
+        client.close()
+        assert changes['assets'] == {'added': 1, 'updated': 1, 'removed': 1}
+        assert changes['swd_networks'] == {'added': 0, 'updated': 1, 'removed': 0}
+        # The moved asset left the index of its old facility, the removed one every index
+        assert ids(catalog.get_assets(facility='f1')) == ['w1']
+        assert ids(catalog.get_assets(facility='f2')) == ['t1', 'w2']
+        assert ids(catalog.get_assets(asset_type='tank')) == ['t1']
+        assert catalog.get_asset('t2') is None
+        assert ids(catalog.get_swd_networks('f2')) == ['n2']
+        assert ids(catalog.get_asset_swd_networks('w1')) == ['n1']
@@ -1,3 +1,105 @@
-class TestClient:
-    def test_smoke(self):
-        assert True
\ No newline at end of file
+import threading
+import time
+
+import pytest
+
+from sotaog_public_api_client import Client, Client_Exception
+
+
+class TestCustomerViews:
+    def test_closing_a_view_keeps_the_client_open(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, [{'customer': request.headers.get('x-sotaog-customer-id')}]))
+        client = Client(api.url, 'id', 'secret')
+        try:
+            view = client.for_customer('c1')
+            assert view.get_facilities() == [{'customer': 'c1'}]
+            view.close()
+            assert client.get_facilities() == [{'customer': None}]
+            assert client.for_customer('c2').get_facilities() == [{'customer': 'c2'}]
+        finally:
+            client.close()
+        assert api.tokens == 1
+
+    def test_closing_a_view_keeps_the_transport_open(self, api):
+        pytest.importorskip('httpx')
+        from sotaog_public_api_client import HttpxTransport
+
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        client = Client(api.url, 'id', 'secret', transport=HttpxTransport(http2=False))
+        try:
+            client.for_customer('c1').close()
+            assert client.get_facilities() == []
+        finally:
+            client.close()
+
+    def test_view_and_client_map_concurrently(self, api):
+        def facilities(request):
+            time.sleep(0.01)
+            return 200, [{'customer': request.headers.get('x-sotaog-customer-id')}]
+
+        api.route('GET', '/v1/facilities', facilities)
+        client = Client(api.url, 'id', 'secret', single_flight=False)
+        view = client.for_customer('c1')
+        results = {}
+        try:
+            threads = [threading.Thread(target=lambda: results.update(view=view.map('get_facilities', [()] * 40, max_workers=32))),
+                       threading.Thread(target=lambda: results.update(client=client.map('get_facilities', [()] * 40, max_workers=20)))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results['view'] == [[{'customer': 'c1'}]] * 40
+            assert results['client'] == [[{'customer': None}]] * 40
+            # The pool only grows, whichever of the view or the client asked for it
+            assert client.pool_maxsize == 32
+            assert client.session.adapters['https://']._pool_maxsize == 32
+            client.map('get_facilities', [()], max_workers=20)
+            assert client.session.adapters['https://']._pool_maxsize == 32
+        finally:
+            client.close()
+
+
+class TestMap:
+    def test_results_in_input_order_with_errors_in_place(self, api):
+        def facility(index):
+            def handle(request):
+                # Later items answer first
+                time.sleep(0.01 * (8 - index))
+                return (500, {'error': 'failed'}) if index == 3 else (200, {'id': index})
+            return handle
+
+        for index in range(8):
+            api.route('GET', '/v1/facilities/f{}'.format(index), facility(index))
+        client = Client(api.url, 'id', 'secret', retry_policies={})
+        try:
+            results = client.map('get_facility', ['f{}'.format(index) for index in range(8)], max_workers=8)
+        finally:
+            client.close()
+        assert [result for index, result in enumerate(results) if index != 3] == [{'id': index} for index in range(8) if index != 3]
+        assert isinstance(results[3], Client_Exception)
+
+    def test_argument_shapes(self, api):
+        api.route('GET', '/v1/wells/w1', lambda request: (200, {'type': 'wells'}))
+        api.route('GET', '/v1/tanks/t1', lambda request: (200, {'type': 'tanks'}))
+        client = Client(api.url, 'id', 'secret')
+        try:
+            results = client.map(client.get_asset, [('w1', 'wells'), {'asset_id': 't1', 'type': 'tanks'}, 'missing'])
+        finally:
+            client.close()
+        assert results[:2] == [{'type': 'wells'}, {'type': 'tanks'}]
+        assert isinstance(results[2], Client_Exception)
+
+    def test_map_customers(self, api):
+        def facilities(request):
+            customer_id = request.headers.get('x-sotaog-customer-id')
+            return (403, {'error': 'forbidden'}) if customer_id == 'c2' else (200, [{'customer': customer_id}])
+
+        api.route('GET', '/v1/facilities', facilities)
+        client = Client(api.url, 'id', 'secret')
+        try:
+            results = client.map_customers('get_facilities', ['c1', 'c2', 'c3'])
+        finally:
+            client.close()
+        assert list(results) == ['c1', 'c2', 'c3']
+        assert results['c1'] == [{'customer': 'c1'}] and results['c3'] == [{'customer': 'c3'}]
+        assert isinstance(results['c2'], Client_Exception)
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sotaog_public_api_client import Client, SingleFlight
+from sotaog_public_api_client.coalesce import request_key
+
+
+class Gate:
+    """Handler answering once `release` is set, counting the requests it received."""
+
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+        self.arrived = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, request):
+        self.requests += 1
+        self.arrived.set()
+        self.release.wait(10)
+        return 200, self.body
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def call():
+            started.set()
+            release.wait(10)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(flight.do, 'key', call)
+            started.wait(10)
+            followers = [executor.submit(flight.do, 'key', call) for _ in range(4)]
+            while flight.coalesced < 4:
+                time.sleep(0.01)
+            release.set()
+            results = {id(future.result()) for future in [leader] + followers}
+        assert len(results) == 1
+        assert (flight.calls, flight.coalesced) == (1, 4)
+        # Nothing is kept once the call completed
+        assert flight.do('key', lambda: 'again') == 'again'
+        assert flight.calls == 2
+
+    def test_error_is_raised_in_every_caller(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def call():
+            started.set()
+            release.wait(10)
+            raise ValueError('failed')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(flight.do, 'key', call)]
+            started.wait(10)
+            futures += [executor.submit(flight.do, 'key', call) for _ in range(2)]
+            while flight.coalesced < 2:
+                time.sleep(0.01)
+            release.set()
+            for future in futures:
+                with pytest.raises(ValueError):
+                    future.result()
+
+    def test_request_key(self):
+        assert request_key('GET', 'u', {'b': 1, 'a': [1, 2]}) == request_key('GET', 'u', {'a': [1, 2], 'b': 1})
+        assert request_key('GET', 'u', {'a': [1, 2]}) != request_key('GET', 'u', {'a': [2, 1]})
+        assert request_key('GET', 'u', None, 'c1') != request_key('GET', 'u', None, 'c2')
+
+
+class TestClientCoalescing:
+    def test_identical_gets_share_one_request(self, api):
+        gate = Gate({'id': 'f1'})
+        api.route('GET', '/v1/facilities/f1/config', gate)
+        client = Client(api.url, 'id', 'secret')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(client.get_facility_config, 'f1')]
+            gate.arrived.wait(10)
+            futures += [executor.submit(client.get_facility_config, 'f1') for _ in range(7)]
+            while client.single_flight.coalesced < 7:
+                time.sleep(0.01)
+            gate.release.set()
+            assert [future.result() for future in futures] == [{'id': 'f1'}] * 8
+        client.close()
+        assert gate.requests == 1
+        assert (client.single_flight.calls, client.single_flight.coalesced) == (1, 7)
+
+    def test_customers_are_not_coalesced(self, api):
+        gate = Gate([])
+        api.route('GET', '/v1/facilities', gate)
+        client = Client(api.url, 'id', 'secret')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(client.for_customer(customer_id).get_facilities) for customer_id in ('c1', 'c2')]
+            # Both requests are in flight at the same time
+            deadline = time.monotonic() + 5
+            while gate.requests < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            gate.release.set()
+            assert [future.result() for future in futures] == [[], []]
+        client.close()
+        assert gate.requests == 2
+        assert client.single_flight.coalesced == 0
+
+    def test_disabled(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        client = Client(api.url, 'id', 'secret', single_flight=False)
+        assert client.single_flight is None
+        assert client.get_facilities() == []
+        client.close()
@@ -0,0 +1,70 @@
+from sotaog_public_api_client import Client
+
+
+class Datapoints:
+    """Routes the datapoint reads of the stub API over `{(asset_id, datatype): [timestamps]}`, `limit` points per series."""
+
+    def __init__(self, api, series):
+        self.series = series
+        self.requests = []
+        api.route('POST', '/v1/datapoints', self.post)
+        for asset_id in {asset_id for asset_id, _ in series}:
+            api.route('GET', '/v1/datapoints/{}'.format(asset_id), self.get)
+
+    def page(self, pairs, start_ts, end_ts, sort, limit):
+        self.requests.append((start_ts, end_ts))
+        payload = {}
+        for asset_id, datatype in pairs:
+            timestamps = [ts for ts in sorted(self.series[(asset_id, datatype)], reverse=sort == 'desc')
+                          if (start_ts is None or ts >= start_ts) and (end_ts is None or ts <= end_ts)]
+            payload.setdefault(asset_id, {})[datatype] = [[ts, float(ts)] for ts in timestamps[:limit]]
+        return payload
+
+    def post(self, request):
+        body = request.json()
+        pairs = [(asset_id, datatype) for asset_id, datatypes in body['asset_datatypes'].items() for datatype in datatypes]
+        return 200, self.page(pairs, body.get('start_ts'), body.get('end_ts'), body['sort'], body['limit'])
+
+    def get(self, request):
+        asset_id = request.path.rsplit('/', 1)[1]
+        query = {name: values[0] for name, values in request.query.items() if name != 'datatypes'}
+        pairs = [(asset_id, datatype) for datatype in request.query['datatypes']]
+        start_ts, end_ts = query.get('start_ts'), query.get('end_ts')
+        payload = self.page(pairs, start_ts and int(start_ts), end_ts and int(end_ts), query['sort'], int(query['limit']))
+        return 200, payload[asset_id]
+
+
+class TestIterDatapoints:
+    def test_pages_overlap_without_duplicates(self, api):
+        datapoints = Datapoints(api, {('a1', 'oil'): range(1, 26)})
+        client = Client(api.url, 'id', 'secret')
+        points = list(client.iter_datapoints({'a1': ['oil']}, start_ts=1, page_size=10))
+        client.close()
+        assert points == [('a1', 'oil', ts, float(ts)) for ts in range(1, 26)]
+        # Each page starts at the last timestamp received, which is not yielded twice
+        assert [start_ts for start_ts, _ in datapoints.requests] == [1, 10, 19]
+
+    def test_descending(self, api):
+        Datapoints(api, {('a1', 'oil'): range(1, 26)})
+        client = Client(api.url, 'id', 'secret')
+        points = list(client.iter_datapoints({'a1': ['oil']}, end_ts=25, sort='desc', page_size=7))
+        client.close()
+        assert [point[2] for point in points] == list(range(25, 0, -1))
+
+    def test_series_of_different_density(self, api):
+        Datapoints(api, {('a1', 'oil'): range(1, 41), ('a1', 'gas'): range(5, 41, 5), ('a2', 'oil'): [3]})
+        client = Client(api.url, 'id', 'secret')
+        points = list(client.iter_datapoints({'a1': ['oil', 'gas'], 'a2': ['oil']}, start_ts=1, page_size=10))
+        client.close()
+        by_series = {}
+        for asset_id, datatype, ts, _ in points:
+            by_series.setdefault((asset_id, datatype), []).append(ts)
+        assert by_series == {('a1', 'oil'): list(range(1, 41)), ('a1', 'gas'): list(range(5, 41, 5)), ('a2', 'oil'): [3]}
+
+    def test_full_page_of_points_already_seen(self, api):
+        # With one point per page, every page after the first only holds the point it starts from
+        Datapoints(api, {('a1', 'oil'): [10, 20, 30]})
+        client = Client(api.url, 'id', 'secret')
+        assert [point[2] for point in client.iter_datapoints({'a1': ['oil']}, start_ts=1, page_size=1)] == [10, 20, 30]
+        assert [point[1] for point in client.iter_asset_datapoints('a1', ['oil'], start_ts=1, page_size=1)] == [10, 20, 30]
+        client.close()
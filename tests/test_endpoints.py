@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+
+from sotaog_public_api_client import Client, Client_Exception
+
+# (call, method, path, status the endpoint answers with, value returned), as sent before the request engine
+ENDPOINTS = [
+    (lambda client: client.get_asset('t1', 'tanks'), 'GET', '/v1/tanks/t1', 200, {'ok': True}),
+    (lambda client: client.get_datatype('oil'), 'GET', '/v1/datatypes/oil', 200, {'ok': True}),
+    (lambda client: client.get_facility_config('f1'), 'GET', '/v1/facilities/f1/config', 200, {'ok': True}),
+    (lambda client: client.get_well_config('w1'), 'GET', '/v1/wells/w1/config', 200, {'ok': True}),
+    (lambda client: client.get_alarm('a1', 'oil'), 'GET', '/v1/alarms/a1/oil', 200, {'ok': True}),
+    (lambda client: client.get_compressor_fault_hours('c1', '2024-01-01'), 'GET', '/v1/compressors/fault-hours/c1/2024-01-01', 200, {'ok': True}),
+    (lambda client: client.delete_compressor_fault_hours('c1', '2024-01-01'), 'DELETE', '/v1/compressors/fault-hours/c1/2024-01-01', 200, {'ok': True}),
+    (lambda client: client.post_datapoints('a1', {'oil': [[1, 1.0]]}), 'POST', '/v1/datapoints/a1', 202, None),
+    (lambda client: client.batch_multiple_datapoints({'entities': {}}), 'POST', '/v1/datapoints/multiple', 202, None),
+    (lambda client: client.put_well_production('w1', '2024-01-01', {'oil': 1}), 'PUT', '/v1/wells/production/w1/2024-01-01', 201, None),
+    (lambda client: client.batch_put_well_production([{'oil': 1}]), 'PUT', '/v1/wells/production', 201, None),
+    (lambda client: client.put_well_config('w1', {}), 'PUT', '/v1/wells/w1/config', 201, None),
+    (lambda client: client.put_financials('wells', 'w1', '2024-01', {}), 'PUT', '/v1/financials/wells/w1/2024-01', 200, None),
+    (lambda client: client.put_financials('wells', 'w1', '2024-01', {}), 'PUT', '/v1/financials/wells/w1/2024-01', 201, None),
+    (lambda client: client.post_truck_ticket({'id': 't1'}), 'POST', '/v1/truck-tickets', 201, {'ok': True}),
+    (lambda client: client.put_truck_ticket('t1', 1, {'id': 't1'}), 'POST', '/v1/truck-tickets/t1/1', 201, None),
+    (lambda client: client.get_alarm('a1'), 'GET', '/v1/alarms/a1', 200, {'ok': True}),
+    (lambda client: client.post_custom_alarm_incidents([]), 'PUT', '/v1/custom-alarms-incidents', 201, {'ok': True}),
+]
+
+
+@pytest.fixture
+def client(api):
+    client = Client(api.url, 'id', 'secret', retry_policies={})
+    yield client
+    client.close()
+
+
+class TestEndpoints:
+    @pytest.mark.parametrize('call, method, path, status, value', ENDPOINTS)
+    def test_url_and_status(self, api, client, call, method, path, status, value):
+        api.route(method, path, lambda request: (status, value if value is not None else b''))
+        assert call(client) == value
+        assert (api.calls[-1].method, api.calls[-1].path) == (method, path)
+
+    @pytest.mark.parametrize('call, method, path, status, value', ENDPOINTS)
+    def test_unexpected_status_raises(self, api, client, call, method, path, status, value):
+        api.route(method, path, lambda request: (409, {'error': 'conflict'}))
+        with pytest.raises(Client_Exception):
+            call(client)
+
+    def test_setting_defaults_on_error(self, api, client):
+        api.route('GET', '/v1/wells/setting', lambda request: (500, {'error': 'unavailable'}))
+        assert client.get_wells_setting() == {}
+
+    def test_params(self, api, client):
+        api.route('GET', '/v1/wells/production', lambda request: (200, []))
+        client.list_well_production(well_ids=['w1', 'w2'], start_date='2024-01-01')
+        assert api.calls[-1].query == {'well_ids': ['w1', 'w2'], 'start_date': ['2024-01-01']}
+
+    def test_payload_is_not_rendered_without_debug(self, api, client, caplog):
+        class Payload(dict):
+            rendered = 0
+
+            def __repr__(self):
+                Payload.rendered += 1
+                return dict.__repr__(self)
+
+        api.route('POST', '/v1/datapoints/a1', lambda request: (202, b''))
+        caplog.set_level(logging.INFO, logger='sotaog_public_api_client')
+        client.post_datapoints('a1', Payload(oil=[[1, 1.0]]))
+        assert Payload.rendered == 0
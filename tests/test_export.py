@@ -0,0 +1,68 @@
+import csv
+import json
+
+import pytest
+
+from sotaog_public_api_client import RowWriter, export_rows
+
+
+class TestColumns:
+    def test_keys_missing_from_the_first_row_raise(self, tmp_path):
+        path = str(tmp_path / 'rows.csv')
+        with pytest.raises(ValueError):
+            export_rows([{'a': 1}, {'a': 2, 'b': 3}], path)
+
+    def test_extra_keys_opt_in(self, tmp_path):
+        path = str(tmp_path / 'rows.ndjson')
+        export_rows([{'a': 1}, {'a': 2, 'b': 3}], path, ignore_extra=True)
+        with open(path) as f:
+            assert [json.loads(line) for line in f] == [{'a': 1}, {'a': 2}]
+
+    def test_selected_columns(self, tmp_path):
+        path = str(tmp_path / 'rows.csv')
+        assert export_rows([{'a': 1, 'b': None}, {'a': 2, 'b': {'c': 1}, 'd': 4}], path, columns=['b', 'a']) == 2
+        with open(path, newline='') as f:
+            assert list(csv.reader(f)) == [['b', 'a'], ['', '1'], ['{"c":1}', '2']]
+
+
+class TestArrowTypes:
+    @pytest.fixture(autouse=True)
+    def pyarrow(self):
+        return pytest.importorskip('pyarrow')
+
+    def read(self, path):
+        import pyarrow.parquet
+        return pyarrow.parquet.read_table(path)
+
+    def test_column_typed_by_a_later_batch(self, tmp_path, pyarrow):
+        path = str(tmp_path / 'rows.parquet')
+        rows = [{'id': i, 'volume': None} for i in range(4)] + [{'id': 4, 'volume': 2.5}]
+        export_rows(rows, path, batch_size=2)
+        table = self.read(path)
+        assert table.schema.field('volume').type == pyarrow.float64()
+        assert table.column('volume').to_pylist() == [None, None, None, None, 2.5]
+
+    def test_integers_widen_without_loss(self, tmp_path, pyarrow):
+        path = str(tmp_path / 'rows.parquet')
+        export_rows([{'volume': 1.5}, {'volume': 2}, {'volume': 3}], path, batch_size=1)
+        assert self.read(path).column('volume').to_pylist() == [1.5, 2.0, 3.0]
+
+    def test_fraction_in_an_integer_column_raises(self, tmp_path):
+        path = str(tmp_path / 'rows.parquet')
+        with pytest.raises(ValueError):
+            export_rows([{'volume': 1}, {'volume': 2}, {'volume': 2.5}], path, batch_size=2)
+
+    def test_schema(self, tmp_path, pyarrow):
+        path = str(tmp_path / 'rows.arrow')
+        schema = pyarrow.schema([('date', pyarrow.date32()), ('volume', pyarrow.float64())])
+        with RowWriter(path, schema=schema, batch_size=1) as writer:
+            writer.write_many([{'date': '2024-01-01', 'volume': 1}, {'date': '2024-01-02', 'volume': 2.5, 'other': 'x'}])
+        with pyarrow.ipc.open_file(path) as reader:
+            table = reader.read_all()
+        assert table.schema == schema
+        assert table.column('volume').to_pylist() == [1.0, 2.5]
+
+    def test_column_without_values_is_written_as_strings(self, tmp_path, pyarrow):
+        path = str(tmp_path / 'rows.parquet')
+        export_rows([{'id': 1, 'note': None}], path)
+        assert self.read(path).schema.field('note').type == pyarrow.string()
@@ -0,0 +1,78 @@
+import pytest
+
+from sotaog_public_api_client import Client, Client_Exception, IncidentReconciler
+
+
+def incident(asset_id, status = 'open', value = 1.0):
+    return {'asset_id': asset_id, 'datatype_id': 'oil', 'status': status, 'value': value}
+
+
+class Incidents:
+    """Routes the setpoint incidents of the stub API, failing the PUTs listed in `failures`."""
+
+    def __init__(self, api, open_incidents = ()):
+        self.open_incidents = list(open_incidents)
+        self.puts = []
+        self.failures = set()
+        api.route('GET', '/v1/alarms-incidents', self.get)
+        api.route('PUT', '/v1/alarms-incidents', self.put)
+
+    def get(self, request):
+        return 200, self.open_incidents
+
+    def put(self, request):
+        if len(self.puts) in self.failures:
+            self.puts.append(None)
+            return 500, {'error': 'unavailable'}
+        self.puts.append(request.json())
+        return 200, {}
+
+
+def make_reconciler(api, **kwargs):
+    client = Client(api.url, 'id', 'secret', retry_policies={}, circuit_breaker=False)
+    return IncidentReconciler(client, ('asset_id', 'datatype_id'), kind='setpoint', **kwargs)
+
+
+class TestIncidentReconciler:
+    def test_seed_from_the_api(self, api):
+        Incidents(api, [incident('a1'), incident('a2')])
+        reconciler = make_reconciler(api)
+        assert reconciler.seed(status='open') == 2
+        assert api.calls[-1].query == {'status': ['open']}
+        assert set(reconciler.incidents) == {('a1', 'oil'), ('a2', 'oil')}
+
+    def test_diff(self, api):
+        reconciler = make_reconciler(api, ignore=('value',))
+        reconciler.seed([incident('a1'), incident('a2'), incident('a3')])
+        delta = reconciler.diff([incident('a1', value=2.0), incident('a2', status='acknowledged'), incident('a4')])
+        assert delta == {'opened': [incident('a4')], 'updated': [incident('a2', status='acknowledged')], 'closed': [incident('a3')]}
+
+    def test_reconcile_sends_only_the_changes(self, api):
+        incidents = Incidents(api)
+        reconciler = make_reconciler(api)
+        reconciler.seed([incident('a1'), incident('a2')])
+        reconciler.reconcile([incident('a1'), incident('a3')])
+        assert incidents.puts == [[incident('a3'), incident('a2', status='closed')]]
+        assert set(reconciler.incidents) == {('a1', 'oil'), ('a3', 'oil')}
+        reconciler.reconcile([incident('a1'), incident('a3')])
+        assert len(incidents.puts) == 1
+
+    def test_close_fn(self, api):
+        incidents = Incidents(api)
+        reconciler = make_reconciler(api, close_fn=lambda previous: dict(previous, status='resolved', value=None))
+        reconciler.seed([incident('a1')])
+        reconciler.reconcile([])
+        assert incidents.puts == [[incident('a1', status='resolved', value=None)]]
+
+    def test_snapshot_follows_accepted_batches_only(self, api):
+        incidents = Incidents(api)
+        incidents.failures = {1}
+        reconciler = make_reconciler(api, batch_size=2)
+        with pytest.raises(Client_Exception):
+            reconciler.reconcile([incident('a{}'.format(i)) for i in range(5)])
+        # The first batch was accepted, the second failed and the third was never sent
+        assert sorted(reconciler.incidents) == [('a0', 'oil'), ('a1', 'oil')]
+
+        reconciler.reconcile([incident('a{}'.format(i)) for i in range(5)])
+        assert incidents.puts[2:] == [[incident('a2'), incident('a3')], [incident('a4')]]
+        assert len(reconciler.incidents) == 5
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from sotaog_public_api_client.jsonstream import JsonArrayParser, iter_json_array, loads
+
+
+def chunked(text, size):
+    data = text.encode()
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestJsonArrayParser:
+    @pytest.mark.parametrize('size', [1, 3, 7, 64, 4096])
+    def test_elements_split_across_chunks(self, size):
+        rows = [{'id': i, 'name': 'wéll {}'.format(i), 'values': [1.5, -2e3, None, True]} for i in range(50)]
+        assert list(iter_json_array(chunked(json.dumps(rows), size))) == rows
+
+    def test_element_spanning_many_chunks(self):
+        rows = [{'points': [[ts, ts / 2] for ts in range(20000)]}, 1, 'last']
+        parser = JsonArrayParser()
+        values = []
+        for chunk in chunked(json.dumps(rows), 16):
+            values += parser.feed(chunk)
+        values += parser.close()
+        assert values == rows
+
+    def test_document_that_is_not_an_array(self):
+        assert list(iter_json_array(chunked('{"a": [1, 2], "b": "c"}', 4))) == [{'a': [1, 2], 'b': 'c'}]
+
+    @pytest.mark.parametrize('chunks, value', [
+        ([b'5'], 5),
+        ([b'null'], None),
+        ([b' "well" '], 'well'),
+        ([b'{"a": 1}'], {'a': 1}),
+        ([b'{"a', b'": {"b"', b': 2}}'], {'a': {'b': 2}}),
+    ])
+    def test_document_without_delimiters(self, chunks, value):
+        assert list(iter_json_array(chunks)) == [value]
+
+    def test_document_uses_loads(self):
+        calls = []
+
+        def counting_loads(data):
+            calls.append(data)
+            return json.loads(data)
+
+        assert list(iter_json_array([b'{"a": 1}'], counting_loads)) == [{'a': 1}]
+        assert calls == [b'{"a": 1}']
+
+    @pytest.mark.parametrize('text', ['[1,]', '[1, ]', '[{"a": 1},\n]', '[,]', '[1 2]', '[1, 2'])
+    def test_invalid_arrays_raise(self, text):
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunked(text, 2)))
+
+    def test_empty_array(self):
+        assert list(iter_json_array([b'[', b' ]'])) == []
+
+
+class TestLoads:
+    def test_non_standard_numbers(self):
+        values = loads(b'[NaN, Infinity, -Infinity, 1e400]')
+        assert values[0] != values[0]
+        assert values[1:] == [float('inf'), float('-inf'), float('inf')]
+
+    def test_invalid_json_raises(self):
+        with pytest.raises(ValueError):
+            loads(b'{"a": ')
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from sotaog_public_api_client import Client, Client_Exception, ClientMetrics
+
+
+def samples(text):
+    """`{'name{labels}': value}` of the samples of a Prometheus text exposition."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+@pytest.fixture
+def client(api):
+    api.route('GET', '/v1/tanks/t1', lambda request: (200, {'id': 't1'}))
+    api.route('GET', '/v1/wells/w1', lambda request: (200, {'id': 'w1'}))
+    api.route('GET', '/v1/wells/w1/config', lambda request: (200, {'config': 'x' * 100}))
+    api.route('GET', '/v1/wells/w2/config', lambda request: (404, {'error': 'not found'}))
+    client = Client(api.url, 'id', 'secret', retry_policies={}, metrics=ClientMetrics(buckets=(0.5, 60.0)))
+    yield client
+    client.close()
+
+
+class TestClientMetrics:
+    def test_snapshot(self, client):
+        metrics = client.request_hooks[0]
+        client.get_well_config('w1')
+        client.get_well_config('w1')
+        with pytest.raises(Client_Exception):
+            client.get_well_config('w2')
+        stats = metrics.snapshot()['GET /v1/wells/{id}/config']
+        assert stats['count'] == 3
+        assert stats['errors'] == 1
+        assert stats['statuses'] == {200: 2, 404: 1}
+        assert stats['response_bytes'] == 2 * len(b'{"config": "' + b'x' * 100 + b'"}') + len(b'{"error": "not found"}')
+        assert stats['latency']['buckets'][float('inf')] == 3
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+    def test_asset_types_are_separate_endpoints(self, client):
+        client.get_asset('t1', 'tanks')
+        client.get_asset('w1', 'wells')
+        assert set(client.request_hooks[0].snapshot()) == {'GET /v1/tanks/{id}', 'GET /v1/wells/{id}'}
+
+    def test_prometheus_text(self, client):
+        client.get_well_config('w1')
+        client.get_asset('t1', 'tanks')
+        with pytest.raises(Client_Exception):
+            client.get_well_config('w2')
+        text = client.request_hooks[0].to_prometheus()
+        assert text.endswith('\n')
+        assert '# TYPE sotaog_client_request_duration_seconds histogram' in text
+        values = samples(text)
+        config = 'method="GET",endpoint="/v1/wells/{id}/config"'
+        assert values['sotaog_client_requests_total{' + config + ',status="200"}'] == 1
+        assert values['sotaog_client_requests_total{' + config + ',status="404"}'] == 1
+        assert values['sotaog_client_request_errors_total{' + config + '}'] == 1
+        assert values['sotaog_client_request_duration_seconds_count{' + config + '}'] == 2
+        assert values['sotaog_client_request_duration_seconds_bucket{' + config + ',le="+Inf"}'] == 2
+        assert values['sotaog_client_request_duration_seconds_bucket{' + config + ',le="0.5"}'] <= 2
+        assert values['sotaog_client_requests_total{method="GET",endpoint="/v1/tanks/{id}",status="200"}'] == 1
+
+    def test_exceptions(self, api):
+        metrics = ClientMetrics()
+        client = Client(api.url, 'id', 'secret', retry_policies={}, circuit_breaker=False, metrics=metrics)
+        assert client.token
+        with mock.patch.object(client.session, 'request', side_effect=requests.ConnectionError('refused')):
+            with pytest.raises(requests.ConnectionError):
+                client.get_facilities()
+        client.close()
+        values = samples(metrics.to_prometheus())
+        assert values['sotaog_client_request_exceptions_total{method="GET",endpoint="/v1/facilities",exception="ConnectionError"}'] == 1
+        assert values['sotaog_client_request_errors_total{method="GET",endpoint="/v1/facilities"}'] == 1
@@ -0,0 +1,66 @@
+from sotaog_public_api_client import Client, DatapointPlanner
+
+
+class Datapoints:
+    """Routes `get_datapoints` of the stub API, every series has a point per timestamp from 1 to `points`."""
+
+    def __init__(self, api, points):
+        self.points = points
+        self.bodies = []
+        api.route('POST', '/v1/datapoints', self.handle)
+
+    def handle(self, request):
+        body = request.json()
+        self.bodies.append(body)
+        asset_datatypes = body['asset_datatypes']
+        if isinstance(asset_datatypes, dict):
+            pairs = [(asset_id, datatype) for asset_id, datatypes in asset_datatypes.items() for datatype in datatypes]
+        else:
+            pairs = asset_datatypes
+        start_ts = body.get('start_ts', 1)
+        end_ts = body.get('end_ts', self.points)
+        payload = {}
+        for asset_id, datatype in pairs:
+            timestamps = range(start_ts, end_ts + 1)[:body['limit']]
+            payload.setdefault(asset_id, {})[datatype] = [[ts, float(ts)] for ts in timestamps]
+        return 200, payload
+
+
+def make_planner(api, **kwargs):
+    return DatapointPlanner(Client(api.url, 'id', 'secret'), **kwargs)
+
+
+class TestDatapointPlanner:
+    def test_groups_are_bounded_by_pairs_and_points(self, api):
+        planner = make_planner(api, max_pairs=4, max_points=300)
+        pairs = [('a{}'.format(i), datatype) for i in range(5) for datatype in ('oil', 'gas')]
+        assert [len(group) for group in planner.plan(pairs, points_per_series=10)] == [4, 4, 2]
+        # 100 points expected per series, 3 series fit in max_points
+        groups = planner.plan(pairs, start_ts=1, end_ts=100, interval=1)
+        assert [len(group) for group in groups] == [3, 3, 3, 1]
+        assert groups[0] == [['a0', 'gas'], ['a0', 'oil'], ['a1', 'gas']]
+
+    def test_mapping_groups_keep_assets_together(self, api):
+        planner = make_planner(api, max_pairs=4)
+        groups = planner.plan({'a2': ['oil', 'gas'], 'a1': ['oil', 'gas', 'water']})
+        assert groups == [{'a1': ['gas', 'oil', 'water'], 'a2': ['gas']}, {'a2': ['oil']}]
+
+    def test_fetch_sends_the_callers_shape(self, api):
+        datapoints = Datapoints(api, 25)
+        planner = make_planner(api, max_pairs=2, page_size=10)
+        pairs = [('a2', 'oil'), ('a1', 'oil'), ('a1', 'gas')]
+        merged = planner.fetch(pairs, start_ts=1, end_ts=25)
+        assert all(isinstance(body['asset_datatypes'], list) and body['limit'] == 10 for body in datapoints.bodies)
+        assert sorted(len(body['asset_datatypes']) for body in datapoints.bodies if body['start_ts'] == 1) == [1, 2]
+        # Merged in the order of the pairs given, whatever group finished first
+        assert [(asset_id, datatype) for asset_id, series in merged.items() for datatype in series] == [('a2', 'oil'), ('a1', 'oil'), ('a1', 'gas')]
+        assert all(points == [[ts, float(ts)] for ts in range(1, 26)] for series in merged.values() for points in series.values())
+
+        datapoints.bodies = []
+        planner.fetch({'a1': ['oil']}, start_ts=1, end_ts=25)
+        assert datapoints.bodies[0]['asset_datatypes'] == {'a1': ['oil']}
+
+    def test_columnar(self, api):
+        Datapoints(api, 5)
+        series = make_planner(api).fetch({'a1': ['oil']}, start_ts=1, end_ts=5, format='columnar')['a1']['oil']
+        assert list(series.timestamps) == [1, 2, 3, 4, 5]
@@ -0,0 +1,45 @@
+import time
+
+from sotaog_public_api_client import Client, SeriesCache
+
+
+def points_route(points):
+    def handler(request):
+        start = int(request.query.get('start_ts', ['0'])[0])
+        end = int(request.query['end_ts'][0])
+        limit = int(request.query['limit'][0])
+        return 200, {'oil': [point for point in points if start <= point[0] <= end][:limit]}
+    return handler
+
+
+class TestSeriesCache:
+    def test_settled_range_is_fetched_once(self, api, tmp_path):
+        api.route('GET', '/v1/datapoints/a1', points_route([[ts, ts * 0.5] for ts in range(0, 1000, 10)]))
+        client = Client(api.url, 'id', 'secret', series_cache=SeriesCache(str(tmp_path)))
+        try:
+            first = client.get_asset_series('a1', ['oil'], 0, 999)
+            fetches = len(api.calls)
+            second = client.get_asset_series('a1', ['oil'], 100, 500)
+        finally:
+            client.close()
+        assert len(api.calls) == fetches
+        assert len(first['oil']) == 100
+        assert list(second['oil'])[0] == (100, 50.0)
+
+    def test_range_ending_now_is_fetched_again(self, api, tmp_path):
+        now = int(time.time() * 1000)
+        points = [[now - 60000 * minutes, float(minutes)] for minutes in range(60, -1, -1)]
+        api.route('GET', '/v1/datapoints/a1', points_route(points))
+        cache = SeriesCache(str(tmp_path), settle_window=10 * 60000)
+        client = Client(api.url, 'id', 'secret', series_cache=cache)
+        try:
+            client.get_asset_series('a1', ['oil'], now - 3600000, now)
+            covered_end = cache.covered('a1', 'oil')[0][1]
+            # A point arriving late for the recent minutes is picked up by the next read
+            points.append([now - 30000, 0.5])
+            points.sort()
+            series = client.get_asset_series('a1', ['oil'], now - 3600000, now)
+        finally:
+            client.close()
+        assert covered_end < now - 9 * 60000
+        assert len(series['oil']) == 62
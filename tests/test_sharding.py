@@ -0,0 +1,87 @@
+import asyncio
+import datetime
+import threading
+
+import pytest
+
+from sotaog_public_api_client import Client, Client_Exception
+from sotaog_public_api_client.sharding import date_shards, iter_sharded
+
+
+class Report:
+    """Report returning one row per day of the window, counting the calls started."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def rows(self, start_date, end_date):
+        with self._lock:
+            self.calls += 1
+        day = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+        rows = []
+        while day <= end:
+            rows.append({'date': day.isoformat()})
+            day += datetime.timedelta(days=1)
+        return rows
+
+    async def rows_async(self, start_date, end_date):
+        return self.rows(start_date, end_date)
+
+
+class TestDateShards:
+    def test_windows_cover_the_span(self):
+        assert date_shards('2024-01-30T00:00:00Z', datetime.date(2024, 2, 5), 3) == [
+            ('2024-01-30', '2024-02-01'), ('2024-02-02', '2024-02-04'), ('2024-02-05', '2024-02-05')]
+
+
+class TestIterSharded:
+    def test_rows_in_date_order(self):
+        report = Report()
+        rows = list(iter_sharded(report.rows, '2024-01-01', '2024-03-31', shard_days=7, max_workers=3))
+        assert [row['date'] for row in rows] == sorted(row['date'] for row in rows)
+        assert len(rows) == 91
+
+    def test_shards_are_fetched_a_few_at_a_time(self):
+        report = Report()
+        rows = iter_sharded(report.rows, '2024-01-01', '2024-12-31', shard_days=1, max_workers=2)
+        assert next(rows) == {'date': '2024-01-01'}
+        # Two shards submitted up front, one more once the first result was taken
+        assert report.calls <= 3
+        rows.close()
+
+    def test_async_shards_are_fetched_a_few_at_a_time(self):
+        pytest.importorskip('aiohttp')
+        from sotaog_public_api_client import AsyncClient
+
+        report = Report()
+
+        async def main():
+            client = AsyncClient('http://127.0.0.1:1', 'id', 'secret')
+            client.list_well_production = report.rows_async
+            rows = client.iter_sharded('list_well_production', '2024-01-01', '2024-12-31', shard_days=1, max_workers=2)
+            first = await rows.__anext__()
+            await asyncio.sleep(0.05)
+            calls = report.calls
+            await rows.aclose()
+            return first, calls
+
+        loop = asyncio.new_event_loop()
+        try:
+            first, calls = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        assert first == {'date': '2024-01-01'}
+        assert calls <= 3
+
+    def test_dates_are_required(self, api, tmp_path):
+        with pytest.raises(Client_Exception):
+            list(iter_sharded(Report().rows, None, '2024-01-31'))
+        client = Client(api.url, 'id', 'secret')
+        with pytest.raises(Client_Exception, match='shard_days'):
+            client.export('list_well_daily_warehouse', str(tmp_path / 'rows.csv'), start_date='2024-01-01', shard_days=31)
+        client.close()
+        # Nothing was written nor requested
+        assert not (tmp_path / 'rows.csv').exists()
+        assert api.calls == []
@@ -0,0 +1,142 @@
+import glob
+import json
+import os
+import threading
+
+import pytest
+
+from sotaog_public_api_client import Client, WriteSpool
+
+
+class Recorder:
+    """Routes the datapoint writes of the stub API, recording the accepted ones in order."""
+
+    def __init__(self, api, status = 202):
+        self.status = status
+        self.requests = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+        api.route('POST', '/v1/datapoints/multiple', self.handle)
+        api.route('POST', '/v1/datapoints/a1', self.handle)
+
+    def handle(self, request):
+        self.gate.wait(10)
+        body = request.json()
+        if self.status != 202 or 'poison' in json.dumps(body):
+            return 400 if self.status == 202 else self.status, {'error': 'rejected'}
+        with self._lock:
+            self.requests.append((request.path, request.headers['Idempotency-Key'], body))
+        return 202, b''
+
+    def points(self):
+        points = {}
+        for path, _, body in self.requests:
+            entities = body['entities'] if path.endswith('/multiple') else {'a1': body}
+            for entity, datatypes in entities.items():
+                points.setdefault(entity, []).extend(point[0] for point in datatypes['oil'])
+        return points
+
+
+def make_client(api):
+    return Client(api.url, 'id', 'secret', retry_policies={}, circuit_breaker=False)
+
+
+def write(spool, ts, entity = 'a1'):
+    return spool.batch_multiple_datapoints({'entities': {entity: {'oil': [[ts, float(ts)]]}}})
+
+
+def spool_files(directory):
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(directory, 'spool-*')))
+
+
+class TestWriteSpool:
+    def test_batches_are_full(self, api, tmp_path):
+        recorder = Recorder(api)
+        recorder.gate.clear()
+        client = make_client(api)
+        with WriteSpool(client, str(tmp_path), batch_size=100, fsync=False) as spool:
+            for ts in range(1000):
+                write(spool, ts, 'a{}'.format(ts))
+            recorder.gate.set()
+            assert spool.drain(10)
+        client.close()
+        # The first batch may leave with the first writes, the others fill up while it is in flight
+        assert spool.entries_sent == 1000
+        assert spool.requests_sent <= 11
+
+    def test_resume_after_restart(self, api, tmp_path):
+        recorder = Recorder(api, status=503)
+        client = make_client(api)
+        spool = WriteSpool(client, str(tmp_path), batch_size=10, segment_size=7, retry_backoff=0.01, max_backoff=0.05, fsync=False)
+        for ts in range(25):
+            write(spool, ts)
+        spool.post_datapoints('a1', {'oil': [[25, 25.0]]})
+        spool.close(timeout=0)
+        # A write torn by a crash at the end of the log
+        logs = [name for name in spool_files(str(tmp_path)) if name.endswith('.log')]
+        assert len(logs) == 4
+        with open(os.path.join(str(tmp_path), logs[-1]), 'ab') as f:
+            f.write(b'{"seq": 27, "op": "batch_mul')
+
+        recorder.status = 202
+        with WriteSpool(client, str(tmp_path), batch_size=10, window_size=5, fsync=False) as spool:
+            assert spool.pending == 26
+            assert spool.drain(10)
+        client.close()
+        assert recorder.points() == {'a1': list(range(26))}
+        assert spool_files(str(tmp_path)) == []
+
+    def test_entity_order(self, api, tmp_path):
+        recorder = Recorder(api)
+        client = make_client(api)
+        with WriteSpool(client, str(tmp_path), batch_size=5, max_workers=4, window_size=8, fsync=False) as spool:
+            for ts in range(60):
+                write(spool, ts, 'a{}'.format(ts % 3))
+                if ts % 20 == 10:
+                    spool.post_datapoints('a1', {'oil': [[ts, 0.0]]})
+            assert spool.drain(10)
+        client.close()
+        points = recorder.points()
+        assert sorted(points) == ['a0', 'a1', 'a2']
+        for entity, timestamps in points.items():
+            assert timestamps == sorted(timestamps), entity
+        assert sum(len(timestamps) for timestamps in points.values()) == 63
+
+    def test_bad_entry_is_rejected_alone(self, api, tmp_path):
+        recorder = Recorder(api)
+        recorder.gate.clear()
+        rejected = []
+        client = make_client(api)
+        with WriteSpool(client, str(tmp_path), batch_size=10, retry_backoff=0.01, max_backoff=0.05, max_attempts=2,
+                        on_error=lambda entry, error: rejected.append(entry['seq']), fsync=False) as spool:
+            write(spool, 0, 'a0')
+            for ts in range(1, 10):
+                write(spool, ts, 'poison' if ts == 5 else 'a{}'.format(ts))
+            recorder.gate.set()
+            assert spool.drain(10)
+        client.close()
+        assert rejected == [6]
+        assert sorted(ts for timestamps in recorder.points().values() for ts in timestamps) == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+        with open(os.path.join(str(tmp_path), 'rejected.log')) as f:
+            assert [json.loads(line)['seq'] for line in f] == [6]
+
+    def test_delivered_segments_are_removed(self, api, tmp_path):
+        Recorder(api)
+        client = make_client(api)
+        with WriteSpool(client, str(tmp_path), segment_size=10, fsync=False) as spool:
+            for ts in range(35):
+                write(spool, ts)
+            assert spool.drain(10)
+            # Only the segment taking new writes is left
+            assert len(spool_files(str(tmp_path))) <= 2
+        client.close()
+        assert spool_files(str(tmp_path)) == []
+
+    def test_directory_is_locked(self, api, tmp_path):
+        client = make_client(api)
+        with WriteSpool(client, str(tmp_path)):
+            with pytest.raises(ValueError):
+                WriteSpool(client, str(tmp_path))
+        WriteSpool(client, str(tmp_path)).close()
+        client.close()
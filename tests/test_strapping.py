@@ -0,0 +1,63 @@
+import math
+from unittest import mock
+
+import pytest
+
+from sotaog_public_api_client import Client, StrappingTable, strapping
+
+CSV = '10,100\n0,0\n\n20,300\n'
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def table(request):
+    if request.param == 'python':
+        with mock.patch.object(strapping, 'numpy', None):
+            yield StrappingTable.from_csv(CSV)
+    else:
+        pytest.importorskip('numpy')
+        yield StrappingTable.from_csv(CSV)
+
+
+class TestStrappingTable:
+    def test_points_are_sorted(self, table):
+        assert len(table) == 3
+        assert list(table.levels) == [0.0, 10.0, 20.0]
+        assert list(table.volumes) == [0.0, 100.0, 300.0]
+
+    def test_interpolation(self, table):
+        assert table.interpolate(0) == 0.0
+        assert table.interpolate(5) == 50.0
+        assert table.interpolate(10) == 100.0
+        assert table.interpolate(15) == 200.0
+        assert table.interpolate(20) == 300.0
+
+    def test_levels_outside_the_table_are_nan(self, table):
+        assert math.isnan(table.interpolate(-0.5))
+        assert math.isnan(table.interpolate(20.5))
+        assert math.isnan(table.interpolate(float('nan')))
+
+    def test_interpolate_many_matches_interpolate(self, table):
+        levels = [-1, 0, 2.5, 10, 12, 20, 21, float('nan')]
+        volumes = list(table.interpolate_many(levels))
+        assert len(volumes) == len(levels)
+        for level, volume in zip(levels, volumes):
+            expected = table.interpolate(level)
+            assert (math.isnan(volume) and math.isnan(expected)) or volume == expected
+
+    def test_empty_table(self, table):
+        empty = StrappingTable([])
+        assert math.isnan(empty.interpolate(1))
+        assert all(math.isnan(volume) for volume in empty.interpolate_many([0, 1]))
+
+
+class TestClientStrapping:
+    def test_table_is_downloaded_once(self, api):
+        api.route('GET', '/v1/tanks/t1/strapping', lambda request: (200, CSV.encode()))
+        client = Client(api.url, 'id', 'secret')
+        assert client.get_strapping_table('t1') == {0.0: 0.0, 10.0: 100.0, 20.0: 300.0}
+        table = client.get_tank_strapping_table('t1')
+        assert table.interpolate(15) == 200.0
+        assert client.get_tank_strapping_table('t1') is table
+        assert client.get_tank_strapping_table('t1', refresh=True) is not table
+        client.close()
+        assert len([call for call in api.calls if call.path == '/v1/tanks/t1/strapping']) == 3
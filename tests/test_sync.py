@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+from sotaog_public_api_client import DatapointStore, DatapointSync
+
+
+class FakeClient:
+    """Serves `iter_asset_datapoints` from `{(asset_id, datatype): [(ts, value), ...]}`, optionally failing after `fail_after` points."""
+
+    def __init__(self, series):
+        self.series = series
+        self.calls = []
+        self.fail_after = None
+
+    def iter_asset_datapoints(self, asset_id, datatypes, start_ts = None, sort = 'asc', page_size = 100):
+        self.calls.append((asset_id, tuple(datatypes), start_ts))
+        points = sorted((ts, datatype, value) for datatype in datatypes for ts, value in self.series.get((asset_id, datatype), [])
+                        if start_ts is None or ts >= start_ts)
+        for i, (ts, datatype, value) in enumerate(points):
+            if self.fail_after is not None and i == self.fail_after:
+                raise ConnectionError('connection lost')
+            yield datatype, ts, value
+
+
+def values(store, asset_id, datatype):
+    series = store.read(asset_id, datatype)
+    return list(zip(series.timestamps, series.values))
+
+
+class TestDatapointSync:
+    def test_high_water_mark_advances(self):
+        client = FakeClient({('a1', 'oil'): [(1, 1.0), (2, 2.0)], ('a1', 'gas'): [(1, 5.0)]})
+        with DatapointStore(':memory:') as store:
+            sync = DatapointSync(client, store)
+            assert sync.sync('a1', ['oil', 'gas']) == 3
+            assert store.series() == {('a1', 'oil'): 2, ('a1', 'gas'): 1}
+
+            client.series[('a1', 'oil')].append((3, 3.0))
+            client.series[('a1', 'gas')].append((4, 6.0))
+            assert sync.sync('a1', ['oil', 'gas']) == 2
+            # Both series are fetched together from the oldest mark, points at or below a mark are skipped
+            assert client.calls[-1] == ('a1', ('oil', 'gas'), 1)
+            assert store.series() == {('a1', 'oil'): 3, ('a1', 'gas'): 4}
+            assert values(store, 'a1', 'oil') == [(1, 1.0), (2, 2.0), (3, 3.0)]
+            assert sync.sync('a1', ['oil', 'gas']) == 0
+
+    def test_resume_after_an_interrupted_sync(self, tmp_path):
+        path = str(tmp_path / 'datapoints.db')
+        client = FakeClient({('a1', 'oil'): [(ts, float(ts)) for ts in range(25)]})
+        client.fail_after = 12
+        with DatapointStore(path) as store:
+            with pytest.raises(ConnectionError):
+                DatapointSync(client, store, batch_size=5).sync('a1', ['oil'])
+            # Only whole batches were committed
+            assert store.high_water_mark('a1', 'oil') == 9
+
+        client.fail_after = None
+        with DatapointStore(path) as store:
+            assert DatapointSync(client, store, batch_size=5).sync('a1', ['oil']) == 15
+            assert values(store, 'a1', 'oil') == [(ts, float(ts)) for ts in range(25)]
+            assert store.high_water_mark('a1', 'oil') == 24
+
+    def test_sync_many(self):
+        client = FakeClient({('a{}'.format(i), 'oil'): [(ts, 1.0) for ts in range(i)] for i in range(5)})
+        with DatapointStore(':memory:') as store:
+            assert DatapointSync(client, store, max_workers=3).sync_many({'a{}'.format(i): ['oil'] for i in range(5)}) == {
+                'a0': 0, 'a1': 1, 'a2': 2, 'a3': 3, 'a4': 4}
+
+
+class TestDatapointStore:
+    def test_delete(self):
+        with DatapointStore(':memory:') as store:
+            store.write('a1', [('oil', 1, 1.0), ('gas', 1, 2.0)])
+            store.delete('a1', 'oil')
+            assert values(store, 'a1', 'oil') == []
+            assert store.series() == {('a1', 'gas'): 1}
+
+    def test_failed_delete_is_rolled_back(self, tmp_path):
+        with DatapointStore(str(tmp_path / 'datapoints.db')) as store:
+            store.write('a1', [('oil', 1, 1.0)])
+            store._conn.execute("CREATE TRIGGER keep BEFORE DELETE ON series BEGIN SELECT RAISE(ABORT, 'kept'); END")
+            with pytest.raises(sqlite3.IntegrityError):
+                store.delete('a1', 'oil')
+            assert values(store, 'a1', 'oil') == [(1, 1.0)]
+            # The store is still usable
+            store.write('a1', [('oil', 2, 2.0)])
+            assert store.high_water_mark('a1', 'oil') == 2
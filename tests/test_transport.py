@@ -0,0 +1,173 @@
+import socket
+import threading
+from unittest import mock
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+
+from sotaog_public_api_client import DEFAULT_TIMEOUT, Circuit_Open_Exception, CircuitBreaker, Client, Client_Exception, RetryAdapter, Transport
+
+
+class TestCircuitBreaker:
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record('api', True)
+        breaker.before_request('api')
+        breaker.record('api', True)
+        assert breaker.is_open('api')
+        # One trial request is let through once the timeout expired, others fail fast meanwhile
+        breaker.before_request('api')
+        with pytest.raises(Circuit_Open_Exception):
+            breaker.before_request('api')
+        breaker.record('api', False)
+        assert not breaker.is_open('api')
+        breaker.before_request('api')
+
+    def test_failed_trial_opens_the_circuit_again(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record('api', True)
+        breaker.before_request('api')
+        breaker.record('api', True)
+        assert breaker.is_open('api')
+        breaker.before_request('api')
+
+    def test_unexpected_error_ends_the_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record('127.0.0.1', True)
+        session = requests.Session()
+        session.mount('http://', RetryAdapter({}, breaker))
+        with mock.patch.object(HTTPAdapter, 'send', side_effect=ChunkedEncodingError('truncated')):
+            with pytest.raises(ChunkedEncodingError):
+                session.get('http://127.0.0.1/v1/assets')
+        # The trial was recorded as failed instead of staying in progress forever
+        breaker.before_request('127.0.0.1')
+
+
+class Flaky:
+    """Handler answering 503 `failures` times before answering `body`."""
+
+    def __init__(self, failures, status, body):
+        self.failures = failures
+        self.status = status
+        self.body = body
+
+    def __call__(self, request):
+        if self.failures:
+            self.failures -= 1
+            return 503, {'error': 'unavailable'}, {'Retry-After': '0'}
+        return self.status, self.body
+
+
+class TestRetries:
+    def test_read_only_post_is_retried_without_idempotency_key(self, api):
+        api.route('POST', '/v1/datapoints', Flaky(2, 200, {'a1': {'oil': [[1, 1.0]]}}))
+        client = Client(api.url, 'id', 'secret', circuit_breaker=False)
+        assert client.get_datapoints({'a1': ['oil']}) == {'a1': {'oil': [[1, 1.0]]}}
+        client.close()
+        posts = [call for call in api.calls if call.path == '/v1/datapoints']
+        assert len(posts) == 3
+        assert all('idempotency-key' not in call.headers for call in posts)
+
+    def test_post_without_idempotency_key_is_not_retried(self, api):
+        api.route('POST', '/v1/truck-tickets', Flaky(1, 201, {'id': 't1'}))
+        client = Client(api.url, 'id', 'secret', circuit_breaker=False)
+        with pytest.raises(Client_Exception):
+            client.post_truck_ticket({'id': 't1'})
+        assert client.post_truck_ticket({'id': 't1'}) == {'id': 't1'}
+        client.close()
+
+
+class TestTransport:
+    def test_default_timeout(self):
+        assert Transport().timeout == DEFAULT_TIMEOUT
+        assert Transport(timeout=None).timeout is None
+
+    def test_resizing_the_pool_closes_the_previous_adapter(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        transport = Transport()
+        client = Client(api.url, 'id', 'secret', transport=transport)
+        try:
+            client.get_facilities()
+            assert transport.stats()['requests'] == len(api.calls)
+            previous = client.session.adapters['https://']
+            assert len(previous.poolmanager.pools) == 1
+            client.map('get_facilities', [()] * 4, max_workers=64)
+            assert client.session.adapters['https://'] is not previous
+            assert len(previous.poolmanager.pools) == 0
+            # Requests sent through the closed adapter are still counted
+            assert transport.stats()['requests'] == len(api.calls)
+        finally:
+            client.close()
+
+    def test_shared_transport_is_closed_with_its_last_client(self, api):
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        transport = Transport()
+        first = Client(api.url, 'id', 'secret', transport=transport)
+        second = Client(api.url, 'id', 'secret', transport=transport)
+        first.get_facilities()
+        first.close()
+        first.close()
+        assert transport._adapters
+        assert second.get_facilities() == []
+        second.close()
+        assert not transport._adapters
+
+
+def truncating_server():
+    """Server answering every request with a body shorter than its Content-Length, then hanging up."""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 1000\r\n\r\n[1, 2, ')
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.getsockname()[1])
+
+
+class TestHttpxTransport:
+    @pytest.fixture(autouse=True)
+    def httpx(self):
+        return pytest.importorskip('httpx')
+
+    def test_shared_transport_is_closed_with_its_last_client(self, api):
+        from sotaog_public_api_client import HttpxTransport
+
+        api.route('GET', '/v1/facilities', lambda request: (200, []))
+        transport = HttpxTransport(http2=False)
+        first = Client(api.url, 'id', 'secret', transport=transport)
+        second = Client(api.url, 'id', 'secret', transport=transport)
+        first.close()
+        assert second.get_facilities() == []
+        second.close()
+        assert transport.client.is_closed
+
+    def test_errors_while_streaming_are_requests_exceptions(self):
+        from sotaog_public_api_client import HttpxTransport
+
+        server, url = truncating_server()
+        transport = HttpxTransport(http2=False)
+        adapter = transport.adapter({}, None)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        try:
+            response = session.get(url, stream=True)
+            with pytest.raises(ChunkedEncodingError):
+                list(response.iter_content(16))
+            # requests reports a body cut short the same way when it is read whole
+            with pytest.raises(ChunkedEncodingError):
+                session.get(url)
+        finally:
+            session.close()
+            transport.close()
+            server.close()
@@ -0,0 +1,39 @@
+import time
+
+from sotaog_public_api_client import Client, Client_Exception
+
+
+def slow_upload(request):
+    time.sleep(0.02)
+    return 204, b''
+
+
+class TestPutTruckTicketImages:
+    def test_at_most_twice_max_workers_uploads_are_pending(self, api):
+        for timestamp in range(20):
+            api.route('PUT', '/v1/truck-tickets/t1/{}/image'.format(timestamp), slow_upload)
+        client = Client(api.url, 'id', 'secret', retry_policies={})
+        completed = []
+        pending = []
+
+        def jobs():
+            for timestamp in range(20):
+                # Uploads submitted but not yielded yet when the next job is taken
+                pending.append(timestamp - len(completed))
+                yield 't1', timestamp, b'image', 'image/png'
+
+        for result in client.put_truck_ticket_images(jobs(), max_workers=2):
+            completed.append(result)
+        client.close()
+        assert max(pending) == 4
+        assert sorted(timestamp for _, timestamp, _ in completed) == list(range(20))
+        assert all(error is None for _, _, error in completed)
+        assert {call.headers['content-type'] for call in api.calls if call.method == 'PUT'} == {'image/png'}
+
+    def test_errors_are_yielded(self, api):
+        api.route('PUT', '/v1/truck-tickets/t1/1/image', lambda request: (204, b''))
+        client = Client(api.url, 'id', 'secret', retry_policies={})
+        results = dict((timestamp, error) for _, timestamp, error in client.put_truck_ticket_images([('t1', 1, b'a'), ('t1', 2, b'b')]))
+        client.close()
+        assert results[1] is None
+        assert isinstance(results[2], Client_Exception)
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+import pytest
+
+from sotaog_public_api_client import Client, Client_Exception, DatapointWriter
+from sotaog_public_api_client.writer import split_entities
+
+
+class Recorder:
+    """Routes the datapoint writes of the stub API, tracking how many are in flight at once."""
+
+    def __init__(self, api):
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+        api.route('POST', '/v1/datapoints/multiple', self.handle)
+
+    def handle(self, request):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.gate.wait(10)
+        with self._lock:
+            self.in_flight -= 1
+            self.bodies.append(request.json())
+        return 202, b''
+
+    def points(self):
+        return sorted(point[0] for body in self.bodies for datatypes in body['entities'].values()
+                      for points in datatypes.values() for point in points)
+
+
+def make_client(api):
+    return Client(api.url, 'id', 'secret', retry_policies={}, circuit_breaker=False)
+
+
+class TestSplitEntities:
+    def test_chunks_are_packed_up_to_the_size(self):
+        entities = {'e{}'.format(i): {'oil': [[1600000000000 + j, j * 1.5] for j in range(i * 37)], 'gas': [[j, j] for j in range(5)]}
+                    for i in range(20)}
+        chunks = list(split_entities(entities, 2000))
+        sizes = [len(json.dumps(chunk)) for chunk in chunks]
+        assert max(sizes) <= 2000
+        assert min(sizes[:-1]) > 1800
+        merged = {}
+        for chunk in chunks:
+            for entity_id, datatypes in chunk.items():
+                for datatype, points in datatypes.items():
+                    merged.setdefault(entity_id, {}).setdefault(datatype, []).extend(points)
+        # Empty series are dropped
+        assert merged == {entity_id: {datatype: points for datatype, points in datatypes.items() if points}
+                          for entity_id, datatypes in entities.items()}
+
+    def test_oversized_point_gets_its_own_chunk(self):
+        entities = {'a1': {'oil': [[1, 1.0], [2, 'x' * 100], [3, 3.0]]}}
+        assert list(split_entities(entities, 60)) == [{'a1': {'oil': [[1, 1.0]]}}, {'a1': {'oil': [[2, 'x' * 100]]}},
+                                                      {'a1': {'oil': [[3, 3.0]]}}]
+
+
+class TestDatapointWriter:
+    def test_flush_interval_must_be_positive(self, api):
+        client = make_client(api)
+        for flush_interval in (0, -1):
+            with pytest.raises(Client_Exception):
+                DatapointWriter(client, flush_interval=flush_interval)
+        client.close()
+
+    def test_pending_requests_are_bounded(self, api):
+        recorder = Recorder(api)
+        recorder.gate.clear()
+        client = make_client(api)
+        writer = DatapointWriter(client, max_points=10, max_workers=2, max_pending=3)
+        done = threading.Event()
+
+        def produce():
+            for ts in range(100):
+                writer.write('a1', 'oil', ts, float(ts))
+            done.set()
+
+        threading.Thread(target=produce, daemon=True).start()
+        # Three batches are queued or in flight, the fourth flush blocks the producer
+        assert not done.wait(0.5)
+        assert recorder.max_in_flight <= 2
+        recorder.gate.set()
+        assert done.wait(10)
+        writer.close()
+        client.close()
+        assert recorder.points() == list(range(100))
+        assert writer.requests_sent == 10
+        assert recorder.max_in_flight <= 2
+
+    def test_buffer_is_flushed_after_the_interval(self, api):
+        recorder = Recorder(api)
+        client = make_client(api)
+        writer = DatapointWriter(client, flush_interval=0.2)
+        try:
+            writer.write('a1', 'oil', 1, 1.0)
+            deadline = time.monotonic() + 5
+            while not recorder.bodies and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert recorder.bodies == [{'entities': {'a1': {'oil': [[1, 1.0]]}}}]
+        finally:
+            writer.close()
+            client.close()